@@ -1,12 +1,17 @@
 # Import required modules and initialize the builder from open_deep_research
-import uuid  
-from langgraph.checkpoint.memory import MemorySaver
+from typing import Callable, Optional, Union
+from langgraph.types import Command
+from open_deep_research.checkpoints import apply_retention, finish_thread, mark_thread, open_checkpointer
 from open_deep_research.graph import builder
+from open_deep_research.section_events import section_events
+from open_deep_research.telemetry import format_metrics_summary, run_metrics, write_metrics
 import Nexusagent_SR
 import os
+import uuid
 
-memory = MemorySaver()
-graph = builder.compile(checkpointer=memory)
+# The graph is compiled per run with a durable SQLite checkpointer (see deepresearch_agent)
+
+REPORT_PATH = "output/deepresearch_report.md"
 # Define report structure template and configure the research workflow
 # This sets parameters for models, search tools, and report organization
 
@@ -79,9 +84,47 @@ The user's topic is:
 # Define research topic about Model Context Protocol
 # Run the graph workflow until first interruption (waiting for user feedback)
 
-async def deepresearch_agent(topic):
+async def _emit_section(report_file, thread_id: str, section, completed: int):
+   """Append a completed section to the report file and publish it to section listeners."""
+   report_file.write(("\n\n" if completed > 1 else "") + section.content)
+   report_file.flush()
+   await section_events.publish({
+      "type": "research_section",
+      "thread_id": thread_id,
+      "name": section.name,
+      "content": section.content,
+      "completed": completed,
+   })
+
+
+async def deepresearch_agent(
+   topic,
+   thread_id: Optional[str] = None,
+   review_plan: Optional[Callable[[str], Union[bool, str]]] = None,
+):
+   """Research a topic and write the report to output/deepresearch_report.md.
+
+   Each call starts a new checkpoint thread unless ``thread_id`` is given.
+   Progress is checkpointed to disk, so passing the thread id of a run that
+   stopped after a crash or restart continues it instead of starting over;
+   passing the id of a finished run returns its report. Sections are appended
+   to the report file and published to ``section_events`` as soon as each one
+   is written.
+
+   Args:
+       topic: User-provided topic
+       thread_id: Checkpoint thread to resume; a new thread is used if not given
+       review_plan: Called with the report plan before research starts; returns
+           True to approve it or feedback to regenerate it. If not given, the
+           plan is approved without review.
+
+   Returns:
+       str: The report content
+   """
+   topic = task.format(topic=topic)
+   thread_id = thread_id or f"deepresearch-{uuid.uuid4().hex}"
    # Configuration option 3: Use OpenAI o3 for both planning and writing (selected option)
-   thread = {"configurable": {"thread_id": str(uuid.uuid4()),
+   thread = {"configurable": {"thread_id": thread_id,
                               "search_api": os.getenv("SEARCH_TOOL","gemini"),
                               "planner_provider": "deepseek",
                               "planner_model": os.getenv("DEEPRESEARCH_MODEL","deepseek-chat"),
@@ -92,20 +135,60 @@ async def deepresearch_agent(topic):
                               "base_url": os.getenv("DEEPRESEARCH_ENDPOINT","https://api.deepresearch.ai/v1"),
                               "api_key": os.getenv("DEEPSEEK_API_KEY","gemini-api-key"),}
    }
-   topic = task.format(topic=topic)
-   async for event in graph.astream({"topic": topic}, thread, stream_mode="updates"):
-      if '__interrupt__' in event:
-         interrupt_value = event['__interrupt__'][0].value
-
-   # Display the final generated report
-   # Retrieve the completed report from the graph's state and format it for display
-   
-   final_state = graph.get_state(thread)
-   report = final_state.values.get('completed_sections')
+   async with open_checkpointer() as checkpointer:
+      await apply_retention(checkpointer)
+      graph = builder.compile(checkpointer=checkpointer)
+
+      state = await graph.aget_state(thread)
+      finished_sections = []
+      # A finished thread has nothing left to run and its report is returned as is
+      run_graph = bool(state.next) or not state.values
+      if state.next:
+         # An earlier run of this thread stopped midway; continue from its last checkpoint
+         print(f"Resuming research thread {thread_id} at {list(state.next)}")
+         graph_input = None
+         finished_sections = state.values.get('completed_sections') or []
+      else:
+         graph_input = {"topic": topic}
+      await mark_thread(checkpointer, thread_id)
+
+      os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+      with run_metrics() as metrics, open(REPORT_PATH, "w", encoding="utf-8") as report_file:
+         completed = 0
+         for section in finished_sections:
+            completed += 1
+            await _emit_section(report_file, thread_id, section, completed)
+
+         while run_graph:
+            interrupts = []
+            # Each section subgraph reports its update as soon as it finishes
+            async for event in graph.astream(graph_input, thread, stream_mode="updates"):
+               for node, update in event.items():
+                  if node == '__interrupt__':
+                     interrupts.extend(update)
+                  elif isinstance(update, dict):
+                     for section in update.get('completed_sections') or []:
+                        completed += 1
+                        await _emit_section(report_file, thread_id, section, completed)
+            if not interrupts:
+               break
+            # The only interrupt is the report plan review; without a reviewer the plan is approved
+            graph_input = Command(resume=review_plan(interrupts[-1].value) if review_plan else True)
+
+      # Retrieve the completed report from the graph's state
+      final_state = await graph.aget_state(thread)
+      await finish_thread(checkpointer, thread_id)
+
+   # Save search and node metrics of this run next to the report
+   summary = metrics.snapshot()
+   write_metrics(summary, "output/deepresearch_metrics.json")
+   print(format_metrics_summary(summary))
+
+   report = final_state.values.get('completed_sections') or []
    print(len(report))
-   # print(report[0].content)
-   report_content = "\n\n".join(section["content"] for section in report)
-   
-   with open("output/deepresearch_report.md", "w", encoding="utf-8") as f:
+   report_content = "\n\n".join(section.content for section in report)
+
+   # Sections were appended in the order they finished; the final file follows the report order
+   with open(REPORT_PATH, "w", encoding="utf-8") as f:
       f.write(report_content)
    return report_content
@@ -14,7 +14,7 @@ from typing import List, Optional, Union
 
 # Ensure loading .env file
 import Nexusagent_SR  # noqa: F401
-from litellm import completion
+from open_deep_research.llm_cache import cached_completion
 
 from openai import AzureOpenAI
 from Nexusagent_SR.prompt.agent_prompt import build_SUMMARIZE_PROMPT
@@ -60,7 +60,8 @@ async def summarize_report() -> str:
         # Generate the analysis report
         prompt = build_SUMMARIZE_PROMPT(best_expressions, data_description)
 
-        response = completion(
+        # Deterministic (temperature 0), so reruns on the same inputs can reuse the response
+        response = cached_completion(
             model=os.getenv("MODEL"),
             temperature=0,
             max_tokens=8192,
@@ -344,6 +344,27 @@ const ChatInterface: React.FC = () => {
       return
     }
     
+    if (type === 'research_section') {
+      // 研究报告的章节在完成时即时显示
+      const { name, completed } = data
+      const sectionMessage: Message = {
+        id: id || `research-section-${Date.now()}`,
+        role: 'tool' as const,
+        content: `📄 研究章节已完成 (${completed}): **${name}**\n\n${content || ''}`,
+        timestamp: new Date(timestamp || Date.now()),
+        tool_name: 'deepresearch',
+        tool_status: 'section_completed'
+      }
+
+      setMessages(prev => {
+        if (prev.some(m => m.id === sectionMessage.id)) {
+          return prev
+        }
+        return [...prev, sectionMessage]
+      })
+      return
+    }
+
     if (type === 'assistant' || type === 'response') {
       const assistantMessage: Message = {
         id: id || `assistant-${Date.now()}`,
@@ -27,6 +27,8 @@ from google.genai import types
 
 # Import configuration
 from config.agent_config import agent_config
+from open_deep_research.section_events import section_events
+from open_deep_research.telemetry import metrics as research_metrics
 
 # Get agent from configuration
 rootagent = agent_config.get_agent()
@@ -296,105 +298,115 @@ class SessionManager:
             seen_tool_calls = set()  # 跟踪已发送的工具调用
             seen_tool_responses = set()  # 跟踪已发送的工具响应
             
-            async for event in runner.run_async(
-                new_message=content,
-                user_id=context.user_id,
-                session_id=context.current_session_id
-            ):
-                all_events.append(event)
-                logger.info(f"Received event: {type(event).__name__}")
+            # 研究报告的章节完成后立即推送给当前连接
+            async def send_research_section(section_event: dict):
+                await self.send_to_connection(context, {
+                    **section_event,
+                    "session_id": context.current_session_id,
+                    "timestamp": datetime.now().isoformat()
+                })
+
+            with section_events.listening(send_research_section):
+                async for event in runner.run_async(
+                    new_message=content,
+                    user_id=context.user_id,
+                    session_id=context.current_session_id
+                ):
+                    all_events.append(event)
+                    logger.info(f"Received event: {type(event).__name__}")
                 
-                # 检查事件中的工具调用（按照官方示例）
-                if hasattr(event, 'content') and event.content and hasattr(event.content, 'parts'):
-                    for part in event.content.parts:
-                        # 检查是否是函数调用
-                        if hasattr(part, 'function_call') and part.function_call:
-                            function_call = part.function_call
-                            tool_name = getattr(function_call, 'name', 'unknown')
-                            tool_id = getattr(function_call, 'id', tool_name)
+                    # 检查事件中的工具调用（按照官方示例）
+                    if hasattr(event, 'content') and event.content and hasattr(event.content, 'parts'):
+                        for part in event.content.parts:
+                            # 检查是否是函数调用
+                            if hasattr(part, 'function_call') and part.function_call:
+                                function_call = part.function_call
+                                tool_name = getattr(function_call, 'name', 'unknown')
+                                tool_id = getattr(function_call, 'id', tool_name)
                             
-                            # 避免重复发送相同的工具调用
-                            if tool_id in seen_tool_calls:
-                                continue
-                            seen_tool_calls.add(tool_id)
+                                # 避免重复发送相同的工具调用
+                                if tool_id in seen_tool_calls:
+                                    continue
+                                seen_tool_calls.add(tool_id)
                             
-                            # 检查是否是长时间运行的工具
-                            is_long_running = False
-                            if (hasattr(event, 'long_running_tool_ids') and 
-                                event.long_running_tool_ids and 
-                                hasattr(function_call, 'id')):
-                                is_long_running = function_call.id in event.long_running_tool_ids
+                                # 检查是否是长时间运行的工具
+                                is_long_running = False
+                                if (hasattr(event, 'long_running_tool_ids') and 
+                                    event.long_running_tool_ids and 
+                                    hasattr(function_call, 'id')):
+                                    is_long_running = function_call.id in event.long_running_tool_ids
                             
-                            await self.send_to_connection(context, {
-                                "type": "tool",
-                                "tool_name": tool_name,
-                                "status": "executing",
-                                "is_long_running": is_long_running,
-                                "timestamp": datetime.now().isoformat()
-                            })
-                            logger.info(f"Tool call detected: {tool_name} (long_running: {is_long_running})")
+                                await self.send_to_connection(context, {
+                                    "type": "tool",
+                                    "tool_name": tool_name,
+                                    "status": "executing",
+                                    "is_long_running": is_long_running,
+                                    "timestamp": datetime.now().isoformat()
+                                })
+                                logger.info(f"Tool call detected: {tool_name} (long_running: {is_long_running})")
                         
-                        # 检查是否是函数响应（工具完成）
-                        elif hasattr(part, 'function_response') and part.function_response:
-                            function_response = part.function_response
-                            # 从响应中获取更多信息
-                            tool_name = "unknown"
-                            tool_result = None
+                            # 检查是否是函数响应（工具完成）
+                            elif hasattr(part, 'function_response') and part.function_response:
+                                function_response = part.function_response
+                                # 从响应中获取更多信息
+                                tool_name = "unknown"
+                                tool_result = None
                             
-                            if hasattr(function_response, 'name'):
-                                tool_name = function_response.name
+                                if hasattr(function_response, 'name'):
+                                    tool_name = function_response.name
                             
-                            # 创建唯一标识符
-                            response_id = f"{tool_name}_response"
-                            if hasattr(function_response, 'id'):
-                                response_id = function_response.id
+                                # 创建唯一标识符
+                                response_id = f"{tool_name}_response"
+                                if hasattr(function_response, 'id'):
+                                    response_id = function_response.id
                             
-                            # 避免重复发送相同的工具响应
-                            if response_id in seen_tool_responses:
-                                continue
-                            seen_tool_responses.add(response_id)
+                                # 避免重复发送相同的工具响应
+                                if response_id in seen_tool_responses:
+                                    continue
+                                seen_tool_responses.add(response_id)
                             
-                            if hasattr(function_response, 'response'):
-                                response_data = function_response.response
+                                if hasattr(function_response, 'response'):
+                                    response_data = function_response.response
                                 
-                                # 智能格式化不同类型的响应
-                                if isinstance(response_data, dict):
-                                    # 如果是字典，尝试美化JSON格式
-                                    try:
-                                        result_str = json.dumps(response_data, indent=2, ensure_ascii=False)
-                                    except:
+                                    # 智能格式化不同类型的响应
+                                    if isinstance(response_data, dict):
+                                        # 如果是字典，尝试美化JSON格式
+                                        try:
+                                            result_str = json.dumps(response_data, indent=2, ensure_ascii=False)
+                                        except:
+                                            result_str = str(response_data)
+                                    elif isinstance(response_data, (list, tuple)):
+                                        # 如果是列表或元组，也尝试JSON格式化
+                                        try:
+                                            result_str = json.dumps(response_data, indent=2, ensure_ascii=False)
+                                        except:
+                                            result_str = str(response_data)
+                                    elif isinstance(response_data, str):
+                                        # 字符串直接使用，保留原始格式
+                                        result_str = response_data
+                                    else:
+                                        # 其他类型转换为字符串
                                         result_str = str(response_data)
-                                elif isinstance(response_data, (list, tuple)):
-                                    # 如果是列表或元组，也尝试JSON格式化
-                                    try:
-                                        result_str = json.dumps(response_data, indent=2, ensure_ascii=False)
-                                    except:
-                                        result_str = str(response_data)
-                                elif isinstance(response_data, str):
-                                    # 字符串直接使用，保留原始格式
-                                    result_str = response_data
-                                else:
-                                    # 其他类型转换为字符串
-                                    result_str = str(response_data)
                                 
-                                await self.send_to_connection(context, {
-                                    "type": "tool",
-                                    "tool_name": tool_name,
-                                    "status": "completed",
-                                    "result": result_str,
-                                    "timestamp": datetime.now().isoformat()
-                                })
-                            else:
-                                # 没有结果的情况
-                                await self.send_to_connection(context, {
-                                    "type": "tool",
-                                    "tool_name": tool_name,
-                                    "status": "completed",
-                                    "timestamp": datetime.now().isoformat()
-                                })
+                                    await self.send_to_connection(context, {
+                                        "type": "tool",
+                                        "tool_name": tool_name,
+                                        "status": "completed",
+                                        "result": result_str,
+                                        "timestamp": datetime.now().isoformat()
+                                    })
+                                else:
+                                    # 没有结果的情况
+                                    await self.send_to_connection(context, {
+                                        "type": "tool",
+                                        "tool_name": tool_name,
+                                        "status": "completed",
+                                        "timestamp": datetime.now().isoformat()
+                                    })
                             
-                            logger.info(f"Tool response received: {tool_name}")
+                                logger.info(f"Tool response received: {tool_name}")
             
+
             # 处理所有事件，只获取最后一个有效响应
             logger.info(f"Total events: {len(all_events)}")
             
@@ -618,7 +630,8 @@ async def root():
             "websocket": "/ws",
             "files": "/api/files",
             "file_tree": "/api/files/tree",
-            "config": "/api/config"
+            "config": "/api/config",
+            "metrics": "/api/metrics"
         }
     }
 
@@ -632,6 +645,11 @@ async def get_config():
         "websocket": agent_config.get_websocket_config()
     })
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """获取深度研究的搜索与节点指标"""
+    return JSONResponse(content=research_metrics.snapshot())
+
 # 安全的命令白名单
 SAFE_COMMANDS = {
     'ls', 'pwd', 'cd', 'cat', 'echo', 'grep', 'find', 'head', 'tail', 
@@ -0,0 +1 @@
+"""Offline benchmarks of the search-to-context pipeline."""
@@ -0,0 +1,5 @@
+import sys
+
+from open_deep_research.benchmarks.run import main
+
+sys.exit(main())
@@ -0,0 +1,192 @@
+"""Record and replay HTTP traffic of the search backends.
+
+Every backend that talks HTTP through httpx (Tavily, Exa, arXiv, PubMed and
+Google scraping) creates its own ``httpx.AsyncClient``. Inside ``replay()`` and
+``record()`` those clients are built with a transport that serves responses
+from a fixture, or saves the real responses to one, so backends run unchanged.
+
+A fixture is a JSON file:
+
+    {
+        "backend": "arxiv",
+        "queries": ["..."],
+        "params": {"get_full_documents": false},
+        "responses": [{"method": "GET", "url": "https://...", "status": 200,
+                       "headers": {...}, "body": "..."}]
+    }
+
+``params`` are keyword arguments of the backend's search function.
+"""
+
+import asyncio
+import contextlib
+import json
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+
+import httpx
+
+# Headers that must not be replayed as-is (the body is stored decoded)
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+
+
+def _request_key(method: str, url: str) -> tuple:
+    # Query strings hold search terms and API keys, so responses are matched on the endpoint only
+    url = httpx.URL(url)
+    return method.upper(), f"{url.scheme}://{url.host}{url.path}"
+
+
+def load_fixture(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fixture(fixture: dict, path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, indent=1, ensure_ascii=False)
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serves recorded responses in order for each endpoint, cycling when they run out.
+
+    With ``stall_first`` the first request never gets a response, like a backend
+    that hangs, until it is cancelled.
+    """
+
+    def __init__(self, responses: List[dict], stall_first: bool = False):
+        self.stall_first = stall_first
+        self._recorded: Dict[tuple, List[dict]] = defaultdict(list)
+        for response in responses:
+            self._recorded[_request_key(response["method"], response["url"])].append(response)
+        self._queues: Dict[tuple, deque] = {}
+        self.requests = 0
+        self.unmatched: List[str] = []
+
+    def reset(self) -> None:
+        self._queues = {key: deque(responses) for key, responses in self._recorded.items()}
+        self.requests = 0
+        self.unmatched = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.stall_first and self.requests == 1:
+            await asyncio.Event().wait()
+        key = _request_key(request.method, str(request.url))
+        if key not in self._recorded:
+            self.unmatched.append(f"{request.method} {request.url}")
+            return httpx.Response(404, text="No recorded response", request=request)
+        queue = self._queues.setdefault(key, deque(self._recorded[key]))
+        if not queue:
+            queue.extend(self._recorded[key])
+        recorded = queue.popleft()
+        return httpx.Response(
+            recorded["status"],
+            headers=recorded.get("headers", {}),
+            content=recorded["body"].encode("utf-8"),
+            request=request,
+        )
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forwards requests to the network and keeps every response."""
+
+    def __init__(self):
+        self._transport = httpx.AsyncHTTPTransport()
+        self.responses: List[dict] = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        body = await response.aread()
+        await response.aclose()
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in _DROPPED_HEADERS}
+        # Store the URL without its query string so API keys do not end up in fixtures
+        url = str(request.url.copy_with(query=None))
+        decoded = httpx.Response(response.status_code, headers=headers, content=body).text
+        self.responses.append({
+            "method": request.method,
+            "url": url,
+            "status": response.status_code,
+            "headers": headers,
+            "body": decoded,
+        })
+        return httpx.Response(response.status_code, headers=headers, content=decoded.encode("utf-8"), request=request)
+
+    async def aclose(self) -> None:
+        # Shared by every client of the block, so closing one client must not close it
+        pass
+
+    async def shutdown(self) -> None:
+        await self._transport.aclose()
+
+
+@contextlib.contextmanager
+def _patched_async_client(transport: httpx.AsyncBaseTransport, trust_env: bool = True):
+    original = httpx.AsyncClient
+
+    class PatchedAsyncClient(original):
+        def __init__(self, *args, **kwargs):
+            kwargs.pop("proxies", None)
+            kwargs.pop("proxy", None)
+            kwargs["transport"] = transport
+            # Proxy settings from the environment would route requests around the transport
+            kwargs["trust_env"] = trust_env
+            super().__init__(*args, **kwargs)
+
+    httpx.AsyncClient = PatchedAsyncClient
+    try:
+        yield
+    finally:
+        httpx.AsyncClient = original
+
+
+@contextlib.contextmanager
+def _without_waiting():
+    # Rate limiters, backoff and politeness delays would dominate replayed timings
+    original = asyncio.sleep
+
+    async def sleep(delay, result=None):
+        return await original(0, result)
+
+    asyncio.sleep = sleep
+    try:
+        yield
+    finally:
+        asyncio.sleep = original
+
+
+@contextlib.contextmanager
+def replay(fixture: dict, skip_delays: bool = True, stall_first: bool = False):
+    """Serve the fixture's responses to every httpx.AsyncClient created inside the block.
+
+    Args:
+        fixture: Recorded fixture
+        skip_delays: Whether asyncio.sleep returns immediately inside the block
+        stall_first: Whether the first request hangs until it is cancelled
+
+    Yields:
+        ReplayTransport: The transport, for request counts and unmatched requests
+    """
+    transport = ReplayTransport(fixture["responses"], stall_first)
+    transport.reset()
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(_patched_async_client(transport, trust_env=False))
+        if skip_delays:
+            stack.enter_context(_without_waiting())
+        yield transport
+
+
+@contextlib.asynccontextmanager
+async def record(backend: str, queries: List[str], params: Optional[dict] = None):
+    """Capture the real responses of every httpx.AsyncClient created inside the block.
+
+    Yields:
+        dict: The fixture, whose responses are filled in when the block exits
+    """
+    fixture = {"backend": backend, "queries": queries, "params": params or {}, "responses": []}
+    transport = RecordingTransport()
+    try:
+        with _patched_async_client(transport):
+            yield fixture
+    finally:
+        fixture["responses"] = transport.responses
+        await transport.shutdown()
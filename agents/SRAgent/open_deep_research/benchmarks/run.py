@@ -0,0 +1,304 @@
+"""Offline benchmark of the search-to-context pipeline.
+
+Recorded backend responses are replayed through the real backend adapters and
+then through the formatting, reranking, stitching and run-index stages. Each
+stage reports latency, throughput and peak memory. With ``--baseline`` the run
+exits with status 1 when a stage got slower or uses more memory than the
+saved baseline allows, so it can gate changes in CI.
+
+Usage:
+    python -m open_deep_research.benchmarks --save-baseline baseline.json
+    python -m open_deep_research.benchmarks --baseline baseline.json
+    python -m open_deep_research.benchmarks --record arxiv --query "symbolic regression"
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gc
+import inspect
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from open_deep_research.benchmarks.replay import load_fixture, record, replay, save_fixture
+from open_deep_research.budget import CharTokenCounter, TokenCounter, get_token_counter
+from open_deep_research.embeddings import HashingEmbeddings
+from open_deep_research.index import HybridIndex
+from open_deep_research.utils import (
+    _split_search_results,
+    deduplicate_and_format_sources,
+    execute_search,
+    fusion_search_async,
+    split_and_rerank_search_results,
+    stitch_documents_by_url,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# A stage regresses only if it is slower by both the relative tolerance and this many milliseconds
+MIN_REGRESSION_MS = 1.0
+
+# Environment variables that would switch Google search from scraping to the (unrecorded) API
+_GOOGLE_API_ENV = ("GOOGLE_API_KEY", "GOOGLE_CX")
+
+
+@dataclass
+class StageResult:
+    """Timing and memory of one benchmark stage."""
+    stage: str
+    iterations: int
+    items: int
+    unit: str
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    throughput: float
+    peak_memory_kb: float
+
+
+async def _call(fn: Callable):
+    # Progress and warning prints of the pipeline would flood the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn()
+        if inspect.isawaitable(result):
+            result = await result
+    return result
+
+
+async def measure(stage: str, fn: Callable, items: int, unit: str, iterations: int, warmup: int = 1) -> StageResult:
+    """Time ``fn`` over several iterations, then measure its peak memory in one more traced run."""
+    for _ in range(warmup):
+        await _call(fn)
+
+    latencies = []
+    for _ in range(iterations):
+        gc.collect()
+        start = time.perf_counter()
+        await _call(fn)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    # tracemalloc slows allocations down, so memory is measured separately from latency
+    gc.collect()
+    tracemalloc.start()
+    try:
+        await _call(fn)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    mean_ms = statistics.fmean(latencies)
+    return StageResult(
+        stage=stage,
+        iterations=iterations,
+        items=items,
+        unit=unit,
+        mean_ms=round(mean_ms, 3),
+        p50_ms=round(statistics.median(latencies), 3),
+        p95_ms=round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 3),
+        throughput=round(items / (mean_ms / 1000), 1) if mean_ms else 0.0,
+        peak_memory_kb=round(peak / 1024, 1),
+    )
+
+
+async def _replayed_search(fixture: dict) -> List[dict]:
+    backend = fixture["backend"]
+    with replay(fixture) as transport:
+        responses = await execute_search(backend, fixture["queries"], fixture.get("params", {}))
+    if transport.unmatched:
+        raise RuntimeError(f"{backend} made requests that are not in its fixture: {transport.unmatched[:3]}")
+    return responses
+
+
+async def run_benchmarks(fixtures: List[dict], iterations: int, token_counter: TokenCounter) -> List[StageResult]:
+    """Benchmark every backend adapter, then the shared pipeline stages on their combined output."""
+    results = []
+    responses = []
+    for fixture in fixtures:
+        n_queries = len(fixture["queries"])
+        results.append(await measure(
+            f"adapter/{fixture['backend']}",
+            lambda fixture=fixture: _replayed_search(fixture),
+            n_queries, "queries", iterations,
+        ))
+        responses.extend(await _call(lambda fixture=fixture: _replayed_search(fixture)))
+
+    n_sources = sum(len(response.get("results", [])) for response in responses)
+    results.append(await measure(
+        "deduplicate_and_format_sources",
+        lambda: deduplicate_and_format_sources(responses, max_tokens_per_source=4000, total_token_budget=30_000,
+                                               token_counter=token_counter),
+        n_sources, "sources", iterations,
+    ))
+
+    embeddings = HashingEmbeddings()
+
+    def rerank():
+        return [
+            document
+            for response in responses
+            for document in split_and_rerank_search_results(embeddings, response["query"], response.get("results", []))
+        ]
+
+    n_chunks = len(_split_search_results([result for response in responses for result in response.get("results", [])]))
+    results.append(await measure("split_and_rerank_search_results", rerank, n_chunks, "chunks", iterations))
+
+    documents = await _call(rerank)
+    results.append(await measure(
+        "stitch_documents_by_url", lambda: stitch_documents_by_url(documents), len(documents), "chunks", iterations,
+    ))
+
+    queries = [response["query"] for response in responses]
+
+    async def run_index():
+        index = HybridIndex(embeddings=embeddings)
+        await index.add_search_results(responses)
+        for query in queries:
+            await index.format_context(query, k=10, token_budget=8_000, token_counter=token_counter)
+
+    results.append(await measure("run_index", run_index, n_sources, "sources", iterations))
+    return results
+
+
+async def check_hedging(fixture: dict, hedge_after: float = 0.05, deadline: float = 5.0) -> Optional[str]:
+    """Check that a hedged fusion search reaches the backend again while its first request hangs.
+
+    Returns:
+        Optional[str]: What went wrong, or None if the hedge answered
+    """
+    backend = fixture["backend"]
+    query = fixture["queries"][0]
+    with replay(fixture, stall_first=True) as transport:
+        responses = await _call(lambda: fusion_search_async(
+            [query], backends=[backend], backend_params={backend: fixture.get("params", {})},
+            deadline=deadline, hedge_after=hedge_after,
+        ))
+    if transport.requests < 2:
+        return f"hedge of {backend} made no second request"
+    if not any(response.get("results") for response in responses):
+        return f"hedge of {backend} returned no results before the {deadline}s deadline"
+    return None
+
+
+def find_regressions(results: List[StageResult], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Stages that are slower or use more memory than the baseline allows."""
+    regressions = []
+    for result in results:
+        reference = baseline.get(result.stage)
+        if reference is None:
+            continue
+        allowed_ms = max(reference["p50_ms"] * (1 + tolerance), reference["p50_ms"] + MIN_REGRESSION_MS)
+        if result.p50_ms > allowed_ms:
+            regressions.append(f"{result.stage}: p50 {result.p50_ms:.2f} ms > {allowed_ms:.2f} ms allowed")
+        allowed_kb = reference["peak_memory_kb"] * (1 + tolerance)
+        if result.peak_memory_kb > allowed_kb:
+            regressions.append(f"{result.stage}: peak memory {result.peak_memory_kb:.0f} KB > {allowed_kb:.0f} KB allowed")
+    return regressions
+
+
+def format_results(results: List[StageResult]) -> str:
+    lines = [f"{'stage':<36}{'p50 ms':>10}{'p95 ms':>10}{'throughput':>22}{'peak KB':>12}"]
+    for result in results:
+        throughput = f"{result.throughput:,.0f} {result.unit}/s"
+        lines.append(f"{result.stage:<36}{result.p50_ms:>10.2f}{result.p95_ms:>10.2f}{throughput:>22}{result.peak_memory_kb:>12,.0f}")
+    return "\n".join(lines)
+
+
+def load_fixtures(directory: str, backends: Optional[List[str]] = None) -> List[dict]:
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            fixture = load_fixture(os.path.join(directory, name))
+            if not backends or fixture["backend"] in backends:
+                fixtures.append(fixture)
+    return fixtures
+
+
+async def record_fixture(backend: str, queries: List[str], params: dict, path: str) -> bool:
+    """Run live searches and save their HTTP responses as a fixture.
+
+    Returns:
+        bool: Whether any response was recorded (an existing fixture is kept otherwise)
+    """
+    async with record(backend, queries, params) as fixture:
+        await execute_search(backend, queries, params)
+    if not fixture["responses"]:
+        print(f"No HTTP responses were recorded for {backend}, keeping {path}")
+        return False
+    save_fixture(fixture, path)
+    print(f"Recorded {len(fixture['responses'])} responses to {path}")
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory of recorded backend fixtures")
+    parser.add_argument("--backends", help="Comma-separated backends to include (default: all fixtures)")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed iterations per stage")
+    parser.add_argument("--tokenizer", default="chars",
+                        help="Tokenizer for the formatting stages; 'chars' needs no download")
+    parser.add_argument("--baseline", help="Fail if results regress against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--save-baseline", help="Write the results as a new baseline file")
+    parser.add_argument("--json", help="Write the results as JSON")
+    parser.add_argument("--record", metavar="BACKEND", help="Record a new fixture for BACKEND from the live API")
+    parser.add_argument("--query", action="append", default=[], help="Query to record (repeatable)")
+    parser.add_argument("--params", default="{}", help="Keyword arguments of the recorded backend's search function, as JSON")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        if not args.query:
+            parser.error("--record needs at least one --query")
+        path = os.path.join(args.fixtures, f"{args.record}.json")
+        return 0 if asyncio.run(record_fixture(args.record, args.query, json.loads(args.params), path)) else 1
+
+    fixtures = load_fixtures(args.fixtures, args.backends.split(",") if args.backends else None)
+    if not fixtures:
+        print(f"No fixtures found in {args.fixtures}")
+        return 1
+    token_counter = CharTokenCounter() if args.tokenizer == "chars" else get_token_counter(tokenizer=args.tokenizer)
+
+    saved_env = {name: os.environ.pop(name) for name in _GOOGLE_API_ENV if name in os.environ}
+    try:
+        results = asyncio.run(run_benchmarks(fixtures, args.iterations, token_counter))
+        hedging_failure = asyncio.run(check_hedging(fixtures[0]))
+    finally:
+        os.environ.update(saved_env)
+    print(format_results(results))
+    if hedging_failure:
+        print(f"Hedging check failed: {hedging_failure}")
+        return 1
+
+    backends = sorted(fixture["backend"] for fixture in fixtures)
+    report = {"backends": backends, "stages": {result.stage: asdict(result) for result in results}}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["backends"] != backends:
+            # Pipeline stages process the output of all backends, so only adapters are comparable
+            print(f"Baseline was recorded with backends {baseline['backends']}, comparing adapter stages only")
+            results = [result for result in results if result.stage.startswith("adapter/")]
+        regressions = find_regressions(results, baseline["stages"], args.tolerance)
+        if regressions:
+            print("Regressions against baseline:\n  " + "\n  ".join(regressions))
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
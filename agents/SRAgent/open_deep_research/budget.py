@@ -0,0 +1,183 @@
+"""Token counting and context budget allocation for search results.
+
+Token counts use the target model's tokenizer when one is available locally
+(tiktoken for OpenAI models, a Hugging Face tokenizer when requested with an
+``hf:`` prefix) and fall back on ``cl100k_base``, or on 4 characters per token
+if tiktoken is not installed. Encodings are memoized so a text that appears in
+several places is only tokenized once.
+"""
+
+import functools
+import math
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+DEFAULT_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = "... [truncated]"
+
+
+class TokenCounter:
+    """Counts and truncates text in tokens of a specific tokenizer."""
+
+    def __init__(self, name: str, encode, decode):
+        self.name = name
+        self._encode_uncached = encode
+        self._decode = decode
+        # Memoize encodings by text; str hashes are cached so lookups are cheap
+        self.encode = functools.lru_cache(maxsize=256)(self._encode)
+
+    def _encode(self, text: str) -> tuple:
+        return tuple(self._encode_uncached(text))
+
+    def decode(self, tokens: Sequence[int]) -> str:
+        return self._decode(list(tokens))
+
+    def count(self, text: Optional[str]) -> int:
+        if not text:
+            return 0
+        return len(self.encode(text))
+
+    def truncate(self, text: str, max_tokens: int, marker: str = TRUNCATION_MARKER) -> str:
+        """Cut text to at most max_tokens tokens, appending marker if anything was removed."""
+        if not text:
+            return text
+        tokens = self.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+        return self.decode(tokens[:max_tokens]) + marker
+
+
+class CharTokenCounter(TokenCounter):
+    """Fallback used without a tokenizer: every CHARS_PER_TOKEN characters count as one token."""
+
+    def __init__(self):
+        self.name = "chars"
+
+    def count(self, text: Optional[str]) -> int:
+        return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+    def truncate(self, text: str, max_tokens: int, marker: str = TRUNCATION_MARKER) -> str:
+        if not text or len(text) <= max_tokens * CHARS_PER_TOKEN:
+            return text
+        if max_tokens <= 0:
+            return ""
+        return text[:max_tokens * CHARS_PER_TOKEN] + marker
+
+
+def _model_name(model: str) -> str:
+    # Accept "provider:model" strings as used by init_chat_model
+    return model.split(":", 1)[1] if ":" in model else model
+
+
+@functools.lru_cache(maxsize=32)
+def get_token_counter(model: Optional[str] = None, tokenizer: Optional[str] = None) -> TokenCounter:
+    """Return a (shared) token counter for a model.
+
+    Args:
+        model: Target model name, optionally prefixed with its provider
+        tokenizer: Explicit tokenizer to use instead of guessing from the model,
+            e.g. "o200k_base" (tiktoken encoding) or "hf:deepseek-ai/DeepSeek-V3"
+
+    Returns:
+        TokenCounter for the best tokenizer available locally
+    """
+    if tokenizer and tokenizer.startswith("hf:"):
+        try:
+            from transformers import AutoTokenizer
+
+            hf_tokenizer = AutoTokenizer.from_pretrained(tokenizer[3:])
+            return TokenCounter(
+                tokenizer,
+                lambda text: hf_tokenizer.encode(text, add_special_tokens=False),
+                hf_tokenizer.decode,
+            )
+        except Exception as e:
+            print(f"Warning: Could not load tokenizer {tokenizer}: {str(e)}")
+
+    if tiktoken is None:
+        return CharTokenCounter()
+
+    encoding = None
+    if tokenizer and not tokenizer.startswith("hf:"):
+        encoding = tiktoken.get_encoding(tokenizer)
+    elif model:
+        try:
+            encoding = tiktoken.encoding_for_model(_model_name(model))
+        except KeyError:
+            encoding = None
+    if encoding is None:
+        encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    return TokenCounter(encoding.name, functools.partial(encoding.encode, disallowed_special=()), encoding.decode)
+
+
+def allocate_token_budget(
+    lengths: Sequence[int],
+    total_budget: int,
+    weights: Optional[Sequence[float]] = None,
+) -> List[int]:
+    """Split a token budget across sources in proportion to their weights.
+
+    Sources shorter than their share keep their full length, and the tokens
+    they leave unused are redistributed over the remaining sources
+    (water-filling), so the budget is spent where it is needed.
+
+    Args:
+        lengths: Token length of each source
+        total_budget: Total number of tokens available
+        weights: Relative importance of each source (e.g. search score); equal if omitted
+
+    Returns:
+        List[int]: Tokens allocated to each source, never more than its length
+    """
+    n = len(lengths)
+    allocation = [0] * n
+    if n == 0 or total_budget <= 0:
+        return allocation
+    weights = [max(float(w), 1e-6) for w in weights] if weights else [1.0] * n
+
+    remaining = total_budget
+    active = set(range(n))
+    while active and remaining > 0:
+        total_weight = sum(weights[i] for i in active)
+        shares = {i: remaining * weights[i] / total_weight for i in active}
+        satisfied = [i for i in active if lengths[i] <= shares[i]]
+        if not satisfied:
+            for i in active:
+                allocation[i] = int(shares[i])
+            break
+        for i in satisfied:
+            allocation[i] = lengths[i]
+            remaining -= lengths[i]
+            active.remove(i)
+    return allocation
+
+
+def source_weights(sources: Sequence[Dict]) -> List[float]:
+    """Weights for budget allocation: search scores when every source has one, otherwise rank."""
+    scores = [source.get("score") for source in sources]
+    if scores and all(isinstance(score, (int, float)) and score > 0 for score in scores):
+        return [float(score) for score in scores]
+    return [1.0 / (rank + 1) for rank in range(len(sources))]
+
+
+def fit_texts_to_budget(
+    texts: Sequence[str],
+    total_budget: int,
+    counter: TokenCounter,
+    weights: Optional[Sequence[float]] = None,
+) -> List[str]:
+    """Truncate texts so that together they fit in total_budget tokens."""
+    lengths = [counter.count(text) for text in texts]
+    allocation = allocate_token_budget(lengths, total_budget, weights)
+    return [
+        text if length <= budget else counter.truncate(text, budget)
+        for text, length, budget in zip(texts, lengths, allocation)
+    ]
+
@@ -0,0 +1,196 @@
+"""Small on-disk key/value caches shared across research runs.
+
+Each named cache is a SQLite file under the cache directory (set with the
+OPEN_DEEP_RESEARCH_CACHE_DIR environment variable). Entries are evicted least
+recently used first once a cache grows past its size limit; caches without a
+limit keep entries until they are expired explicitly.
+
+SQLite calls block, and a write may trigger an eviction sweep, so coroutines
+use the ``a``-prefixed methods, which run them in a worker thread.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "open_deep_research")
+DEFAULT_MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def get_cache_dir() -> str:
+    """Directory holding the cache files."""
+    return os.environ.get("OPEN_DEEP_RESEARCH_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def content_hash(*parts: Union[str, bytes]) -> str:
+    """Stable SHA-256 key for one or more strings/bytes."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class SQLiteCache:
+    """Size-bounded LRU cache of bytes values stored in a SQLite file (unbounded if max_bytes is None)."""
+
+    def __init__(self, name: str, max_bytes: Optional[int] = DEFAULT_MAX_CACHE_BYTES, directory: Optional[str] = None):
+        directory = directory or get_cache_dir()
+        os.makedirs(directory, exist_ok=True)
+        self.name = name
+        self.path = os.path.join(directory, f"{name}.sqlite")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            self._size += len(value) - (old[0] if old else 0)
+            if self.max_bytes is not None and self._size > self.max_bytes:
+                self._evict()
+
+    def get_many(self, keys: Iterable[str]) -> List[Optional[bytes]]:
+        """Values of several keys in one locked pass, None for missing keys."""
+        with self._lock:
+            values = []
+            now = time.time()
+            for key in keys:
+                row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self.hits += 1
+                    self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                    values.append(row[0])
+            return values
+
+    def set_many(self, items: Dict[str, bytes]) -> None:
+        for key, value in items.items():
+            self.set(key, value)
+
+    def get_text(self, key: str) -> Optional[str]:
+        value = self.get(key)
+        return None if value is None else value.decode("utf-8")
+
+    def set_text(self, key: str, value: str) -> None:
+        self.set(key, value.encode("utf-8"))
+
+    async def aget(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: bytes) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    async def aget_many(self, keys: Iterable[str]) -> List[Optional[bytes]]:
+        return await asyncio.to_thread(self.get_many, list(keys))
+
+    async def aset_many(self, items: Dict[str, bytes]) -> None:
+        await asyncio.to_thread(self.set_many, dict(items))
+
+    async def aget_text(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get_text, key)
+
+    async def aset_text(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self.set_text, key, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._size -= old[0]
+
+    def touch(self, key: str) -> None:
+        """Mark an entry as used now without reading it."""
+        with self._lock:
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+
+    def expire(self, max_age_seconds: float) -> int:
+        """Delete entries that have not been used for longer than ``max_age_seconds``.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        with self._lock:
+            cutoff = time.time() - max_age_seconds
+            freed = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries WHERE accessed < ?", (cutoff,)).fetchone()[0]
+            cursor = self._conn.execute("DELETE FROM entries WHERE accessed < ?", (cutoff,))
+            self._size -= freed
+            return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._size = 0
+
+    def _evict(self) -> None:
+        # Drop least recently used entries until we are back under 90% of the limit
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bytes": self._size,
+        }
+
+
+_caches: Dict[str, SQLiteCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, max_bytes: Optional[int] = DEFAULT_MAX_CACHE_BYTES) -> SQLiteCache:
+    """Return the process-wide cache with the given name, creating it on first use."""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = SQLiteCache(name, max_bytes=max_bytes)
+        return _caches[name]
+
+
+def all_caches() -> Dict[str, SQLiteCache]:
+    """Every cache opened in this process, by name."""
+    with _caches_lock:
+        return dict(_caches)
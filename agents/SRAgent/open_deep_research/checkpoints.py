@@ -0,0 +1,148 @@
+"""Durable local checkpoints of research runs, with resume and retention.
+
+Runs are checkpointed to a SQLite file (set with the RESEARCH_CHECKPOINT_DB
+environment variable, by default under the cache directory), so a run that is
+interrupted by a crash or restart continues from its last completed step when
+it is started again with the same thread id.
+
+A side table records when each thread was last active and whether it
+finished. Finished threads are compacted to their final checkpoint and deleted
+after a retention period; unfinished threads are deleted once they have been
+idle for longer than another, longer period. Texts in the content store that
+no remaining thread can refer to are expired at the same time.
+"""
+
+import asyncio
+import contextlib
+import os
+import time
+from typing import Dict, Optional
+
+from open_deep_research.cache import get_cache_dir
+from open_deep_research.content_store import content_store
+
+try:
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+except ImportError:
+    AsyncSqliteSaver = None
+
+# Finished threads are kept (compacted) this long so their final state can still be read
+FINISHED_RETENTION_SECONDS = 7 * 24 * 3600
+# Unfinished threads idle for this long are considered abandoned
+STALE_RETENTION_SECONDS = 30 * 24 * 3600
+
+# Latest checkpoint of each namespace of a thread
+_LATEST = (
+    "SELECT checkpoint_ns, MAX(checkpoint_id) AS checkpoint_id FROM checkpoints "
+    "WHERE thread_id = ? GROUP BY checkpoint_ns"
+)
+
+
+def get_checkpoint_path() -> str:
+    """SQLite file holding the checkpoints."""
+    return os.environ.get("RESEARCH_CHECKPOINT_DB", os.path.join(get_cache_dir(), "checkpoints.sqlite"))
+
+
+@contextlib.asynccontextmanager
+async def open_checkpointer(path: Optional[str] = None):
+    """Open the durable checkpointer for the duration of the block.
+
+    Yields:
+        AsyncSqliteSaver: Checkpointer to compile a graph with
+    """
+    if AsyncSqliteSaver is None:
+        raise ImportError(
+            "Durable checkpoints require langgraph-checkpoint-sqlite. "
+            "Please install it with 'pip install langgraph-checkpoint-sqlite'."
+        )
+    path = path or get_checkpoint_path()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(path) as saver:
+        await saver.setup()
+        await saver.conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_status ("
+            "thread_id TEXT PRIMARY KEY, updated REAL NOT NULL, finished INTEGER NOT NULL DEFAULT 0)"
+        )
+        await saver.conn.commit()
+        yield saver
+
+
+async def mark_thread(saver, thread_id: str, finished: bool = False) -> None:
+    """Record that a thread was active now, and whether it has finished."""
+    await saver.conn.execute(
+        "INSERT OR REPLACE INTO thread_status (thread_id, updated, finished) VALUES (?, ?, ?)",
+        (thread_id, time.time(), int(finished)),
+    )
+    await saver.conn.commit()
+
+
+async def compact_thread(saver, thread_id: str, drop_subgraphs: bool = False) -> int:
+    """Delete all but the latest checkpoint of each namespace of a thread.
+
+    The latest checkpoint and its pending writes are all a resume needs; older
+    ones only serve the history view.
+
+    Args:
+        saver: Open checkpointer
+        thread_id: Thread to compact
+        drop_subgraphs: Also delete subgraph checkpoints (only useful once the thread has finished)
+
+    Returns:
+        int: Number of checkpoints deleted
+    """
+    async with saver.lock:
+        if drop_subgraphs:
+            await saver.conn.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns != ''", (thread_id,))
+            await saver.conn.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns != ''", (thread_id,))
+        await saver.conn.execute(
+            f"DELETE FROM writes WHERE thread_id = ? AND (checkpoint_ns, checkpoint_id) NOT IN ({_LATEST})",
+            (thread_id, thread_id),
+        )
+        cursor = await saver.conn.execute(
+            f"DELETE FROM checkpoints WHERE thread_id = ? AND (checkpoint_ns, checkpoint_id) NOT IN ({_LATEST})",
+            (thread_id, thread_id),
+        )
+        await saver.conn.commit()
+        return cursor.rowcount
+
+
+async def finish_thread(saver, thread_id: str) -> None:
+    """Mark a thread finished and keep only its final checkpoint."""
+    await compact_thread(saver, thread_id, drop_subgraphs=True)
+    await mark_thread(saver, thread_id, finished=True)
+
+
+async def apply_retention(
+    saver,
+    finished_retention_seconds: float = FINISHED_RETENTION_SECONDS,
+    stale_retention_seconds: float = STALE_RETENTION_SECONDS,
+) -> Dict[str, int]:
+    """Delete finished threads past their retention and abandoned unfinished threads.
+
+    Texts of the content store unused for longer than both retention periods
+    are deleted as well, since every thread that could refer to them is gone.
+
+    Returns:
+        Dict[str, int]: Number of finished and stale threads and of content store texts deleted
+    """
+    now = time.time()
+    async with saver.conn.execute(
+        "SELECT thread_id, finished FROM thread_status WHERE (finished = 1 AND updated < ?) OR (finished = 0 AND updated < ?)",
+        (now - finished_retention_seconds, now - stale_retention_seconds),
+    ) as cursor:
+        expired = await cursor.fetchall()
+
+    deleted = {"finished": 0, "stale": 0, "content": 0}
+    for thread_id, finished in expired:
+        await saver.adelete_thread(thread_id)
+        await saver.conn.execute("DELETE FROM thread_status WHERE thread_id = ?", (thread_id,))
+        deleted["finished" if finished else "stale"] += 1
+    await saver.conn.commit()
+    if expired:
+        print(f"Deleted {deleted['finished']} finished and {deleted['stale']} stale research threads")
+    deleted["content"] = await asyncio.to_thread(
+        content_store.expire, max(finished_retention_seconds, stale_retention_seconds)
+    )
+    return deleted
@@ -26,6 +26,8 @@ class SearchAPI(Enum):
     LINKUP = "linkup"
     DUCKDUCKGO = "duckduckgo"
     GOOGLESEARCH = "googlesearch"
+    FUSION = "fusion"
+    LOCAL = "local"
     NONE = "none"
 
 @dataclass(kw_only=True)
@@ -35,11 +37,28 @@ class WorkflowConfiguration:
     report_structure: str = DEFAULT_REPORT_STRUCTURE
     search_api: SearchAPI = SearchAPI.TAVILY
     search_api_config: Optional[Dict[str, Any]] = None
+    search_deadline_seconds: Optional[float] = None # Time allowed for each search call of a node; slower searches are cancelled
+    search_coalesce_similarity: Optional[float] = None # Also merge in-flight queries at least this similar (cosine, embedding_model); None: identical queries only
     process_search_results: Literal["summarize", "split_and_rerank"] | None = None
     summarization_model_provider: str = "anthropic"
     summarization_model: str = "claude-3-5-haiku-latest"
+    summarization_max_concurrency: int = 8 # Maximum summarization calls in flight per search
+    summarization_min_chars: int = 1000 # Pages shorter than this are not summarized
+    summarization_batch_size: int = 1 # Short pages summarized per call (1: no batching)
     max_structured_output_retries: int = 3
+    model_max_concurrency: Optional[int] = None # Requests in flight per chat model, shared by all nodes (None: unlimited)
+    max_concurrent_sections: Optional[int] = None # Section nodes (query generation, search, writing) running at the same time (None: all at once)
+    provider_tokens_per_minute: Optional[Dict[str, int]] = None # Token rate limit per provider, e.g. {"anthropic": 400000}; sections wait for budget of writer_provider
+    section_token_estimate: int = 20000 # Tokens one section is expected to use, charged against provider_tokens_per_minute
+    speculative_section_research: bool = False # Start researching planned sections while human_feedback waits for approval
+    llm_response_cache: bool = False # Make planning, query writing and grading calls at temperature 0 and answer repeats from the on-disk response cache
     include_source_str: bool = False
+    search_token_budget: Optional[int] = None # Total tokens of search results per node (None: per-source limits only)
+    tokenizer: Optional[str] = None # Tokenizer for search budgets, e.g. "o200k_base" or "hf:<repo>" (default: from writer model)
+    embedding_model: str = "openai:text-embedding-3-small" # Embeddings for split_and_rerank; "local" or "local:<model>" for offline backends
+    use_run_index: bool = False # Accumulate all sources of a run in one index and write sections from its top-k chunks
+    run_index_top_k: int = 10 # Chunks retrieved from the run index per section
+    run_index_embeddings: bool = False # Fuse BM25 with vector search (embedding_model) in the run index
     base_url: Optional[str] = None  # Base URL for the API, if needed
     api_key: Optional[str] = None  # API key for authentication, if needed
     # Workflow-specific configuration
@@ -77,17 +96,30 @@ class MultiAgentConfiguration:
     process_search_results: Literal["summarize", "split_and_rerank"] | None = None
     summarization_model_provider: str = "anthropic"
     summarization_model: str = "claude-3-5-haiku-latest"
+    summarization_max_concurrency: int = 8 # Maximum summarization calls in flight per search
+    summarization_min_chars: int = 1000 # Pages shorter than this are not summarized
+    summarization_batch_size: int = 1 # Short pages summarized per call (1: no batching)
     include_source_str: bool = False
+    search_token_budget: Optional[int] = None # Total tokens of search results per tool call (None: per-source limits only)
+    tokenizer: Optional[str] = None # Tokenizer for search budgets, e.g. "o200k_base" or "hf:<repo>"
+    embedding_model: str = "openai:text-embedding-3-small" # Embeddings for split_and_rerank; "local" or "local:<model>" for offline backends
     
     # Multi-agent specific configuration
     number_of_queries: int = 2 # Number of search queries to generate per section
     supervisor_model: str = "anthropic:claude-3-7-sonnet-latest"
     researcher_model: str = "anthropic:claude-3-7-sonnet-latest"
+    model_max_concurrency: Optional[int] = None # Requests in flight per chat model, shared by all nodes (None: unlimited)
+    llm_response_cache: bool = False # Make planning, query writing and grading calls at temperature 0 and answer repeats from the on-disk response cache
     ask_for_clarification: bool = False # Whether to ask for clarification from the user
+    parallel_tool_calls: bool = False # Let the models request several tool calls per turn and run them concurrently
+    max_parallel_tool_calls: int = 4 # Tool calls of one message running at the same time when parallel_tool_calls is enabled
+    keep_recent_tool_observations: Optional[int] = None # Search results kept verbatim in prompts; older ones become digests of their sources (None: keep all)
+    tool_observation_digest_chars: int = 500 # Maximum length of the source list of a digested search result
     # MCP server configuration
     mcp_server_config: Optional[Dict[str, Any]] = None
     mcp_prompt: Optional[str] = None
     mcp_tools_to_include: Optional[list[str]] = None
+    mcp_tools_ttl_seconds: float = 300.0 # Age after which cached MCP tool lists are refreshed in the background
 
     @classmethod
     def from_runnable_config(
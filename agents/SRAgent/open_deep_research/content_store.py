@@ -0,0 +1,128 @@
+"""Side store for large texts referenced from graph state.
+
+Formatted search results and fetched pages can be tens of thousands of
+characters, and everything in graph state is serialized into every
+checkpoint. Nodes instead put such texts into the content store and keep only
+the returned reference (``content:<sha256>``) in state; the node that needs
+the text resolves it when it runs.
+
+Texts are content-addressed, so storing the same text twice is free, and are
+kept in the "content_store" cache on disk, so references in a checkpoint still
+resolve after a restart. That cache has no size limit, since evicting a text
+would break the checkpoints referring to it; instead ``apply_retention`` in
+``checkpoints`` expires texts unused for longer than any thread is kept.
+Recently used texts are also kept in memory.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from open_deep_research.cache import content_hash, get_cache
+
+CONTENT_MEMORY_MAX_BYTES = 64 * 1024 * 1024
+REF_PREFIX = "content:"
+
+
+class MissingContentError(LookupError):
+    """A reference from state whose text is not in the content store."""
+
+
+def is_content_ref(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+
+class ContentStore:
+    """Content-addressed texts on disk with an in-memory LRU in front."""
+
+    def __init__(self, memory_bytes: int = CONTENT_MEMORY_MAX_BYTES):
+        self.memory_bytes = memory_bytes
+        self._cache = None
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        # Opened on first use so importing the graphs does not create the file
+        if self._cache is None:
+            self._cache = get_cache("content_store", max_bytes=None)
+        return self._cache
+
+    def _remember(self, ref: str, text: str) -> None:
+        with self._lock:
+            if ref in self._memory:
+                self._memory.move_to_end(ref)
+                return
+            self._memory[ref] = text
+            self._memory_size += len(text)
+            while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def put(self, text: str) -> str:
+        """Store a text and return its reference."""
+        ref = REF_PREFIX + content_hash(text)
+        with self._lock:
+            stored = ref in self._memory
+        if stored:
+            # Keep the text on disk from expiring while it is in use
+            self.cache.touch(ref)
+        else:
+            self.cache.set_text(ref, text)
+        self._remember(ref, text)
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        """The text of a reference, or None if it was never stored or has expired."""
+        with self._lock:
+            text = self._memory.get(ref)
+            if text is not None:
+                self._memory.move_to_end(ref)
+        if text is not None:
+            self.cache.touch(ref)
+            return text
+        text = self.cache.get_text(ref)
+        if text is not None:
+            self._remember(ref, text)
+        return text
+
+    def load(self, ref: str) -> str:
+        """The text of a reference, raising MissingContentError if it is not stored."""
+        text = self.get(ref)
+        if text is None:
+            raise MissingContentError(f"Content {ref} is not in the content store")
+        return text
+
+    def put_json(self, value: Any) -> str:
+        return self.put(json.dumps(value, sort_keys=True, default=str))
+
+    def get_json(self, ref: str) -> Any:
+        return json.loads(self.load(ref))
+
+    def expire(self, max_age_seconds: float) -> int:
+        """Delete texts on disk that have not been used for longer than ``max_age_seconds``."""
+        return self.cache.expire(max_age_seconds)
+
+
+content_store = ContentStore()
+
+
+def store_content(text: str) -> str:
+    """Put a text into the shared content store and return the reference to keep in state."""
+    return content_store.put(text)
+
+
+def load_content(ref: Optional[str]) -> str:
+    """Resolve a reference from state to its text.
+
+    Values that are not references (e.g. state written before sources were
+    stored by reference) are returned unchanged.
+
+    Raises:
+        MissingContentError: If the referenced text is not in the content store
+    """
+    if not is_content_ref(ref):
+        return ref or ""
+    return content_store.load(ref)
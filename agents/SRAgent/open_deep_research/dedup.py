@@ -0,0 +1,171 @@
+"""URL canonicalization and near-duplicate detection for search results."""
+
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "yclid", "igshid",
+    "ref_src", "ref_url", "referrer", "cmpid", "_hsenc", "_hsmi",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+
+# Host prefixes that usually, but not always, serve the same content as the bare domain
+MIRROR_HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+
+_ARXIV_ID_RE = re.compile(r"^/(?:abs|pdf|html)/(?P<id>[^/]+?(?:/\d+)?)(?:v\d+)?(?:\.pdf)?/?$")
+_WORD_RE = re.compile(r"\w+")
+
+SIMHASH_BITS = 64
+# Two documents whose simhashes differ in at most this many bits are near-duplicates
+SIMHASH_MAX_DISTANCE = 6
+SHINGLE_SIZE = 3
+# Texts with fewer shingles are too short for a reliable fingerprint
+MIN_SHINGLES = 20
+# Only the beginning of each document is fingerprinted
+MAX_FINGERPRINT_CHARS = 20_000
+
+
+def canonicalize_url(url: str, aggressive: Optional[bool] = None) -> str:
+    """Normalize a URL so that trivially different links to the same page compare equal.
+
+    Lowercases the scheme and host, drops default ports, fragments and tracking
+    parameters, and maps every arXiv abs/pdf/html variant of a paper to its
+    versionless abs page. Everything else, including the order of the query
+    parameters, is kept, since it can change what the server returns.
+
+    Args:
+        url: URL to normalize
+        aggressive: Also upgrade http to https, drop mirror host prefixes (www., m., ...)
+            and trailing slashes and sort the query. These merge more duplicates but
+            also some distinct pages. None reads the AGGRESSIVE_URL_CANONICALIZATION
+            environment variable.
+    """
+    if not url:
+        return url
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    if not parts.netloc:
+        return url
+    if aggressive is None:
+        aggressive = os.environ.get("AGGRESSIVE_URL_CANONICALIZATION", "").strip().lower() in ("1", "true", "yes", "on")
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if aggressive:
+        if scheme == "http":
+            scheme = "https"
+        for prefix in MIRROR_HOST_PREFIXES:
+            if host.startswith(prefix):
+                host = host[len(prefix):]
+                break
+    default_port = {"http": 80, "https": 443}.get(parts.scheme.lower())
+    if parts.port and parts.port != default_port:
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    if host.removeprefix("www.") in ("arxiv.org", "export.arxiv.org"):
+        match = _ARXIV_ID_RE.match(re.sub(r"/{2,}", "/", path))
+        if match:
+            return f"https://arxiv.org/abs/{match.group('id')}"
+    if aggressive:
+        path = re.sub(r"/{2,}", "/", path)
+        if len(path) > 1:
+            path = path.rstrip("/")
+
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    ]
+    if aggressive:
+        query.sort()
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash of the word shingles of a text, or None if the text is too short."""
+    words = _WORD_RE.findall(text[:MAX_FINGERPRINT_CHARS].lower())
+    if len(words) < SHINGLE_SIZE + MIN_SHINGLES - 1:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    # Each bit of the fingerprint is the majority vote of that bit over all shingles
+    bits = (hashes[:, None] >> np.arange(SIMHASH_BITS, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int(np.packbits(votes[::-1]).view(">u8")[0])
+
+
+class NearDuplicateIndex:
+    """Finds near-duplicate texts by SimHash with LSH banding.
+
+    The fingerprint is split into SIMHASH_MAX_DISTANCE + 1 bands. Two
+    fingerprints within the distance threshold must agree on at least one band,
+    so only texts sharing a band are compared and the scan stays linear.
+    """
+
+    def __init__(self, max_distance: int = SIMHASH_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.n_bands = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.n_bands
+        self._buckets: Dict[tuple, List[int]] = {}
+
+    def _bands(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.n_bands):
+            yield band, (fingerprint >> (band * self.band_bits)) & mask
+
+    def find(self, fingerprint: int) -> Optional[int]:
+        """Return a stored fingerprint within the distance threshold, if any."""
+        for key in self._bands(fingerprint):
+            for candidate in self._buckets.get(key, ()):
+                if bin(candidate ^ fingerprint).count("1") <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, fingerprint: int) -> None:
+        for key in self._bands(fingerprint):
+            self._buckets.setdefault(key, []).append(fingerprint)
+
+
+@dataclass
+class DedupStats:
+    """How many sources and (estimated) tokens each deduplication step removed."""
+    sources_in: int = 0
+    sources_out: int = 0
+    removed: Dict[str, int] = field(default_factory=lambda: {"exact_url": 0, "canonical_url": 0, "near_duplicate": 0})
+    tokens_saved: Dict[str, int] = field(default_factory=lambda: {"exact_url": 0, "canonical_url": 0, "near_duplicate": 0})
+
+    def add(self, step: str, tokens: int) -> None:
+        self.removed[step] += 1
+        self.tokens_saved[step] += tokens
+
+    def summary(self) -> str:
+        steps = ", ".join(
+            f"{step}: {self.removed[step]} sources/{self.tokens_saved[step]} tokens" for step in self.removed
+        )
+        return f"Deduplicated {self.sources_in} -> {self.sources_out} sources ({steps})"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def counters(self) -> Dict[str, int]:
+        """Flat counters for the run metrics."""
+        return {
+            "sources_in": self.sources_in,
+            "sources_out": self.sources_out,
+            **{f"removed_{step}": count for step, count in self.removed.items()},
+            **{f"tokens_saved_{step}": tokens for step, tokens in self.tokens_saved.items()},
+        }
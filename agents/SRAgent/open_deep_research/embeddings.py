@@ -0,0 +1,167 @@
+"""Embedding backends, an on-disk embedding cache and vectorized similarity search.
+
+Model strings follow ``init_embeddings`` ("openai:text-embedding-3-small"),
+plus two offline backends:
+
+- ``local`` / ``local:hashing``: hashed word n-gram vectors, no download needed
+- ``local:<sentence-transformers model>``: a local Hugging Face model, if
+  ``langchain-huggingface`` is installed
+"""
+
+import functools
+import hashlib
+import re
+from typing import List, Optional, Sequence
+
+import numpy as np
+from langchain.embeddings import init_embeddings
+from langchain_core.embeddings import Embeddings
+
+from open_deep_research.cache import content_hash, get_cache
+
+DEFAULT_EMBEDDING_MODEL = "openai:text-embedding-3-small"
+EMBEDDING_BATCH_SIZE = 128
+HASHING_DIMENSIONS = 1024
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """Offline embeddings built from hashed word unigrams and bigrams.
+
+    Much weaker than a trained model, but deterministic, fast and available
+    on machines without network access or model weights.
+    """
+
+    def __init__(self, dimensions: int = HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        words = _TOKEN_RE.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if not features:
+            return vector.tolist()
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little") for f in features],
+            dtype=np.uint64,
+        )
+        # The low bits pick the bucket, the top bit picks the sign to reduce collision bias
+        indices = (hashes % np.uint64(self.dimensions)).astype(np.int64)
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, indices, signs)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding backend with an on-disk cache keyed by model and text hash.
+
+    Only texts missing from the cache are sent to the backend, deduplicated and
+    in batches of ``batch_size``.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.model = model
+        self.batch_size = batch_size
+        self.cache = get_cache("embeddings")
+
+    def _key(self, text: str) -> str:
+        return content_hash(self.model, text)
+
+    @staticmethod
+    def _decode(texts: Sequence[str], cached: List[Optional[bytes]]):
+        vectors: List[Optional[List[float]]] = []
+        missing: dict = {}
+        for i, (text, value) in enumerate(zip(texts, cached)):
+            if value is None:
+                vectors.append(None)
+                missing.setdefault(text, []).append(i)
+            else:
+                vectors.append(np.frombuffer(value, dtype=np.float32).tolist())
+        return vectors, missing
+
+    def _encode(self, texts: List[str], embedded: List[List[float]]) -> dict:
+        return {self._key(text): np.asarray(vector, dtype=np.float32).tobytes() for text, vector in zip(texts, embedded)}
+
+    @staticmethod
+    def _fill(vectors, missing: dict, texts: List[str], embedded: List[List[float]]) -> List[List[float]]:
+        for text, vector in zip(texts, embedded):
+            for i in missing[text]:
+                vectors[i] = vector
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors, missing = self._decode(texts, self.cache.get_many(self._key(text) for text in texts))
+        new_texts = list(missing)
+        embedded = []
+        for start in range(0, len(new_texts), self.batch_size):
+            embedded.extend(self.embeddings.embed_documents(new_texts[start:start + self.batch_size]))
+        self.cache.set_many(self._encode(new_texts, embedded))
+        return self._fill(vectors, missing, new_texts, embedded)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached = await self.cache.aget_many(self._key(text) for text in texts)
+        vectors, missing = self._decode(texts, cached)
+        new_texts = list(missing)
+        embedded = []
+        for start in range(0, len(new_texts), self.batch_size):
+            embedded.extend(await self.embeddings.aembed_documents(new_texts[start:start + self.batch_size]))
+        if new_texts:
+            await self.cache.aset_many(self._encode(new_texts, embedded))
+        return self._fill(vectors, missing, new_texts, embedded)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def _local_embeddings(name: str) -> Embeddings:
+    if name in ("", "hashing"):
+        return HashingEmbeddings()
+    try:
+        from langchain_huggingface import HuggingFaceEmbeddings
+    except ImportError:
+        print(f"Warning: langchain-huggingface is not installed, using hashing embeddings instead of {name}")
+        return HashingEmbeddings()
+    return HuggingFaceEmbeddings(model_name=name)
+
+
+@functools.lru_cache(maxsize=8)
+def get_embeddings(model: str = DEFAULT_EMBEDDING_MODEL) -> CachedEmbeddings:
+    """Return a cached embedding backend for a model string (shared per process)."""
+    if model == "local" or model.startswith("local:"):
+        backend = _local_embeddings(model.partition(":")[2])
+    else:
+        backend = init_embeddings(model)
+    return CachedEmbeddings(backend, model)
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Stack vectors into a contiguous float32 matrix with unit-length rows."""
+    matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_similar(matrix: np.ndarray, query_vector, k: int) -> List[int]:
+    """Indices of the k rows of a normalized matrix most similar to the query, best first."""
+    if len(matrix) == 0 or k <= 0:
+        return []
+    scores = matrix @ normalize_rows(query_vector)[0]
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])].tolist()
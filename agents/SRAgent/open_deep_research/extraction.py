@@ -0,0 +1,261 @@
+"""Main-content extraction for fetched web pages and PDFs.
+
+Parsing HTML and PDFs is CPU bound, so the heavy lifting runs in a shared
+process pool instead of on the event loop. This module is imported by the pool
+workers and therefore only depends on the parsing libraries, not on LangChain.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Literal, Optional, Union
+
+from bs4 import BeautifulSoup
+from markdownify import markdownify
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    # Fall back on the pure-Python parser if lxml is not installed
+    HTML_PARSER = "html.parser"
+
+# Pages larger than this are cut before parsing
+DEFAULT_MAX_HTML_BYTES = 2_000_000
+
+# Limits for text pulled out of a single PDF
+DEFAULT_MAX_PDF_PAGES = 30
+DEFAULT_MAX_PDF_CHARS = 100_000
+
+# Tags that never carry main content
+BOILERPLATE_TAGS = [
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas",
+    "nav", "header", "footer", "aside", "form", "button", "select",
+]
+
+# ARIA roles used for navigation chrome instead of tags
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "menu", "menubar"}
+
+# Candidate containers for the main content, in order of preference
+MAIN_CONTENT_SELECTORS = ["main", "article", "[role=main]", "#content", "#main-content", ".content"]
+
+# A main-content candidate must contain at least this much text to be trusted
+MIN_MAIN_CONTENT_CHARS = 200
+
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+_INLINE_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+@dataclass
+class ExtractionResult:
+    """Text extracted from a single document and what it cost to get it."""
+    text: str
+    bytes_in: int
+    bytes_out: int
+    seconds: float
+    truncated: bool
+
+
+def _collapse_whitespace(text: str) -> str:
+    text = _INLINE_SPACE_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
+    return "\n".join(line.strip() for line in text.splitlines()).strip()
+
+
+def extract_main_content(
+    html: Union[str, bytes],
+    output_format: Literal["text", "markdown"] = "text",
+    max_bytes: int = DEFAULT_MAX_HTML_BYTES,
+    encoding: Optional[str] = None,
+) -> ExtractionResult:
+    """Strip boilerplate from an HTML page and return its main content.
+
+    Args:
+        html: Page body, either decoded or as raw bytes
+        output_format: "text" for plain text, "markdown" to keep links and headings
+        max_bytes: Input is cut to this many bytes before parsing
+        encoding: Charset of ``html`` when it is given as bytes
+
+    Returns:
+        ExtractionResult with the cleaned text and size/timing information
+    """
+    start = time.perf_counter()
+    raw = html if isinstance(html, bytes) else html.encode("utf-8", errors="replace")
+    bytes_in = len(raw)
+    truncated = bytes_in > max_bytes
+    if truncated:
+        raw = raw[:max_bytes]
+    document = raw.decode(encoding or "utf-8", errors="replace")
+
+    soup = BeautifulSoup(document, HTML_PARSER)
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in soup.find_all(attrs={"role": True}):
+        if not tag.decomposed and str(tag.get("role", "")).lower() in BOILERPLATE_ROLES:
+            tag.decompose()
+
+    # Prefer an explicit main-content container when the page has one
+    root = None
+    for selector in MAIN_CONTENT_SELECTORS:
+        candidate = soup.select_one(selector)
+        if candidate is not None and len(candidate.get_text(strip=True)) >= MIN_MAIN_CONTENT_CHARS:
+            root = candidate
+            break
+    if root is None:
+        root = soup.body or soup
+
+    if output_format == "markdown":
+        text = markdownify(str(root))
+    else:
+        text = root.get_text(separator="\n")
+    text = _collapse_whitespace(text)
+
+    return ExtractionResult(
+        text=text,
+        bytes_in=bytes_in,
+        bytes_out=len(text.encode("utf-8")),
+        seconds=time.perf_counter() - start,
+        truncated=truncated,
+    )
+
+
+def extract_pdf_text(
+    data: bytes,
+    max_pages: int = DEFAULT_MAX_PDF_PAGES,
+    max_chars: int = DEFAULT_MAX_PDF_CHARS,
+) -> ExtractionResult:
+    """Extract text from a PDF page by page, stopping at the page or character cap.
+
+    Args:
+        data: Raw PDF bytes
+        max_pages: Maximum number of pages to read
+        max_chars: Maximum number of characters to return
+
+    Returns:
+        ExtractionResult with the concatenated page text
+    """
+    # Imported here so HTML-only workers never load PyMuPDF
+    import fitz
+
+    start = time.perf_counter()
+    pages = []
+    n_chars = 0
+    truncated = False
+    with fitz.open(stream=data, filetype="pdf") as document:
+        for page_number, page in enumerate(document):
+            if page_number >= max_pages or n_chars >= max_chars:
+                truncated = True
+                break
+            page_text = _collapse_whitespace(page.get_text("text"))
+            pages.append(page_text)
+            n_chars += len(page_text) + 2
+
+    text = "\n\n".join(pages)
+    if len(text) > max_chars:
+        text = text[:max_chars]
+        truncated = True
+
+    return ExtractionResult(
+        text=text,
+        bytes_in=len(data),
+        bytes_out=len(text.encode("utf-8")),
+        seconds=time.perf_counter() - start,
+        truncated=truncated,
+    )
+
+
+async def read_capped(chunks, max_bytes: int) -> bytes:
+    """Read an async stream of byte chunks, stopping once max_bytes have been received."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        if len(buffer) >= max_bytes:
+            break
+    return bytes(buffer[:max_bytes])
+
+
+@dataclass
+class ExtractionMetrics:
+    """Running totals for every extraction done in this process."""
+    documents: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    seconds: float = 0.0
+    truncated: int = 0
+    failures: int = 0
+
+    def record(self, result: ExtractionResult) -> None:
+        self.documents += 1
+        self.bytes_in += result.bytes_in
+        self.bytes_out += result.bytes_out
+        self.seconds += result.seconds
+        self.truncated += int(result.truncated)
+
+    def snapshot(self) -> dict:
+        return asdict(self)
+
+
+extraction_metrics = ExtractionMetrics()
+
+_executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_extraction_executor() -> concurrent.futures.ProcessPoolExecutor:
+    """Return the process pool shared by all extraction calls.
+
+    The pool size can be set with the EXTRACTION_WORKERS environment variable.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = int(os.environ.get("EXTRACTION_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+            _executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        return _executor
+
+
+def shutdown_extraction_executor() -> None:
+    """Stop the extraction pool, e.g. at the end of a run."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def _run_in_pool(fn) -> ExtractionResult:
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(get_extraction_executor(), fn)
+    except concurrent.futures.process.BrokenProcessPool:
+        # A worker died (e.g. OOM on a pathological page): rebuild the pool next time
+        # and finish this document in a thread so the caller still gets its text
+        shutdown_extraction_executor()
+        extraction_metrics.failures += 1
+        result = await asyncio.to_thread(fn)
+    extraction_metrics.record(result)
+    return result
+
+
+async def extract_main_content_async(
+    html: Union[str, bytes],
+    output_format: Literal["text", "markdown"] = "text",
+    max_bytes: int = DEFAULT_MAX_HTML_BYTES,
+    encoding: Optional[str] = None,
+) -> ExtractionResult:
+    """Run ``extract_main_content`` in the process pool without blocking the event loop."""
+    return await _run_in_pool(functools.partial(extract_main_content, html, output_format, max_bytes, encoding))
+
+
+async def extract_pdf_text_async(
+    data: bytes,
+    max_pages: int = DEFAULT_MAX_PDF_PAGES,
+    max_chars: int = DEFAULT_MAX_PDF_CHARS,
+) -> ExtractionResult:
+    """Run ``extract_pdf_text`` in the process pool without blocking the event loop."""
+    return await _run_in_pool(functools.partial(extract_pdf_text, data, max_pages, max_chars))
@@ -0,0 +1,154 @@
+"""Fan-out search over several backends with hedged requests and rank fusion.
+
+Backends run concurrently under a shared deadline. A backend that has not
+answered after ``hedge_after`` seconds gets a second, identical request and the
+first answer wins, which cuts tail latency on flaky APIs. Results of all
+backends that answered in time are merged per query with reciprocal rank
+fusion over canonical URLs.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from open_deep_research.dedup import canonicalize_url
+from open_deep_research.index import RRF_K, reciprocal_rank_scores
+
+DEFAULT_FUSION_BACKENDS = ["tavily", "arxiv", "pubmed"]
+
+# Time allowed for all backends of one fusion search
+DEFAULT_SEARCH_DEADLINE_SECONDS = 30.0
+
+
+async def hedged_call(call: Callable[[], Awaitable], hedge_after: Optional[float] = None, max_attempts: int = 2,
+                      hedge: Optional[Callable[[], Awaitable]] = None):
+    """Await ``call()``, starting a duplicate attempt if it is still running after ``hedge_after`` seconds.
+
+    The first attempt to succeed wins and the others are cancelled. If every
+    attempt fails, the last error is raised.
+
+    Args:
+        call: Factory returning a new awaitable for each attempt
+        hedge_after: Seconds before an extra attempt is started; None disables hedging
+        max_attempts: Maximum number of attempts running at the same time
+        hedge: Factory for the extra attempts (default: call)
+
+    Returns:
+        Result of the first successful attempt
+    """
+    if hedge_after is None or max_attempts <= 1:
+        return await call()
+
+    hedge = hedge or call
+    tasks = {asyncio.ensure_future(call())}
+    started = 1
+    error: Optional[BaseException] = None
+    try:
+        while tasks:
+            timeout = hedge_after if started < max_attempts else None
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if started < max_attempts and (not done or not tasks):
+                tasks.add(asyncio.ensure_future(hedge()))
+                started += 1
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def fuse_search_responses(responses_by_backend: Dict[str, List[Dict]], k: int = RRF_K) -> List[Dict]:
+    """Merge the search responses of several backends with reciprocal rank fusion.
+
+    Results are matched across backends by canonical URL. The first backend to
+    return a URL provides its title and content, and a longer raw_content from
+    another backend replaces a shorter one.
+
+    Args:
+        responses_by_backend: Search responses of each backend, as returned by its search function
+        k: RRF constant
+
+    Returns:
+        List[Dict]: One search response per query, with results sorted by fused score
+    """
+    queries: Dict[str, Dict[str, List[Dict]]] = {}
+    for backend, responses in responses_by_backend.items():
+        for response in responses:
+            queries.setdefault(response['query'], {})[backend] = response.get('results', [])
+
+    fused_responses = []
+    for query, results_by_backend in queries.items():
+        merged: Dict[str, Dict] = {}
+        rankings = []
+        for backend, results in results_by_backend.items():
+            ranking = []
+            for result in results:
+                key = canonicalize_url(result.get('url', ''))
+                if not key or key in ranking:
+                    continue
+                ranking.append(key)
+                if key not in merged:
+                    merged[key] = {**result, 'backends': [backend]}
+                else:
+                    merged[key]['backends'].append(backend)
+                    if len(result.get('raw_content') or '') > len(merged[key].get('raw_content') or ''):
+                        merged[key]['raw_content'] = result['raw_content']
+            rankings.append(ranking)
+
+        scores = reciprocal_rank_scores(rankings, k)
+        fused_results = [{**merged[key], 'score': scores[key]} for key in sorted(scores, key=scores.get, reverse=True)]
+        fused_responses.append({
+            'query': query,
+            'follow_up_questions': None,
+            'answer': None,
+            'images': [],
+            'results': fused_results,
+        })
+    return fused_responses
+
+
+async def fan_out_search(
+    search: Callable[[str], Awaitable[List[Dict]]],
+    backends: Sequence[str],
+    deadline: float = DEFAULT_SEARCH_DEADLINE_SECONDS,
+    hedge_after: Optional[float] = None,
+    hedge_search: Optional[Callable[[str], Awaitable[List[Dict]]]] = None,
+) -> Dict[str, List[Dict]]:
+    """Run ``search(backend)`` for every backend concurrently within a deadline.
+
+    Backends that fail, or are still running at the deadline (and are then
+    cancelled), are left out of the result. Hedged attempts call
+    ``hedge_search(backend)`` if given.
+
+    Returns:
+        Dict[str, List[Dict]]: Search responses keyed by backend
+    """
+    hedge_search = hedge_search or search
+    tasks = {
+        asyncio.ensure_future(hedged_call(
+            lambda backend=backend: search(backend),
+            hedge_after,
+            hedge=lambda backend=backend: hedge_search(backend),
+        )): backend
+        for backend in dict.fromkeys(backends)
+    }
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        print(f"Search deadline of {deadline}s reached, skipped backends: {', '.join(tasks[task] for task in pending)}")
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    responses = {}
+    for task in done:
+        if task.exception() is not None:
+            print(f"Warning: {tasks[task]} search failed: {str(task.exception())}")
+        else:
+            responses[tasks[task]] = task.result()
+    # Keep the configured backend order so fusion ties are broken deterministically
+    return {backend: responses[backend] for backend in tasks.values() if backend in responses}
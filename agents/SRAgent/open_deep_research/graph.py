@@ -1,6 +1,6 @@
-from typing import Literal
+import functools
+from typing import Literal, Optional
 
-from langchain.chat_models import init_chat_model
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 
@@ -11,6 +11,7 @@ from langgraph.types import interrupt, Command
 from open_deep_research.state import (
     ReportStateInput,
     ReportStateOutput,
+    Section,
     Sections,
     ReportState,
     SectionState,
@@ -30,16 +31,30 @@ from open_deep_research.prompts import (
 )
 
 from open_deep_research.configuration import Configuration
+from open_deep_research.content_store import load_content, store_content
+from open_deep_research.index import drop_run_index, new_run_key
+from open_deep_research.llm_cache import deterministic_model_args
+from open_deep_research.models import get_chat_model
+from open_deep_research.telemetry import timed_node
+from open_deep_research.scheduler import scheduled_section
+from open_deep_research.speculation import speculative_research
+from open_deep_research.structured import repairing_structured_output
 from open_deep_research.utils import (
     format_sections, 
     get_config_value, 
     get_search_params, 
+    get_coalescing_options,
+    get_configured_run_index,
+    get_search_token_counter,
+    search_into_index,
+    search_new_sources,
     select_and_execute_search,
     get_today_str
 )
 
 ## Nodes -- 
 
+@timed_node
 async def generate_report_plan(state: ReportState, config: RunnableConfig):
     """Generate the initial report plan with sections.
     
@@ -68,6 +83,7 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
 
     # Get configuration
     configurable = Configuration.from_runnable_config(config)
+    run_key = state.get("run_key") or new_run_key()
     report_structure = configurable.report_structure
     number_of_queries = configurable.number_of_queries
     search_api = get_config_value(configurable.search_api)
@@ -82,8 +98,8 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
-    structured_llm = writer_model.with_structured_output(Queries)
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs, max_concurrency=configurable.model_max_concurrency, **deterministic_model_args(configurable, writer_model_kwargs)) 
+    structured_llm = repairing_structured_output(writer_model, Queries, configurable.max_structured_output_retries)
 
     # Format system instructions
     system_instructions_query = report_planner_query_writer_instructions.format(
@@ -101,7 +117,21 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     query_list = [query.search_query for query in results.queries]
 
     # Search the web with parameters
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
+    if configurable.use_run_index:
+        # Keep the sources in the run index so sections can reuse them
+        run_index = get_configured_run_index(configurable, config, run_key)
+        await search_into_index(search_api, query_list, params_to_pass, run_index,
+                                deadline=configurable.search_deadline_seconds,
+                                **get_coalescing_options(configurable))
+        source_str = await run_index.format_context(" ".join([topic, *query_list]), configurable.run_index_top_k,
+                                                    token_budget=configurable.search_token_budget,
+                                                    token_counter=get_search_token_counter(configurable))
+    else:
+        source_str = await select_and_execute_search(search_api, query_list, params_to_pass,
+                                                     token_budget=configurable.search_token_budget,
+                                                     token_counter=get_search_token_counter(configurable),
+                                                     deadline=configurable.search_deadline_seconds,
+                                                     **get_coalescing_options(configurable))
 
     # Format system instructions
     system_instructions_sections = report_planner_instructions.format(topic=topic, report_organization=report_structure, context=source_str, feedback=feedback)
@@ -118,27 +148,35 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig):
     # Run the planner
     if planner_model == "claude-3-7-sonnet-latest":
         # Allocate a thinking budget for claude-3-7-sonnet-latest as the planner model
-        planner_llm = init_chat_model(model=planner_model, 
+        planner_llm = get_chat_model(model=planner_model, 
                                       model_provider=planner_provider, 
                                       max_tokens=20_000, 
-                                      thinking={"type": "enabled", "budget_tokens": 16_000})
+                                      thinking={"type": "enabled", "budget_tokens": 16_000},
+                                      max_concurrency=configurable.model_max_concurrency)
 
     else:
         # With other models, thinking tokens are not specifically allocated
-        planner_llm = init_chat_model(model=planner_model, 
+        planner_llm = get_chat_model(model=planner_model, 
                                       model_provider=planner_provider,
-                                      model_kwargs=planner_model_kwargs)
+                                      model_kwargs=planner_model_kwargs,
+                                      max_concurrency=configurable.model_max_concurrency, **deterministic_model_args(configurable, planner_model_kwargs))
     
     # Generate the report sections
-    structured_llm = planner_llm.with_structured_output(Sections)
+    structured_llm = repairing_structured_output(planner_llm, Sections, configurable.max_structured_output_retries)
     report_sections = await structured_llm.ainvoke([SystemMessage(content=system_instructions_sections),
                                              HumanMessage(content=planner_message)])
 
     # Get sections
     sections = report_sections.sections
 
-    return {"sections": sections}
+    # Start researching the sections while the plan waits for approval
+    thread_id = config.get("configurable", {}).get("thread_id")
+    if configurable.speculative_section_research and thread_id:
+        speculative_research.start(thread_id, sections, functools.partial(research_section_ahead, topic, config=config, run_key=run_key))
+
+    return {"sections": sections, "run_key": run_key}
 
+@timed_node
 def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Literal["generate_report_plan","build_section_with_web_research"]]:
     """Get human feedback on the report plan and route to next steps.
     
@@ -178,8 +216,8 @@ def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Litera
     if isinstance(feedback, bool) and feedback is True:
         # Treat this as approve and kick off section writing
         return Command(goto=[
-            Send("build_section_with_web_research", {"topic": topic, "section": s, "search_iterations": 0}) 
-            for s in sections 
+            Send("build_section_with_web_research", {"topic": topic, "section": s, "section_index": i, "search_iterations": 0, "run_key": state.get("run_key")}) 
+            for i, s in enumerate(sections) 
             if s.research
         ])
     
@@ -191,7 +229,27 @@ def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Litera
     else:
         raise TypeError(f"Interrupt value of type {type(feedback)} is not supported.")
     
-async def generate_queries(state: SectionState, config: RunnableConfig):
+@timed_node
+async def take_speculative_research(state: SectionState, config: RunnableConfig) -> Command[Literal["generate_queries", "write_section"]]:
+    """Start the section from its first search if it was already done during human_feedback.
+
+    This node is not admitted by the section scheduler, so waiting for the
+    speculative research never holds a slot that the research itself needs.
+
+    Returns:
+        Command with the research done while the plan waited for approval, or
+        to generate queries if there is none
+    """
+    configurable = Configuration.from_runnable_config(config)
+    if configurable.speculative_section_research:
+        researched = await speculative_research.take(config.get("configurable", {}).get("thread_id"), state["section"].name)
+        if researched is not None:
+            return Command(update=researched, goto="write_section")
+    return Command(goto="generate_queries")
+
+@scheduled_section(Configuration)
+@timed_node
+async def generate_queries(state: SectionState, config: RunnableConfig) -> Command[Literal["search_web"]]:
     """Generate search queries for researching a specific section.
     
     This node uses an LLM to generate targeted search queries based on the 
@@ -202,7 +260,7 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
         config: Configuration including number of queries to generate
         
     Returns:
-        Dict containing the generated search queries
+        Command with the generated search queries
     """
 
     # Get state 
@@ -217,8 +275,8 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
-    structured_llm = writer_model.with_structured_output(Queries)
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs, max_concurrency=configurable.model_max_concurrency, **deterministic_model_args(configurable, writer_model_kwargs)) 
+    structured_llm = repairing_structured_output(writer_model, Queries, configurable.max_structured_output_retries)
 
     # Format system instructions
     system_instructions = query_writer_instructions.format(topic=topic, 
@@ -230,8 +288,10 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
     queries = await structured_llm.ainvoke([SystemMessage(content=system_instructions),
                                      HumanMessage(content="Generate search queries on the provided topic.")])
 
-    return {"search_queries": queries.queries}
+    return Command(update={"search_queries": queries.queries}, goto="search_web")
 
+@scheduled_section(Configuration, charge_tokens=False)
+@timed_node
 async def search_web(state: SectionState, config: RunnableConfig):
     """Execute web searches for the section queries.
     
@@ -260,11 +320,27 @@ async def search_web(state: SectionState, config: RunnableConfig):
     # Web search
     query_list = [query.search_query for query in search_queries]
 
-    # Search the web with parameters
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
-
-    return {"source_str": source_str, "search_iterations": state["search_iterations"] + 1}
-
+    # Add the results to the run index; write_section retrieves its context from there
+    if configurable.use_run_index:
+        await search_into_index(search_api, query_list, params_to_pass, get_configured_run_index(configurable, config, state.get("run_key")),
+                                deadline=configurable.search_deadline_seconds,
+                                **get_coalescing_options(configurable))
+        return {"search_iterations": state["search_iterations"] + 1}
+
+    # Search the web; follow-up iterations fetch only sources the section has not seen yet
+    source_str, visited_sources = await search_new_sources(search_api, query_list, params_to_pass,
+                                                           state.get("visited_sources"),
+                                                           token_budget=configurable.search_token_budget,
+                                                           token_counter=get_search_token_counter(configurable),
+                                                           deadline=configurable.search_deadline_seconds,
+                                                           **get_coalescing_options(configurable))
+
+    # Only a reference travels through the state; write_section loads the text
+    return {"source_ref": store_content(source_str), "visited_sources": visited_sources,
+            "search_iterations": state["search_iterations"] + 1}
+
+@scheduled_section(Configuration, charge_tokens=False)
+@timed_node
 async def write_section(state: SectionState, config: RunnableConfig) -> Command[Literal[END, "search_web"]]:
     """Write a section of the report and evaluate if more research is needed.
     
@@ -286,11 +362,20 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
     # Get state 
     topic = state["topic"]
     section = state["section"]
-    source_str = state["source_str"]
 
     # Get configuration
     configurable = Configuration.from_runnable_config(config)
 
+    # Get sources, either from this section's search or from everything gathered in the run
+    if configurable.use_run_index:
+        query_list = [query.search_query for query in state["search_queries"]]
+        source_str = await get_configured_run_index(configurable, config, state.get("run_key")).format_context(
+            " ".join([section.name, section.description, *query_list]), configurable.run_index_top_k,
+            token_budget=configurable.search_token_budget,
+            token_counter=get_search_token_counter(configurable))
+    else:
+        source_str = load_content(state["source_ref"])
+
     # Format system instructions
     section_writer_inputs_formatted = section_writer_inputs.format(topic=topic, 
                                                              section_name=section.name, 
@@ -302,7 +387,7 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs, max_concurrency=configurable.model_max_concurrency) 
 
     section_content = await writer_model.ainvoke([SystemMessage(content=section_writer_instructions),
                                            HumanMessage(content=section_writer_inputs_formatted)])
@@ -327,13 +412,16 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
 
     if planner_model == "claude-3-7-sonnet-latest":
         # Allocate a thinking budget for claude-3-7-sonnet-latest as the planner model
-        reflection_model = init_chat_model(model=planner_model, 
-                                           model_provider=planner_provider, 
-                                           max_tokens=20_000, 
-                                           thinking={"type": "enabled", "budget_tokens": 16_000}).with_structured_output(Feedback)
+        reflection_llm = get_chat_model(model=planner_model, 
+                                         model_provider=planner_provider, 
+                                         max_tokens=20_000, 
+                                         thinking={"type": "enabled", "budget_tokens": 16_000},
+                                         max_concurrency=configurable.model_max_concurrency)
     else:
-        reflection_model = init_chat_model(model=planner_model, 
-                                           model_provider=planner_provider, model_kwargs=planner_model_kwargs).with_structured_output(Feedback)
+        reflection_llm = get_chat_model(model=planner_model, 
+                                         model_provider=planner_provider, model_kwargs=planner_model_kwargs,
+                                         max_concurrency=configurable.model_max_concurrency, **deterministic_model_args(configurable, planner_model_kwargs))
+    reflection_model = repairing_structured_output(reflection_llm, Feedback, configurable.max_structured_output_retries)
     # Generate feedback
     feedback = await reflection_model.ainvoke([SystemMessage(content=section_grader_instructions_formatted),
                                         HumanMessage(content=section_grader_message)])
@@ -343,7 +431,7 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
         # Publish the section to completed sections 
         update = {"completed_sections": [section]}
         if configurable.include_source_str:
-            update["source_str"] = source_str
+            update["source_refs"] = [store_content(source_str)]
         return Command(update=update, goto=END)
 
     # Update the existing section with new content and update search queries
@@ -353,6 +441,8 @@ async def write_section(state: SectionState, config: RunnableConfig) -> Command[
             goto="search_web"
         )
     
+@scheduled_section(Configuration)
+@timed_node
 async def write_final_sections(state: SectionState, config: RunnableConfig):
     """Write sections that don't require research using completed sections as context.
     
@@ -382,7 +472,7 @@ async def write_final_sections(state: SectionState, config: RunnableConfig):
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs, max_concurrency=configurable.model_max_concurrency) 
     
     section_content = await writer_model.ainvoke([SystemMessage(content=system_instructions),
                                            HumanMessage(content="Generate a report section based on the provided sources.")])
@@ -393,6 +483,7 @@ async def write_final_sections(state: SectionState, config: RunnableConfig):
     # Write the updated section to completed sections
     return {"completed_sections": [section]}
 
+@timed_node
 def gather_completed_sections(state: ReportState):
     """Format completed sections as context for writing final sections.
     
@@ -414,6 +505,7 @@ def gather_completed_sections(state: ReportState):
 
     return {"report_sections_from_research": completed_report_sections}
 
+@timed_node
 def compile_final_report(state: ReportState, config: RunnableConfig):
     """Compile all sections into the final report.
     
@@ -443,8 +535,11 @@ def compile_final_report(state: ReportState, config: RunnableConfig):
     # Compile final report
     all_sections = "\n\n".join([s.content for s in sections])
 
+    # Release the sources gathered in this run
+    drop_run_index(config, state.get("run_key"))
+
     if configurable.include_source_str:
-        return {"final_report": all_sections, "source_str": state["source_str"]}
+        return {"final_report": all_sections, "source_str": "".join(load_content(ref) for ref in state.get("source_refs") or [])}
     else:
         return {"final_report": all_sections}
 
@@ -463,8 +558,8 @@ def initiate_final_section_writing(state: ReportState):
 
     # Kick off section writing in parallel via Send() API for any sections that do not require research
     return [
-        Send("write_final_sections", {"topic": state["topic"], "section": s, "report_sections_from_research": state["report_sections_from_research"]}) 
-        for s in state["sections"] 
+        Send("write_final_sections", {"topic": state["topic"], "section": s, "section_index": i, "report_sections_from_research": state["report_sections_from_research"]}) 
+        for i, s in enumerate(state["sections"]) 
         if not s.research
     ]
 
@@ -472,22 +567,40 @@ def initiate_final_section_writing(state: ReportState):
 
 # Add nodes 
 section_builder = StateGraph(SectionState, output=SectionOutputState)
+section_builder.add_node("take_speculative_research", take_speculative_research)
 section_builder.add_node("generate_queries", generate_queries)
 section_builder.add_node("search_web", search_web)
 section_builder.add_node("write_section", write_section)
 
 # Add edges
-section_builder.add_edge(START, "generate_queries")
-section_builder.add_edge("generate_queries", "search_web")
+section_builder.add_edge(START, "take_speculative_research")
 section_builder.add_edge("search_web", "write_section")
 
+section_graph = section_builder.compile()
+
+async def _research_section(state: SectionState, config: RunnableConfig):
+    update = (await generate_queries(state, config)).update
+    update.update(await search_web({**state, **update}, config))
+    return update
+
+async def research_section_ahead(topic: str, section: Section, section_index: int, config: RunnableConfig,
+                                run_key: Optional[str] = None) -> dict:
+    """First query generation and search of a section, run before the plan is approved.
+
+    Returns:
+        dict: Section state update for write_section
+    """
+    # Only the options are needed; the graph internals of the planning step are not
+    config = {"configurable": {key: value for key, value in config.get("configurable", {}).items() if not key.startswith("__")}}
+    return await _research_section({"topic": topic, "section": section, "section_index": section_index, "search_iterations": 0, "run_key": run_key}, config)
+
 # Outer graph for initial report plan compiling results from each section -- 
 
 # Add nodes
 builder = StateGraph(ReportState, input=ReportStateInput, output=ReportStateOutput, config_schema=Configuration)
 builder.add_node("generate_report_plan", generate_report_plan)
 builder.add_node("human_feedback", human_feedback)
-builder.add_node("build_section_with_web_research", section_builder.compile())
+builder.add_node("build_section_with_web_research", section_graph)
 builder.add_node("gather_completed_sections", gather_completed_sections)
 builder.add_node("write_final_sections", write_final_sections)
 builder.add_node("compile_final_report", compile_final_report)
@@ -0,0 +1,287 @@
+"""Run-scoped hybrid (BM25 + vector) index over every source fetched in a research run.
+
+Sections and search iterations of the same run add their results to one index,
+so a source found while researching one section is available to all others and
+a query that was already executed is not sent to the search API again. Writers
+then pull their top-k chunks from the index instead of the raw search output.
+"""
+
+import math
+import re
+import uuid
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableConfig
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from open_deep_research.budget import TokenCounter, fit_texts_to_budget, get_token_counter
+from open_deep_research.cache import content_hash
+from open_deep_research.dedup import canonicalize_url
+from open_deep_research.embeddings import normalize_rows, top_k_similar
+from open_deep_research.telemetry import record_search
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Constant of reciprocal rank fusion; larger values flatten the contribution of top ranks
+RRF_K = 60
+
+# Runs whose index is kept in memory at the same time
+MAX_RUN_INDEXES = 8
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_query(query: str) -> str:
+    """Key used to recognize a query that was already executed."""
+    return " ".join(_tokenize(query))
+
+
+def reciprocal_rank_scores(rankings: Sequence[Sequence], k: int = RRF_K) -> Dict:
+    """Reciprocal rank fusion score of every item of several best-first rankings."""
+    scores: Dict = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] += 1.0 / (k + rank + 1)
+    return dict(scores)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence], k: int = RRF_K) -> List:
+    """Merge several best-first rankings into one with reciprocal rank fusion.
+
+    Args:
+        rankings: Ranked lists of hashable items (e.g. ids or URLs)
+        k: RRF constant
+
+    Returns:
+        List of all items, best first
+    """
+    scores = reciprocal_rank_scores(rankings, k)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+@dataclass
+class IndexedChunk:
+    """A chunk of a fetched source."""
+    url: str
+    title: str
+    text: str
+
+
+class HybridIndex:
+    """Incremental BM25 index over source chunks, fused with vector search when embeddings are given."""
+
+    def __init__(self, embeddings: Optional[Embeddings] = None, chunk_size: int = 1500, chunk_overlap: int = 200):
+        self.embeddings = embeddings
+        self.chunks: List[IndexedChunk] = []
+        self.executed_queries: set = set()
+        self._splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._lengths: List[int] = []
+        self._total_length = 0
+        self._seen_chunks: set = set()
+        self._seen_urls: set = set()
+        self._vectors: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def new_queries(self, queries: Sequence[str]) -> List[str]:
+        """Queries that have not been executed in this run yet (in order, without repeats)."""
+        new = {}
+        for query in queries:
+            key = normalize_query(query)
+            if key and key not in self.executed_queries and key not in new:
+                new[key] = query
+        return list(new.values())
+
+    def mark_executed(self, queries: Sequence[str]) -> None:
+        self.executed_queries.update(normalize_query(query) for query in queries)
+
+    async def add_search_results(self, search_response: List[Dict]) -> int:
+        """Split and index every new source of a list of search responses.
+
+        Sources whose canonical URL is already indexed and chunks with identical
+        text are skipped.
+
+        Returns:
+            int: Number of chunks added
+        """
+        new_chunks = []
+        digests = []
+        new_digests = set()
+        new_urls = set()
+        for response in search_response:
+            for result in response.get('results', []):
+                key = canonicalize_url(result.get('url', ''))
+                if not key or key in self._seen_urls or key in new_urls:
+                    continue
+                new_urls.add(key)
+                text = result.get('raw_content') or result.get('content') or ''
+                for piece in self._splitter.split_text(text):
+                    digest = content_hash(piece)
+                    if digest in self._seen_chunks or digest in new_digests:
+                        continue
+                    new_digests.add(digest)
+                    digests.append(digest)
+                    new_chunks.append(IndexedChunk(url=result['url'], title=result.get('title', ''), text=piece))
+        if not new_chunks:
+            self._seen_urls.update(new_urls)
+            return 0
+
+        vectors = None
+        if self.embeddings is not None:
+            vectors = normalize_rows(await self.embeddings.aembed_documents([chunk.text for chunk in new_chunks]))
+
+        # Commit without awaiting so concurrent searches never see a half-added batch. Sources
+        # count as seen only now, so they can be added again if the embedding call failed.
+        keep = [i for i, digest in enumerate(digests) if digest not in self._seen_chunks]
+        new_chunks = [new_chunks[i] for i in keep]
+        self._seen_urls.update(new_urls)
+        self._seen_chunks.update(digests)
+        if vectors is not None:
+            self._vectors.extend(vectors[i] for i in keep)
+            self._matrix = None
+
+        for chunk in new_chunks:
+            chunk_id = len(self.chunks)
+            self.chunks.append(chunk)
+            terms = _tokenize(chunk.text)
+            for term in terms:
+                postings = self._postings[term]
+                postings[chunk_id] = postings.get(chunk_id, 0) + 1
+            self._lengths.append(len(terms))
+            self._total_length += len(terms)
+        return len(new_chunks)
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        n = len(self.chunks)
+        scores = np.zeros(n, dtype=np.float32)
+        if n == 0:
+            return scores
+        lengths = np.asarray(self._lengths, dtype=np.float32)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / (self._total_length / n or 1))
+        for term in set(_tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            ids = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            scores[ids] += idf * tf * (BM25_K1 + 1) / (tf + length_norm[ids])
+        return scores
+
+    async def search(self, query: str, k: int) -> List[IndexedChunk]:
+        """Top-k chunks for a query, fusing BM25 and vector rankings."""
+        if not self.chunks or k <= 0:
+            return []
+        n_candidates = min(len(self.chunks), max(k * 4, 20))
+        scores = self.bm25_scores(query)
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        bm25_ranking = [int(i) for i in candidates[np.argsort(-scores[candidates])] if scores[i] > 0]
+        rankings = [bm25_ranking]
+
+        if self.embeddings is not None:
+            if self._matrix is None:
+                self._matrix = np.ascontiguousarray(np.vstack(self._vectors))
+            rankings.append(top_k_similar(self._matrix, await self.embeddings.aembed_query(query), n_candidates))
+
+        return [self.chunks[i] for i in reciprocal_rank_fusion(rankings)[:k]]
+
+    async def format_context(
+        self,
+        query: str,
+        k: int,
+        token_budget: Optional[int] = None,
+        token_counter: Optional[TokenCounter] = None,
+    ) -> str:
+        """Format the top-k chunks for a query, grouped by source.
+
+        Args:
+            query: Text to rank chunks against
+            k: Number of chunks to include
+            token_budget: Total tokens for the chunk texts (None: no limit)
+            token_counter: Tokenizer of the model that will read the context
+
+        Returns:
+            str: Formatted sources
+        """
+        chunks = await self.search(query, k)
+        if not chunks:
+            return "No relevant sources found."
+
+        counter = token_counter or get_token_counter()
+        texts = [chunk.text for chunk in chunks]
+        if token_budget is not None:
+            weights = [1.0 / (rank + 1) for rank in range(len(chunks))]
+            texts = fit_texts_to_budget(texts, token_budget, counter, weights)
+
+        by_url: Dict[str, List[str]] = OrderedDict()
+        titles = {}
+        for chunk, text in zip(chunks, texts):
+            if text:
+                by_url.setdefault(chunk.url, []).append(text)
+                titles[chunk.url] = chunk.title
+
+        parts = ["Content from sources:\n"]
+        for i, (url, excerpts) in enumerate(by_url.items(), 1):
+            parts.append(f"\n\n--- SOURCE {i}: {titles[url]} ---\n")
+            parts.append(f"URL: {url}\n\n")
+            parts.append("RELEVANT EXCERPTS:\n")
+            parts.append("\n...\n".join(excerpts))
+            parts.append("\n\n" + "-" * 80 + "\n")
+        context = "".join(parts)
+        record_search("run_index", formatted_tokens=counter.count(context))
+        return context
+
+
+_run_indexes: "OrderedDict[str, HybridIndex]" = OrderedDict()
+
+
+def new_run_key() -> str:
+    """Identifier of a run without a thread_id, kept in the graph state as ``run_key``."""
+    return uuid.uuid4().hex
+
+
+def _run_id(config: Optional[RunnableConfig], run_key: Optional[str] = None) -> Optional[str]:
+    configurable = (config or {}).get("configurable", {})
+    thread_id = configurable.get("thread_id")
+    return str(thread_id) if thread_id else run_key
+
+
+def get_run_index(config: Optional[RunnableConfig], embeddings: Optional[Embeddings] = None,
+                  run_key: Optional[str] = None) -> HybridIndex:
+    """Return the index of the current run, creating it on first use.
+
+    A run is identified by the config's thread_id or, without one, by the
+    ``run_key`` from its state. Only the most recent MAX_RUN_INDEXES runs are
+    kept in memory.
+    """
+    run_id = _run_id(config, run_key)
+    if run_id is None:
+        # Nothing identifies the run, so its index cannot be shared, not even between its own nodes
+        return HybridIndex(embeddings=embeddings)
+    index = _run_indexes.get(run_id)
+    if index is None:
+        index = _run_indexes[run_id] = HybridIndex(embeddings=embeddings)
+        while len(_run_indexes) > MAX_RUN_INDEXES:
+            _run_indexes.popitem(last=False)
+    _run_indexes.move_to_end(run_id)
+    return index
+
+
+def drop_run_index(config: Optional[RunnableConfig], run_key: Optional[str] = None) -> None:
+    """Release the index of a finished run."""
+    run_id = _run_id(config, run_key)
+    if run_id is not None:
+        _run_indexes.pop(run_id, None)
@@ -0,0 +1,195 @@
+"""Opt-in on-disk cache of LLM responses for repeated deterministic calls.
+
+Query writing, planning, section grading and report summaries are often sent
+again with exactly the same inputs, e.g. when a report on the same topic is
+rerun. With the cache enabled such calls are answered from the size-bounded
+"llm_responses" cache instead of the API.
+
+Only calls at temperature 0 are cached: replaying a sampled answer would make
+every retry of a writer or agent loop return the same response. Entries are
+keyed by model, messages, tool schemas and sampling parameters. LangChain
+models use it through ``LLMResponseCache`` (see ``deterministic_model_args``),
+litellm call sites through ``cached_completion``. Both are enabled by the
+LLM_RESPONSE_CACHE environment variable; graph nodes also by the
+``llm_response_cache`` option. Setting LLM_RESPONSE_CACHE_BYPASS, or calling
+inside ``bypass_llm_cache()``, skips lookups but still stores fresh responses.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+from typing import Any, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+from open_deep_research.cache import content_hash, get_cache
+
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# litellm arguments that do not change the response
+_UNKEYED_COMPLETION_ARGS = {"api_key", "api_base", "base_url", "api_version", "timeout", "num_retries", "metadata"}
+
+_bypass: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+def _flag(value: Any) -> bool:
+    # Options set through environment variables arrive as strings
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _env_flag(name: str) -> bool:
+    return _flag(os.environ.get(name, ""))
+
+
+def llm_cache_enabled() -> bool:
+    """Whether the LLM_RESPONSE_CACHE environment variable enables the cache."""
+    return _env_flag("LLM_RESPONSE_CACHE")
+
+
+def cache_bypassed() -> bool:
+    return _bypass.get() or _env_flag("LLM_RESPONSE_CACHE_BYPASS")
+
+
+@contextlib.contextmanager
+def bypass_llm_cache():
+    """Skip cached responses for calls made inside the block; fresh responses are still stored."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+class LLMResponseCache(BaseCache):
+    """LangChain cache of chat model generations stored in a SQLiteCache."""
+
+    def __init__(self, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self._cache = get_cache("llm_responses", max_bytes=max_bytes)
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        # llm_string holds the model, its sampling parameters and bound tool schemas
+        return content_hash("langchain", llm_string, prompt)
+
+    @staticmethod
+    def _decode(value: Optional[str]) -> Optional[Sequence[Generation]]:
+        if value is None:
+            return None
+        try:
+            return [loads(generation) for generation in json.loads(value)]
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable cached LLM response: {str(e)}")
+            return None
+
+    @staticmethod
+    def _encode(return_val: Sequence[Generation]) -> str:
+        return json.dumps([dumps(generation) for generation in return_val])
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if cache_bypassed():
+            return None
+        return self._decode(self._cache.get_text(self._key(prompt, llm_string)))
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self._cache.set_text(self._key(prompt, llm_string), self._encode(return_val))
+
+    def clear(self, **kwargs: Any) -> None:
+        self._cache.clear()
+
+    # SQLite reads and writes (and eviction sweeps) run off the event loop
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        if cache_bypassed():
+            return None
+        return self._decode(await self._cache.aget_text(self._key(prompt, llm_string)))
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        await self._cache.aset_text(self._key(prompt, llm_string), self._encode(return_val))
+
+    async def aclear(self, **kwargs: Any) -> None:
+        await asyncio.to_thread(self.clear)
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache(configurable: Any = None) -> Optional[LLMResponseCache]:
+    """The shared LangChain cache if enabled by the configuration or environment, else None.
+
+    Args:
+        configurable: Graph configuration with an ``llm_response_cache`` option
+
+    Returns:
+        Optional[LLMResponseCache]: Cache to pass as ``cache=`` to a chat model
+    """
+    global _llm_cache
+    if not (_flag(getattr(configurable, "llm_response_cache", False)) or llm_cache_enabled()):
+        return None
+    if _llm_cache is None:
+        _llm_cache = LLMResponseCache()
+    return _llm_cache
+
+
+def deterministic_model_args(configurable: Any = None, model_kwargs: Optional[dict] = None) -> dict:
+    """Arguments of ``get_chat_model`` for a call that may be answered from the response cache.
+
+    With the cache enabled the call is made at temperature 0 and cached. If
+    ``model_kwargs`` already set a non-zero temperature it is kept and the call
+    is not cached. Without the cache no arguments are added.
+
+    Args:
+        configurable: Graph configuration with an ``llm_response_cache`` option
+        model_kwargs: Provider-specific model arguments of the call
+
+    Returns:
+        dict: Keyword arguments to add to ``get_chat_model``
+    """
+    cache = get_llm_cache(configurable)
+    if cache is None:
+        return {}
+    if "temperature" in (model_kwargs or {}):
+        # Passing temperature twice is rejected by some providers
+        return {"cache": cache} if model_kwargs["temperature"] == 0 else {}
+    return {"temperature": 0, "cache": cache}
+
+
+def completion_cache_key(kwargs: dict) -> str:
+    """Key of a litellm completion from its model, messages, tools and sampling parameters."""
+    keyed = {name: value for name, value in kwargs.items() if name not in _UNKEYED_COMPLETION_ARGS}
+    return content_hash("litellm", json.dumps(keyed, sort_keys=True, default=str))
+
+
+def cached_completion(**kwargs: Any) -> Any:
+    """litellm ``completion`` that reuses stored responses when LLM_RESPONSE_CACHE is set.
+
+    Streaming calls and calls not made at temperature 0 are never cached.
+
+    Args:
+        **kwargs: Arguments of litellm.completion
+
+    Returns:
+        litellm.ModelResponse: The stored or fresh response
+    """
+    # Imported here: litellm is slow to import and only the litellm call sites need it
+    try:
+        import litellm
+    except ImportError:
+        raise ImportError("cached_completion requires litellm. Please install it with 'pip install litellm'.")
+    if not llm_cache_enabled() or kwargs.get("stream") or kwargs.get("temperature") != 0:
+        return litellm.completion(**kwargs)
+
+    cache = get_cache("llm_responses", max_bytes=LLM_CACHE_MAX_BYTES)
+    key = completion_cache_key(kwargs)
+    if not cache_bypassed():
+        cached = cache.get_text(key)
+        if cached is not None:
+            return litellm.ModelResponse(**json.loads(cached))
+
+    response = litellm.completion(**kwargs)
+    cache.set_text(key, json.dumps(response.model_dump(), default=str))
+    return response
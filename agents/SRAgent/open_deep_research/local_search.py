@@ -0,0 +1,243 @@
+"""Offline search over a local directory of markdown, text, HTML and PDF files.
+
+Files are split into passages and stored in a SQLite FTS5 index under the cache
+directory. The index is refreshed incrementally: only files whose size or
+modification time changed since the last refresh are re-read, and deleted files
+are dropped. Queries are answered from the index with BM25 ranking.
+"""
+
+import asyncio
+import contextlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from open_deep_research.cache import content_hash, get_cache_dir
+from open_deep_research.extraction import extract_main_content, extract_pdf_text
+
+TEXT_EXTENSIONS = {".md", ".markdown", ".txt", ".rst"}
+HTML_EXTENSIONS = {".html", ".htm"}
+PDF_EXTENSIONS = {".pdf"}
+INDEXED_EXTENSIONS = TEXT_EXTENSIONS | HTML_EXTENSIONS | PDF_EXTENSIONS
+
+# Passages are cut at paragraph boundaries to about this many characters
+PASSAGE_CHARS = 2_000
+
+# Seconds between two scans of the corpus directory
+REFRESH_INTERVAL_SECONDS = 30.0
+
+# Characters of matching passages returned as raw_content per file
+MAX_RAW_CONTENT_CHARS = 8_000
+
+_TOKEN_RE = re.compile(r"\w+")
+_MARKDOWN_TITLE_RE = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+
+
+def _split_passages(text: str) -> List[str]:
+    passages, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) > PASSAGE_CHARS:
+            passages.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+        # Very long paragraphs (e.g. PDF text without blank lines) are cut as they are
+        while len(current) > PASSAGE_CHARS * 2:
+            passages.append(current[:PASSAGE_CHARS])
+            current = current[PASSAGE_CHARS:]
+    if current:
+        passages.append(current)
+    return passages
+
+
+def read_document(path: Path) -> Optional[tuple]:
+    """Return (title, text) for a supported file, or None if it cannot be read."""
+    suffix = path.suffix.lower()
+    try:
+        if suffix in PDF_EXTENSIONS:
+            text = extract_pdf_text(path.read_bytes()).text
+        elif suffix in HTML_EXTENSIONS:
+            text = extract_main_content(path.read_bytes()).text
+        else:
+            text = path.read_text(encoding="utf-8", errors="replace")
+    except Exception as e:
+        print(f"Warning: Could not index {path}: {str(e)}")
+        return None
+    match = _MARKDOWN_TITLE_RE.search(text[:2_000]) if suffix in TEXT_EXTENSIONS else None
+    title = match.group(1).strip() if match else path.stem.replace("_", " ")
+    return title, text
+
+
+def _match_expression(query: str) -> str:
+    # Quote every term so FTS5 operators and punctuation in user queries are taken literally
+    terms = dict.fromkeys(term.lower() for term in _TOKEN_RE.findall(query))
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+class LocalCorpusIndex:
+    """Incremental full-text index of one directory."""
+
+    def __init__(self, directory: str, index_path: Optional[str] = None):
+        self.directory = Path(directory).expanduser().resolve()
+        if index_path is None:
+            os.makedirs(get_cache_dir(), exist_ok=True)
+            index_path = os.path.join(get_cache_dir(), f"local_corpus_{content_hash(str(self.directory))[:16]}.sqlite")
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5("
+                "path UNINDEXED, title, content, tokenize='porter unicode61')"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # Commit on success, roll back on error, and always close
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """Index new and changed files and drop deleted ones.
+
+        Scans at most every REFRESH_INTERVAL_SECONDS unless force is set.
+
+        Returns:
+            Dict[str, int]: Number of files added/updated, removed and unchanged
+        """
+        stats = {"indexed": 0, "removed": 0, "unchanged": 0}
+        with self._lock:
+            if not force and time.monotonic() - self._last_refresh < REFRESH_INTERVAL_SECONDS:
+                return stats
+            if not self.directory.is_dir():
+                raise ValueError(f"Local corpus directory does not exist: {self.directory}")
+
+            on_disk = {}
+            for path in self.directory.rglob("*"):
+                if path.suffix.lower() in INDEXED_EXTENSIONS and path.is_file():
+                    stat = path.stat()
+                    on_disk[str(path)] = (stat.st_mtime, stat.st_size)
+
+            with self._connect() as conn:
+                indexed = {path: (mtime, size) for path, mtime, size in conn.execute("SELECT path, mtime, size FROM files")}
+                for path in indexed.keys() - on_disk.keys():
+                    conn.execute("DELETE FROM passages WHERE path = ?", (path,))
+                    conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                    stats["removed"] += 1
+
+                for path, (mtime, size) in on_disk.items():
+                    if indexed.get(path) == (mtime, size):
+                        stats["unchanged"] += 1
+                        continue
+                    document = read_document(Path(path))
+                    conn.execute("DELETE FROM passages WHERE path = ?", (path,))
+                    if document is not None:
+                        title, text = document
+                        conn.executemany(
+                            "INSERT INTO passages (path, title, content) VALUES (?, ?, ?)",
+                            [(path, title, passage) for passage in _split_passages(text)],
+                        )
+                    # Unreadable files are recorded too so they are not retried until they change
+                    conn.execute("INSERT OR REPLACE INTO files (path, mtime, size) VALUES (?, ?, ?)", (path, mtime, size))
+                    stats["indexed"] += 1
+            self._last_refresh = time.monotonic()
+
+        if stats["indexed"] or stats["removed"]:
+            print(f"Local corpus {self.directory}: indexed {stats['indexed']}, removed {stats['removed']}, "
+                  f"unchanged {stats['unchanged']} files")
+        return stats
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+        """Best matching files for a query, in the common search result format."""
+        expression = _match_expression(query)
+        if not expression:
+            return []
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT path, title, content, snippet(passages, 2, '', '', ' ... ', 48), bm25(passages) "
+                "FROM passages WHERE passages MATCH ? ORDER BY bm25(passages) LIMIT ?",
+                (expression, max_results * 10),
+            ).fetchall()
+
+        # Group passages by file, keeping files in order of their best passage
+        files: Dict[str, Dict] = {}
+        for path, title, passage, snippet, rank in rows:
+            if path not in files:
+                if len(files) >= max_results:
+                    continue
+                files[path] = {"title": title, "snippet": snippet, "rank": rank, "passages": []}
+            files[path]["passages"].append(passage)
+
+        results = []
+        best_rank = min((f["rank"] for f in files.values()), default=0.0)
+        for path, match in files.items():
+            raw_content = "\n\n...\n\n".join(match["passages"])[:MAX_RAW_CONTENT_CHARS]
+            results.append({
+                "title": match["title"],
+                "url": Path(path).as_uri(),
+                "content": match["snippet"],
+                # bm25() is negative, lower is better; scale so the best file scores 1.0
+                "score": match["rank"] / best_rank if best_rank else 1.0,
+                "raw_content": raw_content,
+            })
+        return results
+
+
+_indexes: Dict[str, LocalCorpusIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_local_corpus_index(directory: str) -> LocalCorpusIndex:
+    """Return the shared index of a directory, creating it on first use."""
+    key = str(Path(directory).expanduser().resolve())
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = LocalCorpusIndex(key)
+        return _indexes[key]
+
+
+async def local_search_async(search_queries: List[str], corpus_dir: Optional[str] = None, max_results: int = 5) -> List[Dict]:
+    """
+    Searches a local directory of documents, without network access.
+
+    Args:
+        search_queries (List[str]): List of search queries
+        corpus_dir (str, optional): Directory to search; defaults to the LOCAL_CORPUS_DIR environment variable
+        max_results (int, optional): Maximum number of files to return per query. Default is 5.
+
+    Returns:
+        List[dict]: List of search responses, one per query, in the same format as the web backends
+    """
+    corpus_dir = corpus_dir or os.environ.get("LOCAL_CORPUS_DIR")
+    if not corpus_dir:
+        raise ValueError("Local search requires search_api_config['corpus_dir'] or the LOCAL_CORPUS_DIR environment variable")
+    index = get_local_corpus_index(corpus_dir)
+
+    # Indexing reads and parses files, so it runs off the event loop
+    await asyncio.to_thread(index.refresh)
+
+    def run_queries():
+        return [
+            {
+                "query": query,
+                "follow_up_questions": None,
+                "answer": None,
+                "images": [],
+                "results": index.search(query, max_results),
+            }
+            for query in search_queries
+        ]
+
+    return await asyncio.to_thread(run_queries)
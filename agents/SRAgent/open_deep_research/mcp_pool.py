@@ -0,0 +1,160 @@
+"""Shared MCP clients with persistent sessions and cached tool lists.
+
+Loading MCP tools starts every configured server and lists its tools, and each
+tool call from ``MultiServerMCPClient.get_tools()`` opens yet another session.
+The pool keeps one client per server configuration with a session per server
+that stays open for the lifetime of the event loop, so tool calls and tool
+listings reuse the same connections. Tool lists are served from memory and
+refreshed in the background once they are older than the configured TTL.
+"""
+
+import asyncio
+import contextlib
+import functools
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import anyio
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+from open_deep_research.cache import content_hash
+
+# Seconds after which a cached tool list is refreshed in the background
+DEFAULT_TOOLS_TTL_SECONDS = 300.0
+
+
+def server_config_key(server_config: Any) -> str:
+    """Stable key of an MCP server configuration."""
+    return content_hash(json.dumps(server_config, sort_keys=True, default=str))
+
+
+class _PooledClient:
+    """One MultiServerMCPClient, its open sessions and its cached tools."""
+
+    def __init__(self, server_config: Dict[str, Any]):
+        self.client = MultiServerMCPClient(server_config)
+        self.loop = asyncio.get_running_loop()
+        self.tools: List[BaseTool] = []
+        self.loaded_at = 0.0
+        self.error: Optional[Exception] = None
+        self.closed = False
+        self._sessions: Dict[str, Any] = {}
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._refresh: Optional[asyncio.Task] = None
+        self._owner = asyncio.create_task(self._hold_sessions())
+
+    def _discard(self) -> None:
+        # The pool replaces a closed client on the next request
+        self.closed = True
+        self._closing.set()
+
+    def _watch_connection(self, tool: BaseTool) -> BaseTool:
+        call = tool.coroutine
+
+        @functools.wraps(call)
+        async def watched(*args, **kwargs):
+            try:
+                return await call(*args, **kwargs)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+                self._discard()
+                raise
+
+        tool.coroutine = watched
+        return tool
+
+    async def _load_tools(self) -> None:
+        if self._sessions:
+            tools = []
+            for session in self._sessions.values():
+                tools.extend(self._watch_connection(tool) for tool in await load_mcp_tools(session))
+        else:
+            tools = await self.client.get_tools()
+        self.tools = tools
+        self.loaded_at = time.monotonic()
+
+    async def _hold_sessions(self) -> None:
+        # Sessions are opened and closed by this one task, since their transports use task-bound cancel scopes
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                try:
+                    for name in self.client.connections:
+                        self._sessions[name] = await stack.enter_async_context(self.client.session(name))
+                except Exception as e:
+                    print(f"Warning: Could not keep MCP sessions open, using a new session per tool call: {str(e)}")
+                    self._sessions = {}
+                await self._load_tools()
+                self._ready.set()
+                if self._sessions:
+                    await self._closing.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            # A lost connection or a failed load makes the pool create a new client on the next request
+            if self._sessions or self.error is not None:
+                self.closed = True
+            self._sessions = {}
+            self._ready.set()
+
+    async def _refresh_tools(self) -> None:
+        try:
+            await self._load_tools()
+        except Exception as e:
+            print(f"Warning: Could not refresh MCP tools, keeping the cached list: {str(e)}")
+            if self._sessions:
+                self._discard()
+
+    async def get_tools(self, ttl_seconds: float) -> List[BaseTool]:
+        await self._ready.wait()
+        if self.error is not None:
+            raise self.error
+        stale = time.monotonic() - self.loaded_at > ttl_seconds
+        if stale and not self.closed and (self._refresh is None or self._refresh.done()):
+            self._refresh = asyncio.create_task(self._refresh_tools())
+        return self.tools
+
+    async def aclose(self) -> None:
+        self._closing.set()
+        if self._refresh is not None:
+            self._refresh.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._owner
+        self.closed = True
+
+
+class MCPClientPool:
+    """MCP clients keyed by server configuration, shared by all nodes of a process."""
+
+    def __init__(self):
+        self._clients: Dict[str, _PooledClient] = {}
+
+    async def get_tools(self, server_config: Dict[str, Any], ttl_seconds: float = DEFAULT_TOOLS_TTL_SECONDS) -> List[BaseTool]:
+        """Tools of all servers of a configuration, connecting on first use.
+
+        Args:
+            server_config: Connections by server name, as accepted by MultiServerMCPClient
+            ttl_seconds: Age after which the tool list is refreshed in the background
+
+        Returns:
+            List[BaseTool]: The cached tools, bound to the pool's open sessions
+        """
+        key = server_config_key(server_config)
+        pooled = self._clients.get(key)
+        # Sessions belong to the event loop that opened them
+        if pooled is None or pooled.closed or pooled.loop is not asyncio.get_running_loop():
+            pooled = self._clients[key] = _PooledClient(server_config)
+        return await pooled.get_tools(ttl_seconds)
+
+    async def aclose(self) -> None:
+        """Close the sessions opened on the running event loop."""
+        loop = asyncio.get_running_loop()
+        for key, pooled in list(self._clients.items()):
+            if pooled.loop is loop:
+                del self._clients[key]
+                await pooled.aclose()
+
+
+mcp_client_pool = MCPClientPool()
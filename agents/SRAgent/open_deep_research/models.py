@@ -0,0 +1,91 @@
+"""Long-lived chat model clients shared by all graph nodes.
+
+``init_chat_model`` builds a new client, and with it a new HTTP connection
+pool, on every call. ``get_chat_model`` hands out one instance per provider,
+model and arguments, so connections are reused across nodes, sections and
+loop iterations. It can also cap the requests in flight per model, shared by
+every node that uses that model.
+"""
+
+import asyncio
+import json
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+
+_lock = threading.Lock()
+
+# Async HTTP connections cannot move between event loops, so clients are kept per loop
+_models_by_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, BaseChatModel]]" = weakref.WeakKeyDictionary()
+_models_without_loop: Dict[str, BaseChatModel] = {}
+_limits_by_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _limit_concurrency(chat_model: BaseChatModel, semaphore: asyncio.Semaphore) -> None:
+    # Every async call, including those of with_structured_output() and bind_tools()
+    # wrappers, goes through _agenerate or _astream of the instance
+    agenerate, astream = chat_model._agenerate, chat_model._astream
+
+    async def limited_agenerate(*args, **kwargs):
+        async with semaphore:
+            return await agenerate(*args, **kwargs)
+
+    async def limited_astream(*args, **kwargs):
+        async with semaphore:
+            async for chunk in astream(*args, **kwargs):
+                yield chunk
+
+    object.__setattr__(chat_model, "_agenerate", limited_agenerate)
+    object.__setattr__(chat_model, "_astream", limited_astream)
+
+
+def get_chat_model(
+    model: str,
+    model_provider: Optional[str] = None,
+    max_concurrency: Optional[int] = None,
+    **kwargs: Any,
+) -> BaseChatModel:
+    """Shared chat model for a provider, model and set of arguments.
+
+    Args:
+        model: Model name, optionally prefixed with its provider ("anthropic:claude-3-5-haiku-latest")
+        model_provider: Provider, if not part of the model name
+        max_concurrency: Requests in flight for this model across all callers (None: unlimited).
+            Only async calls made while an event loop is running are limited.
+        **kwargs: Further arguments of init_chat_model
+
+    Returns:
+        BaseChatModel: The cached client, created on first use
+    """
+    loop = _running_loop()
+    key = json.dumps([model, model_provider, max_concurrency, kwargs], sort_keys=True, default=str)
+    with _lock:
+        models = _models_without_loop if loop is None else _models_by_loop.setdefault(loop, {})
+        chat_model = models.get(key)
+        if chat_model is None:
+            chat_model = init_chat_model(model=model, model_provider=model_provider, **kwargs)
+            if max_concurrency and loop is not None:
+                # The limit is per model, whatever the other arguments
+                limits = _limits_by_loop.setdefault(loop, {})
+                semaphore = limits.setdefault((model, model_provider, max_concurrency), asyncio.Semaphore(max_concurrency))
+                _limit_concurrency(chat_model, semaphore)
+            models[key] = chat_model
+    return chat_model
+
+
+def clear_chat_models() -> None:
+    """Drop all cached clients, e.g. after API keys changed."""
+    with _lock:
+        _models_by_loop.clear()
+        _models_without_loop.clear()
+        _limits_by_loop.clear()
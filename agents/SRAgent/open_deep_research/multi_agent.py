@@ -1,18 +1,22 @@
-from typing import List, Annotated, TypedDict, Literal, cast
+from typing import List, Annotated, TypedDict, Literal, Optional, cast
 from pydantic import BaseModel, Field
+import asyncio
 import operator
+import re
 import warnings
 
-from langchain.chat_models import init_chat_model
+from langchain_core.messages import AnyMessage, ToolMessage
 from langchain_core.tools import tool, BaseTool
 from langchain_core.runnables import RunnableConfig
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langgraph.graph import MessagesState
 
 from langgraph.types import Command, Send
 from langgraph.graph import START, END, StateGraph
 
 from open_deep_research.configuration import MultiAgentConfiguration
+from open_deep_research.mcp_pool import mcp_client_pool
+from open_deep_research.models import get_chat_model
+from open_deep_research.telemetry import timed_node
 from open_deep_research.utils import (
     get_config_value,
     tavily_search,
@@ -135,9 +139,10 @@ async def _load_mcp_tools(
     if not configurable.mcp_server_config:
         return []
 
-    mcp_server_config = configurable.mcp_server_config
-    client = MultiServerMCPClient(mcp_server_config)
-    mcp_tools = await client.get_tools()
+    # Clients, sessions and tool lists are shared across nodes and loop iterations
+    mcp_tools = await mcp_client_pool.get_tools(
+        configurable.mcp_server_config, configurable.mcp_tools_ttl_seconds
+    )
     filtered_mcp_tools: list[BaseTool] = []
     for tool in mcp_tools:
         # TODO: this will likely be hard to manage
@@ -185,6 +190,87 @@ async def get_research_tools(config: RunnableConfig) -> list[BaseTool]:
     return tools
 
 
+async def execute_tool_calls(tool_calls: list[dict], tools_by_name: dict[str, BaseTool], config: RunnableConfig) -> list:
+    """Run the tool calls of a message and return their observations in call order.
+
+    With parallel_tool_calls enabled, up to max_parallel_tool_calls calls run at
+    the same time; otherwise they run one after another.
+
+    Args:
+        tool_calls: Tool calls of the last AI message
+        tools_by_name: Available tools by name
+        config: Runnable config passed to every tool
+
+    Returns:
+        list: One observation per tool call, in the order of the calls
+    """
+    configurable = MultiAgentConfiguration.from_runnable_config(config)
+    limit = max(1, configurable.max_parallel_tool_calls) if configurable.parallel_tool_calls else 1
+    semaphore = asyncio.Semaphore(limit)
+
+    async def execute(tool_call: dict):
+        tool = tools_by_name[tool_call["name"]]
+        async with semaphore:
+            # Perform the tool call - use ainvoke for async tools
+            try:
+                return await tool.ainvoke(tool_call["args"], config)
+            except NotImplementedError:
+                return await asyncio.to_thread(tool.invoke, tool_call["args"], config)
+
+    # gather keeps the order of the calls, so tool messages answer them in order
+    return await asyncio.gather(*(execute(tool_call) for tool_call in tool_calls))
+
+
+def _search_tool_names(tools: list[BaseTool]) -> set[str]:
+    return {tool.name for tool in tools if tool.metadata is not None and tool.metadata.get("type") == "search"}
+
+
+def _observation_digest(content: str, max_chars: int) -> str:
+    # Both source formats of the search tools: "--- SOURCE 1: <title> ---" or "Source: <title>", then "URL: <url>"
+    titles = [a or b for a, b in re.findall(r"^(?:--- SOURCE \d+: (.*?) ---|Source: (.*))$", content, flags=re.M)]
+    urls = re.findall(r"^URL: (\S+)", content, flags=re.M)
+    if urls:
+        lines = [f"- {title} ({url})" for title, url in zip(titles + [""] * len(urls), urls)]
+        digest = "Sources found:\n" + "\n".join(lines)
+    else:
+        digest = content
+    if len(digest) > max_chars:
+        digest = digest[:max_chars].rstrip() + " ..."
+    return f"[Earlier search results, shortened from {len(content)} characters. {digest}]"
+
+
+def compact_tool_observations(messages: list[AnyMessage], tool_names: set[str], keep_recent: int,
+                              digest_chars: int) -> list[AnyMessage]:
+    """Replace all but the most recent observations of the given tools with short digests.
+
+    Only the prompt is changed; the messages in the graph state keep the full
+    observations. Tool call ids are kept, so every tool call is still answered.
+
+    Args:
+        messages: Message history sent to the model
+        tool_names: Tools whose observations may be shortened (the search tools)
+        keep_recent: Number of latest observations kept verbatim
+        digest_chars: Maximum length of the source list in a digest
+
+    Returns:
+        list[AnyMessage]: The history with stale observations replaced
+    """
+    positions = [i for i, message in enumerate(messages)
+                 if isinstance(message, ToolMessage) and message.name in tool_names]
+    compacted = list(messages)
+    for i in positions[:max(len(positions) - keep_recent, 0)]:
+        content = messages[i].content
+        if isinstance(content, str) and len(content) > digest_chars:
+            compacted[i] = messages[i].model_copy(update={"content": _observation_digest(content, digest_chars)})
+    return compacted
+
+
+def _history_policy(configurable: MultiAgentConfiguration) -> tuple[Optional[int], int]:
+    keep_recent = configurable.keep_recent_tool_observations
+    return (None if keep_recent is None else int(keep_recent)), int(configurable.tool_observation_digest_chars)
+
+
+@timed_node
 async def supervisor(state: ReportState, config: RunnableConfig):
     """LLM decides whether to call a tool or not"""
 
@@ -196,7 +282,7 @@ async def supervisor(state: ReportState, config: RunnableConfig):
     supervisor_model = get_config_value(configurable.supervisor_model)
 
     # Initialize the model
-    llm = init_chat_model(model=supervisor_model)
+    llm = get_chat_model(model=supervisor_model, max_concurrency=configurable.model_max_concurrency)
     
     # If sections have been completed, but we don't yet have the final report, then we need to initiate writing the introduction and conclusion
     if state.get("completed_sections") and not state.get("final_report"):
@@ -205,13 +291,19 @@ async def supervisor(state: ReportState, config: RunnableConfig):
 
     # Get tools based on configuration
     supervisor_tool_list = await get_supervisor_tools(config)
-    
-    
+
+    # Shorten stale search results; once sections are written, the supervisor's own research is no longer needed
+    keep_recent, digest_chars = _history_policy(configurable)
+    if keep_recent is not None:
+        if state.get("completed_sections"):
+            keep_recent = 0
+        messages = compact_tool_observations(messages, _search_tool_names(supervisor_tool_list), keep_recent, digest_chars)
+
     llm_with_tools = (
         llm
         .bind_tools(
             supervisor_tool_list,
-            parallel_tool_calls=False,
+            parallel_tool_calls=configurable.parallel_tool_calls,
             # force at least one tool call
             tool_choice="any"
         )
@@ -237,6 +329,7 @@ async def supervisor(state: ReportState, config: RunnableConfig):
         ]
     }
 
+@timed_node
 async def supervisor_tools(state: ReportState, config: RunnableConfig)  -> Command[Literal["supervisor", "research_team", "__end__"]]:
     """Performs the tool call and sends to the research agent"""
     configurable = MultiAgentConfiguration.from_runnable_config(config)
@@ -245,27 +338,18 @@ async def supervisor_tools(state: ReportState, config: RunnableConfig)  -> Comma
     sections_list = []
     intro_content = None
     conclusion_content = None
+    question = None
     source_str = ""
 
     # Get tools based on configuration
     supervisor_tool_list = await get_supervisor_tools(config)
     supervisor_tools_by_name = {tool.name: tool for tool in supervisor_tool_list}
-    search_tool_names = {
-        tool.name
-        for tool in supervisor_tool_list
-        if tool.metadata is not None and tool.metadata.get("type") == "search"
-    }
+    search_tool_names = _search_tool_names(supervisor_tool_list)
 
     # First process all tool calls to ensure we respond to each one (required for OpenAI)
-    for tool_call in state["messages"][-1].tool_calls:
-        # Get the tool
-        tool = supervisor_tools_by_name[tool_call["name"]]
-        # Perform the tool call - use ainvoke for async tools
-        try:
-            observation = await tool.ainvoke(tool_call["args"], config)
-        except NotImplementedError:
-            observation = tool.invoke(tool_call["args"], config)
-
+    tool_calls = state["messages"][-1].tool_calls
+    observations = await execute_tool_calls(tool_calls, supervisor_tools_by_name, config)
+    for tool_call, observation in zip(tool_calls, observations):
         # Append to messages 
         result.append({"role": "tool", 
                        "content": observation, 
@@ -274,10 +358,8 @@ async def supervisor_tools(state: ReportState, config: RunnableConfig)  -> Comma
         
         # Store special tool results for processing after all tools have been called
         if tool_call["name"] == "Question":
-            # Question tool was called - return to supervisor to ask the question
-            question_obj = cast(Question, observation)
-            result.append({"role": "assistant", "content": question_obj.question})
-            return Command(goto=END, update={"messages": result})
+            # Asked once every tool call has its response
+            question = cast(Question, observation).question
         elif tool_call["name"] == "Sections":
             sections_list = cast(Sections, observation).sections
         elif tool_call["name"] == "Introduction":
@@ -298,20 +380,17 @@ async def supervisor_tools(state: ReportState, config: RunnableConfig)  -> Comma
             source_str += cast(str, observation)
 
     # After processing all tool calls, decide what to do next
-    if sections_list:
+    if question is not None:
+        # Question tool was called - end the turn to ask the user the question
+        result.append({"role": "assistant", "content": question})
+        return Command(goto=END, update={"messages": result})
+    elif sections_list:
         # Send the sections to the research agents
         return Command(goto=[Send("research_team", {"section": s}) for s in sections_list], update={"messages": result})
-    elif intro_content:
-        # Store introduction while waiting for conclusion
-        # Append to messages to guide the LLM to write conclusion next
-        result.append({"role": "user", "content": "Introduction written. Now write a conclusion section."})
-        state_update = {
-            "final_report": intro_content,
-            "messages": result,
-        }
     elif conclusion_content:
         # Get all sections and combine in proper order: Introduction, Body Sections, Conclusion
-        intro = state.get("final_report", "")
+        # (the introduction may have been written in this same turn)
+        intro = intro_content or state.get("final_report", "")
         body_sections = "\n\n".join([s.content for s in state["completed_sections"]])
         
         # Assemble final report in correct order
@@ -324,6 +403,14 @@ async def supervisor_tools(state: ReportState, config: RunnableConfig)  -> Comma
             "final_report": complete_report,
             "messages": result,
         }
+    elif intro_content:
+        # Store introduction while waiting for conclusion
+        # Append to messages to guide the LLM to write conclusion next
+        result.append({"role": "user", "content": "Introduction written. Now write a conclusion section."})
+        state_update = {
+            "final_report": intro_content,
+            "messages": result,
+        }
     else:
         # Default case (for search tools, etc.)
         state_update = {"messages": result}
@@ -332,14 +419,17 @@ async def supervisor_tools(state: ReportState, config: RunnableConfig)  -> Comma
     if configurable.include_source_str and source_str:
         state_update["source_str"] = source_str
 
-    return Command(goto="supervisor", update=state_update)
+    # With parallel tool calls, FinishReport may come with the calls that complete the report
+    finished = any(tool_call["name"] == "FinishReport" for tool_call in tool_calls)
+    return Command(goto=END if finished else "supervisor", update=state_update)
 
 async def supervisor_should_continue(state: ReportState) -> str:
     """Decide if we should continue the loop or stop based upon whether the LLM made a tool call"""
 
     messages = state["messages"]
     last_message = messages[-1]
-    # End because the supervisor asked a question or is finished
+    # End because the supervisor asked a question or is finished; FinishReport together with
+    # other calls ends the loop in supervisor_tools
     if not last_message.tool_calls or (len(last_message.tool_calls) == 1 and last_message.tool_calls[0]["name"] == "FinishReport"):
         # Exit the graph
         return END
@@ -347,6 +437,7 @@ async def supervisor_should_continue(state: ReportState) -> str:
     # If the LLM makes a tool call, then perform an action
     return "supervisor_tools"
 
+@timed_node
 async def research_agent(state: SectionState, config: RunnableConfig):
     """LLM decides whether to call a tool or not"""
     
@@ -355,7 +446,7 @@ async def research_agent(state: SectionState, config: RunnableConfig):
     researcher_model = get_config_value(configurable.researcher_model)
     
     # Initialize the model
-    llm = init_chat_model(model=researcher_model)
+    llm = get_chat_model(model=researcher_model, max_concurrency=configurable.model_max_concurrency)
 
     # Get tools based on configuration
     research_tool_list = await get_research_tools(config)
@@ -372,11 +463,16 @@ async def research_agent(state: SectionState, config: RunnableConfig):
     if not messages:
         messages = [{"role": "user", "content": f"Please research and write the section: {state['section']}"}]
 
+    # Shorten stale search results
+    keep_recent, digest_chars = _history_policy(configurable)
+    if keep_recent is not None:
+        messages = compact_tool_observations(messages, _search_tool_names(research_tool_list), keep_recent, digest_chars)
+
     return {
         "messages": [
             # Enforce tool calling to either perform more search or call the Section tool to write the section
             await llm.bind_tools(research_tool_list,             
-                                 parallel_tool_calls=False,
+                                 parallel_tool_calls=configurable.parallel_tool_calls,
                                  # force at least one tool call
                                  tool_choice="any").ainvoke(
                 [
@@ -390,7 +486,8 @@ async def research_agent(state: SectionState, config: RunnableConfig):
         ]
     }
 
-async def research_agent_tools(state: SectionState, config: RunnableConfig):
+@timed_node
+async def research_agent_tools(state: SectionState, config: RunnableConfig) -> Command[Literal["research_agent", "__end__"]]:
     """Performs the tool call and route to supervisor or continue the research loop"""
     configurable = MultiAgentConfiguration.from_runnable_config(config)
 
@@ -401,22 +498,12 @@ async def research_agent_tools(state: SectionState, config: RunnableConfig):
     # Get tools based on configuration
     research_tool_list = await get_research_tools(config)
     research_tools_by_name = {tool.name: tool for tool in research_tool_list}
-    search_tool_names = {
-        tool.name
-        for tool in research_tool_list
-        if tool.metadata is not None and tool.metadata.get("type") == "search"
-    }
+    search_tool_names = _search_tool_names(research_tool_list)
     
     # Process all tool calls first (required for OpenAI)
-    for tool_call in state["messages"][-1].tool_calls:
-        # Get the tool
-        tool = research_tools_by_name[tool_call["name"]]
-        # Perform the tool call - use ainvoke for async tools
-        try:
-            observation = await tool.ainvoke(tool_call["args"], config)
-        except NotImplementedError:
-            observation = tool.invoke(tool_call["args"], config)
-
+    tool_calls = state["messages"][-1].tool_calls
+    observations = await execute_tool_calls(tool_calls, research_tools_by_name, config)
+    for tool_call, observation in zip(tool_calls, observations):
         # Append to messages 
         result.append({"role": "tool", 
                        "content": observation, 
@@ -439,7 +526,10 @@ async def research_agent_tools(state: SectionState, config: RunnableConfig):
     if configurable.include_source_str and source_str:
         state_update["source_str"] = source_str
 
-    return state_update
+    # With parallel tool calls, FinishResearch may come with other calls (e.g. Section) that had to run first
+    if any(tool_call["name"] == "FinishResearch" for tool_call in tool_calls):
+        return Command(goto=END, update=state_update)
+    return Command(goto="research_agent", update=state_update)
 
 async def research_agent_should_continue(state: SectionState) -> str:
     """Decide if we should continue the loop or stop based upon whether the LLM made a tool call"""
@@ -447,7 +537,8 @@ async def research_agent_should_continue(state: SectionState) -> str:
     messages = state["messages"]
     last_message = messages[-1]
 
-    if last_message.tool_calls[0]["name"] == "FinishResearch":
+    # FinishResearch together with other calls ends the loop in research_agent_tools
+    if all(tool_call["name"] == "FinishResearch" for tool_call in last_message.tool_calls):
         # Research is done - return to supervisor
         return END
     else:
@@ -465,7 +556,6 @@ research_builder.add_conditional_edges(
     research_agent_should_continue,
     ["research_agent_tools", END]
 )
-research_builder.add_edge("research_agent_tools", "research_agent")
 
 # Supervisor workflow
 supervisor_builder = StateGraph(ReportState, input=MessagesState, output=ReportStateOutput, config_schema=MultiAgentConfiguration)
@@ -0,0 +1,133 @@
+"""Streaming PDF ingestion for search results.
+
+PDFs are downloaded with a byte cap, parsed page by page in the extraction
+process pool and cached by content hash, so the same paper fetched through
+different URLs (or in a later run) is only parsed once.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from open_deep_research.cache import content_hash, get_cache
+from open_deep_research.extraction import (
+    DEFAULT_MAX_PDF_CHARS,
+    DEFAULT_MAX_PDF_PAGES,
+    extract_pdf_text_async,
+    read_capped,
+)
+from open_deep_research.telemetry import record_search
+
+# Downloads are cut at this size
+DEFAULT_MAX_PDF_BYTES = 20_000_000
+
+# Total time allowed for all PDF downloads of one search round
+DEFAULT_PDF_DEADLINE_SECONDS = 60.0
+
+PDF_HEADERS = {"Accept": "application/pdf,*/*;q=0.8"}
+
+
+def _text_key(digest: str, max_pages: int, max_chars: int) -> str:
+    return f"text:{digest}:{max_pages}:{max_chars}"
+
+
+async def pdf_bytes_to_text(
+    data: bytes,
+    max_pages: int = DEFAULT_MAX_PDF_PAGES,
+    max_chars: int = DEFAULT_MAX_PDF_CHARS,
+) -> str:
+    """Extract text from downloaded PDF bytes, reusing cached text for identical content."""
+    cache = get_cache("pdf_text")
+    key = _text_key(content_hash(data), max_pages, max_chars)
+    cached = await cache.aget_text(key)
+    if cached is not None:
+        return cached
+
+    result = await extract_pdf_text_async(data, max_pages=max_pages, max_chars=max_chars)
+    await cache.aset_text(key, result.text)
+    return result.text
+
+
+async def fetch_pdf_text(
+    url: str,
+    session: Optional[aiohttp.ClientSession] = None,
+    max_bytes: int = DEFAULT_MAX_PDF_BYTES,
+    max_pages: int = DEFAULT_MAX_PDF_PAGES,
+    max_chars: int = DEFAULT_MAX_PDF_CHARS,
+) -> str:
+    """Download a PDF and return its text.
+
+    Args:
+        url: Location of the PDF
+        session: Optional aiohttp session to reuse; a temporary one is opened otherwise
+        max_bytes: The download is stopped after this many bytes
+        max_pages: Maximum number of pages to read
+        max_chars: Maximum number of characters to return
+
+    Returns:
+        str: Extracted text
+    """
+    cache = get_cache("pdf_text")
+    # Known URLs map to the hash of their content so we can skip the download
+    url_key = f"url:{url}"
+    digest = await cache.aget_text(url_key)
+    if digest is not None:
+        cached = await cache.aget_text(_text_key(digest, max_pages, max_chars))
+        if cached is not None:
+            return cached
+
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession()
+    try:
+        async with session.get(url, headers=PDF_HEADERS, timeout=aiohttp.ClientTimeout(total=60)) as response:
+            response.raise_for_status()
+            data = await read_capped(response.content.iter_chunked(65536), max_bytes)
+            record_search(http_requests=1, bytes_downloaded=len(data))
+    finally:
+        if own_session:
+            await session.close()
+
+    await cache.aset_text(url_key, content_hash(data))
+    return await pdf_bytes_to_text(data, max_pages=max_pages, max_chars=max_chars)
+
+
+async def fetch_pdf_texts(
+    urls: List[str],
+    max_concurrency: int = 3,
+    deadline: float = DEFAULT_PDF_DEADLINE_SECONDS,
+    max_pages: int = DEFAULT_MAX_PDF_PAGES,
+    max_chars: int = DEFAULT_MAX_PDF_CHARS,
+) -> Dict[str, str]:
+    """Fetch several PDFs concurrently within a shared deadline.
+
+    Downloads still running when the deadline passes are cancelled and left
+    out of the result, as are downloads that fail.
+
+    Returns:
+        Dict[str, str]: Extracted text keyed by URL
+    """
+    if not urls:
+        return {}
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    texts: Dict[str, str] = {}
+
+    async with aiohttp.ClientSession() as session:
+        async def fetch_one(url: str):
+            async with semaphore:
+                try:
+                    texts[url] = await fetch_pdf_text(url, session=session, max_pages=max_pages, max_chars=max_chars)
+                except Exception as e:
+                    print(f"Warning: Failed to extract PDF {url}: {str(e)}")
+
+        tasks = [asyncio.create_task(fetch_one(url)) for url in dict.fromkeys(urls)]
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            print(f"PDF deadline of {deadline}s reached, skipped {len(pending)} of {len(tasks)} documents")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    return texts
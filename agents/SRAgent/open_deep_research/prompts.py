@@ -510,4 +510,32 @@ Example 2 (for a scientific article):
 }}
 ```
 
-Remember, your goal is to create a summary that can be easily understood and utilized by a downstream research agent while preserving the most critical information from the original webpage."""
\ No newline at end of file
+Remember, your goal is to create a summary that can be easily understood and utilized by a downstream research agent while preserving the most critical information from the original webpage."""
+
+BATCH_SUMMARIZATION_PROMPT = """You are tasked with summarizing the raw content of several short webpages retrieved from a web search. Each summary will be used by a downstream research agent, so keep the key facts, figures, names and dates of each page without losing essential information.
+
+Here are the webpages, each with a numeric id:
+
+{webpages}
+
+Please follow these guidelines:
+
+1. Summarize every webpage separately; never mix information from different pages.
+2. Retain key facts, statistics, and data points that are central to each page.
+3. Keep important quotes from credible sources or experts as key excerpts (up to 3 per page).
+4. Aim for about 25-30% of the original length of each page, unless it is already concise.
+
+Return one entry per webpage in the following format:
+
+```
+{{
+   "summaries": [
+     {{
+       "id": 0,
+       "summary": "Concise summary of webpage 0",
+       "key_excerpts": ["First important quote or excerpt", "Second important quote or excerpt"]
+     }},
+     ...one entry for each webpage id
+   ]
+}}
+```"""
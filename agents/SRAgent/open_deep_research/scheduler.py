@@ -0,0 +1,205 @@
+"""Admission of report sections fanned out with Send.
+
+Once the plan is approved every section starts at the same time, and each one
+makes several LLM and search calls. The nodes of a section (query generation,
+search, writing) are admitted through a ``SectionScheduler``, which lets at
+most ``max_concurrent_sections`` of them run at once and admits waiting nodes
+in the order of the report plan (so the streamed report fills in from the
+top). When ``provider_tokens_per_minute`` sets a token rate for the writer
+provider, the first node of a section is only admitted once a token bucket for
+that provider holds the section's estimated usage (``section_token_estimate``).
+
+Admission is per node rather than per section so the section subgraph stays a
+node of the report graph, with its own checkpoints and streamed updates.
+
+Schedulers and buckets are shared per event loop, so concurrent runs with the
+same settings also share their limits.
+"""
+
+import asyncio
+import contextlib
+import functools
+import heapq
+import itertools
+import json
+import threading
+import time
+import weakref
+from typing import Any, Dict, Mapping, Optional
+
+_lock = threading.Lock()
+_schedulers_by_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Any, SectionScheduler]]" = weakref.WeakKeyDictionary()
+_buckets_by_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Any, TokenBucket]]" = weakref.WeakKeyDictionary()
+
+
+class TokenBucket:
+    """Tokens that refill continuously up to one minute of the rate limit."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def seconds_until(self, tokens: int) -> float:
+        """Time until ``tokens`` are available; requests above capacity wait for a full bucket."""
+        self._refill()
+        missing = min(tokens, self.capacity) - self._tokens
+        return max(missing, 0.0) / self.rate
+
+    def take(self, tokens: int) -> None:
+        self._refill()
+        self._tokens -= min(tokens, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "bucket", "future")
+
+    def __init__(self, priority: int, seq: int, tokens: int, bucket: Optional[TokenBucket], future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.bucket = bucket
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class SectionScheduler:
+    """Runs sections in priority order with a limit on how many run at once."""
+
+    def __init__(self, max_concurrent: Optional[int] = None):
+        self.max_concurrent = max_concurrent
+        self._running = 0
+        self._waiting: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return sum(not waiter.future.done() for waiter in self._waiting)
+
+    @contextlib.asynccontextmanager
+    async def admit(self, priority: int = 0, tokens: int = 0, bucket: Optional[TokenBucket] = None):
+        """Wait for a slot (and for ``tokens`` in ``bucket``) and hold it for the duration of the block.
+
+        Args:
+            priority: Lower values are admitted first; equal priorities in arrival order
+            tokens: Estimated tokens the block will use
+            bucket: Token bucket of the provider the block calls
+        """
+        waiter = _Waiter(priority, next(self._seq), tokens, bucket, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiting, waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            # Cancelled right after being admitted: hand the slot on
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release()
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self._running -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._waiting:
+            waiter = self._waiting[0]
+            if waiter.future.done():
+                heapq.heappop(self._waiting)
+                continue
+            if self.max_concurrent and self._running >= self.max_concurrent:
+                return
+            if waiter.bucket is not None:
+                delay = waiter.bucket.seconds_until(waiter.tokens)
+                if delay > 0:
+                    # Lower priorities wait too, so a large section is not starved by small ones
+                    self._schedule(delay)
+                    return
+                waiter.bucket.take(waiter.tokens)
+            heapq.heappop(self._waiting)
+            self._running += 1
+            waiter.future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+
+def _loop_registry(registry: weakref.WeakKeyDictionary) -> dict:
+    return registry.setdefault(asyncio.get_running_loop(), {})
+
+
+def get_section_scheduler(max_concurrent: Optional[int] = None) -> SectionScheduler:
+    """Scheduler shared by all sections of this event loop with the same limit."""
+    with _lock:
+        schedulers = _loop_registry(_schedulers_by_loop)
+        if max_concurrent not in schedulers:
+            schedulers[max_concurrent] = SectionScheduler(max_concurrent)
+        return schedulers[max_concurrent]
+
+
+def get_token_bucket(provider: str, tokens_per_minute: int) -> TokenBucket:
+    """Token bucket shared by all sections of this event loop that call ``provider``."""
+    with _lock:
+        buckets = _loop_registry(_buckets_by_loop)
+        key = (provider, tokens_per_minute)
+        if key not in buckets:
+            buckets[key] = TokenBucket(tokens_per_minute)
+        return buckets[key]
+
+
+def section_priority(state: Mapping[str, Any]) -> int:
+    """Position of the section in the report plan; earlier sections are admitted first."""
+    return int(state.get("section_index") or 0)
+
+
+def scheduled_section(configuration_class, charge_tokens: bool = True):
+    """Decorator admitting a section node through the shared scheduler.
+
+    The node must take ``(state, config)``; ``state["section_index"]`` sets its priority.
+    Without ``max_concurrent_sections`` and ``provider_tokens_per_minute`` it runs
+    immediately, as before.
+
+    Args:
+        configuration_class: Configuration with the scheduling options of the graph
+        charge_tokens: Whether the node waits for and takes ``section_token_estimate``
+            tokens; set for the first node of a section only
+    """
+    def decorator(node):
+        @functools.wraps(node)
+        async def wrapper(state, config):
+            configurable = configuration_class.from_runnable_config(config)
+            max_concurrent = int(configurable.max_concurrent_sections or 0) or None
+            provider = str(getattr(configurable.writer_provider, "value", configurable.writer_provider))
+            limits = (configurable.provider_tokens_per_minute or {}) if charge_tokens else {}
+            if isinstance(limits, str):
+                # Set through the PROVIDER_TOKENS_PER_MINUTE environment variable
+                limits = json.loads(limits)
+            tokens_per_minute = limits.get(provider)
+            if not max_concurrent and not tokens_per_minute:
+                return await node(state, config)
+
+            bucket = get_token_bucket(provider, int(tokens_per_minute)) if tokens_per_minute else None
+            tokens = int(configurable.section_token_estimate) if bucket else 0
+            scheduler = get_section_scheduler(max_concurrent)
+            async with scheduler.admit(section_priority(state), tokens, bucket):
+                return await node(state, config)
+        return wrapper
+    return decorator
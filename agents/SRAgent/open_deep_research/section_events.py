@@ -0,0 +1,62 @@
+"""Listeners notified as report sections are completed.
+
+A research run publishes every section as soon as it is written, so callers
+can show it or start working on it while other sections are still being
+researched. Listeners are registered for the whole process with
+``subscribe()``, or only for sections published from the current task and the
+tasks it starts with ``listening()`` (e.g. one WebSocket connection).
+"""
+
+import contextlib
+import contextvars
+import inspect
+from typing import Awaitable, Callable, List, Tuple, Union
+
+SectionListener = Callable[[dict], Union[None, Awaitable[None]]]
+
+_scoped_listeners: contextvars.ContextVar[Tuple[SectionListener, ...]] = contextvars.ContextVar(
+    "section_listeners", default=()
+)
+
+
+class SectionEventBus:
+    """Delivers section events to sync or async listeners."""
+
+    def __init__(self):
+        self._listeners: List[SectionListener] = []
+
+    def subscribe(self, listener: SectionListener) -> Callable[[], None]:
+        """Receive every section of the process.
+
+        Returns:
+            Callable[[], None]: Function that removes the listener
+        """
+        self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return unsubscribe
+
+    @contextlib.contextmanager
+    def listening(self, listener: SectionListener):
+        """Receive the sections published from the current context inside the block."""
+        token = _scoped_listeners.set(_scoped_listeners.get() + (listener,))
+        try:
+            yield
+        finally:
+            _scoped_listeners.reset(token)
+
+    async def publish(self, event: dict) -> None:
+        """Send an event to all listeners; a failing listener does not stop the run."""
+        for listener in [*self._listeners, *_scoped_listeners.get()]:
+            try:
+                result = listener(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Warning: Section listener failed: {str(e)}")
+
+
+section_events = SectionEventBus()
@@ -0,0 +1,158 @@
+"""Single-flight coalescing of identical search queries that run at the same time.
+
+Section sub-graphs started together by ``Send`` often issue the same queries
+concurrently. While a query is in flight, later requests for the same
+normalized query (on the same backend with the same parameters) wait for it
+and reuse its response instead of calling the backend again. Optionally, a
+query whose embedding is close enough to an in-flight one is merged as well.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from open_deep_research.embeddings import normalize_rows
+from open_deep_research.index import normalize_query
+from open_deep_research.telemetry import record_search
+
+
+class _LeaderFailed(Exception):
+    """The call a query was waiting for failed or was cancelled."""
+
+
+@dataclass
+class _Flight:
+    future: asyncio.Future
+    embeddings: Optional[Embeddings] = None
+    vector: Optional[np.ndarray] = None
+
+
+def _missing_response(query: str) -> dict:
+    return {
+        "query": query,
+        "follow_up_questions": None,
+        "answer": None,
+        "images": [],
+        "results": [],
+        "error": "No response from the search backend",
+    }
+
+
+def search_scope(search_api: str, params: Optional[dict] = None) -> str:
+    """Key of a backend and its parameters; only queries with the same scope are merged."""
+    return f"{search_api}:{json.dumps(params or {}, sort_keys=True, default=str)}"
+
+
+class QueryCoalescer:
+    """Merges concurrent searches for the same queries into one backend call per query."""
+
+    def __init__(self):
+        self._flights: Dict[Tuple[str, str], _Flight] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _similar_flight(self, scope: str, embeddings: Embeddings, vector: np.ndarray, threshold: float) -> Optional[_Flight]:
+        best, best_score = None, threshold
+        for (flight_scope, _), flight in self._flights.items():
+            # Vectors of different embedding models are not comparable
+            if flight_scope != scope or flight.embeddings is not embeddings or flight.vector is None:
+                continue
+            score = float(flight.vector @ vector)
+            if score >= best_score:
+                best, best_score = flight, score
+        return best
+
+    async def search(
+        self,
+        scope: str,
+        queries: Sequence[str],
+        run_batch: Callable[[List[str]], Awaitable[List[dict]]],
+        similarity_threshold: Optional[float] = None,
+        embeddings: Optional[Embeddings] = None,
+    ) -> List[dict]:
+        """Run ``run_batch`` for the queries that are not already in flight and wait for the others.
+
+        Args:
+            scope: Backend and parameters, see ``search_scope``
+            queries: Search queries
+            run_batch: Searches a list of queries, returning one response per query in order
+            similarity_threshold: Cosine similarity above which a query is merged into an
+                in-flight one; None merges identical normalized queries only
+            embeddings: Embedding model for the similarity check
+
+        Returns:
+            List[dict]: One search response per query, in order; queries the backend
+                returned no response for get an empty response with an 'error'
+        """
+        vectors = None
+        if similarity_threshold is not None and embeddings is not None and queries:
+            vectors = normalize_rows(await embeddings.aembed_documents(list(queries)))
+
+        loop = asyncio.get_running_loop()
+        leaders: List[Tuple[int, Tuple[str, str], _Flight]] = []
+        waiting: Dict[int, _Flight] = {}
+        for i, query in enumerate(queries):
+            key = (scope, normalize_query(query))
+            flight = self._flights.get(key)
+            if flight is None and vectors is not None:
+                flight = self._similar_flight(scope, embeddings, vectors[i], similarity_threshold)
+            if flight is not None:
+                waiting[i] = flight
+                continue
+            flight = _Flight(loop.create_future(), embeddings, None if vectors is None else vectors[i])
+            self._flights[key] = flight
+            leaders.append((i, key, flight))
+
+        responses: List[Optional[dict]] = [None] * len(queries)
+        try:
+            if leaders:
+                batch = [queries[i] for i, _, _ in leaders]
+                results = list(await run_batch(batch))
+                # Match responses by query where possible; some backends drop or reorder failed queries
+                by_query = {result.get('query'): result for result in results if isinstance(result, dict)}
+                for position, (i, _, flight) in enumerate(leaders):
+                    response = by_query.get(queries[i])
+                    if response is None and len(results) == len(leaders):
+                        response = results[position]
+                    if response is not None:
+                        responses[i] = response
+                        flight.future.set_result(response)
+        finally:
+            for i, key, flight in leaders:
+                if not flight.future.done():
+                    flight.future.set_exception(_LeaderFailed())
+                    # Waiters may not exist; mark the exception as retrieved
+                    flight.future.exception()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+        retry = []
+        for i, flight in waiting.items():
+            try:
+                shared = await asyncio.shield(flight.future)
+            except _LeaderFailed:
+                retry.append(i)
+                continue
+            responses[i] = shared if shared.get('query') == queries[i] else {**shared, 'query': queries[i]}
+        if waiting:
+            record_search(scope.split(":", 1)[0], coalesced_queries=len(waiting) - len(retry))
+
+        # Queries whose leader failed are searched again, by this caller
+        if retry:
+            retried = await self.search(scope, [queries[i] for i in retry], run_batch, similarity_threshold, embeddings)
+            for i, response in zip(retry, retried):
+                responses[i] = response
+        # Queries the backend returned nothing for keep their position, as an empty response with an error
+        return [
+            response if response is not None else _missing_response(query)
+            for query, response in zip(queries, responses)
+        ]
+
+
+# Shared by all searches of the process, so parallel graph branches see each other's queries
+query_coalescer = QueryCoalescer()
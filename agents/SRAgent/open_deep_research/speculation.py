@@ -0,0 +1,106 @@
+"""Section research started while the report plan waits for approval.
+
+With ``speculative_section_research`` enabled, ``generate_report_plan`` starts
+the first query generation and search of every planned research section in
+the background before ``human_feedback`` interrupts. When the plan is approved
+the section subgraphs take these results instead of repeating the work. When
+the user asks for a new plan, sections of the new plan with the same name
+reuse their running or finished research and the rest is cancelled.
+
+Speculative research is admitted through the section scheduler like any other
+section. Sections claim it in ``take_speculative_research``, before any of
+their nodes is admitted, so a section never holds a slot while it waits for
+research that needs one too.
+
+Research is kept in memory per thread and event loop, so it only helps when
+the run is resumed in the same process (e.g. the WebSocket server or
+``deepresearch_agent``); a resume elsewhere simply researches as usual.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+# Unclaimed research of threads whose plan was never answered is dropped after this long
+SPECULATION_MAX_AGE_SECONDS = 3600
+
+class SpeculativeResearch:
+    """Background research tasks per thread, keyed by section name."""
+
+    def __init__(self, max_age_seconds: float = SPECULATION_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._tasks: Dict[str, Dict[str, Tuple[float, asyncio.Task]]] = {}
+
+    def start(self, thread_id: str, sections: Iterable, research: Callable[[object, int], Awaitable[dict]]) -> None:
+        """Research the planned sections of a thread in the background.
+
+        Running or finished research of sections with the same name is kept;
+        research of sections no longer in the plan is cancelled.
+
+        Args:
+            thread_id: Thread whose plan is waiting for approval
+            sections: Planned sections; only those that need research are started
+            research: Coroutine function researching one section, given the section and its
+                position in the plan, and returning its state update
+        """
+        self._prune()
+        previous = self._tasks.pop(thread_id, {})
+        tasks = {}
+        for index, section in enumerate(sections):
+            if not section.research or section.name in tasks:
+                continue
+            if section.name in previous:
+                tasks[section.name] = previous.pop(section.name)
+            else:
+                task = asyncio.create_task(research(section, index))
+                tasks[section.name] = (time.monotonic(), task)
+        for _, task in previous.values():
+            task.cancel()
+        if tasks:
+            self._tasks[thread_id] = tasks
+            print(f"Researching {len(tasks)} sections while the report plan waits for approval")
+
+    async def take(self, thread_id: Optional[str], section_name: str) -> Optional[dict]:
+        """Claim the research of a section, waiting for it if it is still running.
+
+        Must not be called while holding a section scheduler slot, since the
+        research may still be waiting for one.
+
+        Returns:
+            Optional[dict]: State update of the research, or None if there is none
+                (or it failed) and the section must be researched as usual
+        """
+        if not thread_id:
+            return None
+        entry = self._tasks.get(thread_id, {}).pop(section_name, None)
+        if entry is None:
+            return None
+        _, task = entry
+        if task.get_loop() is not asyncio.get_running_loop():
+            # Started in another event loop, whose task cannot be awaited here
+            return None
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None
+            # The section itself was cancelled
+            task.cancel()
+            raise
+        except Exception as e:
+            print(f"Warning: Speculative research of section '{section_name}' failed: {str(e)}")
+            return None
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - self.max_age_seconds
+        for thread_id in list(self._tasks):
+            tasks = self._tasks[thread_id]
+            for name, (created, task) in list(tasks.items()):
+                if created < cutoff:
+                    task.cancel()
+                    del tasks[name]
+            if not tasks:
+                del self._tasks[thread_id]
+
+
+speculative_research = SpeculativeResearch()
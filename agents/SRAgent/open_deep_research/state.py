@@ -55,14 +55,18 @@ class ReportState(TypedDict):
     final_report: str # Final report
     # for evaluation purposes only
     # this is included only if configurable.include_source_str is True
-    source_str: Annotated[str, operator.add] # String of formatted source content from web search
+    source_refs: Annotated[list[str], operator.add] # Content store references of the formatted sources of each section
+    run_key: str # Identifies the run's source index when it runs without a thread_id
 
 class SectionState(TypedDict):
     topic: str # Report topic
     section: Section # Report section  
+    section_index: int # Position of the section in the report plan, the order in which sections are scheduled
     search_iterations: int # Number of search iterations done
+    run_key: str # Identifies the run's source index when it runs without a thread_id
     search_queries: list[SearchQuery] # List of search queries
-    source_str: str # String of formatted source content from web search
+    source_ref: str # Content store reference of the formatted source content from web search
+    visited_sources: dict[str, str] # Content store references of sources found by earlier search iterations, keyed by canonical URL
     report_sections_from_research: str # String of any completed sections from research to write final sections
     completed_sections: list[Section] # Final key we duplicate in outer state for Send() API
 
@@ -70,4 +74,4 @@ class SectionOutputState(TypedDict):
     completed_sections: list[Section] # Final key we duplicate in outer state for Send() API
     # for evaluation purposes only
     # this is included only if configurable.include_source_str is True
-    source_str: str # String of formatted source content from web search
+    source_refs: list[str] # Content store references of the formatted source content from web search
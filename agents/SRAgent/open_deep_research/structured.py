@@ -0,0 +1,241 @@
+"""Structured LLM output with local repair of malformed responses.
+
+``with_structured_output`` fails whenever the model's JSON does not validate,
+and the usual remedy is to send the whole request again. Most failures are
+trivial, though: JSON wrapped in code fences or followed by text, trailing
+commas, Python literals, a list given as a single item or as a JSON string,
+list items given as plain strings, or a literal in the wrong case.
+
+``repairing_structured_output`` asks for the raw response alongside the parsed
+one and, when parsing failed, repairs and validates the response locally.
+Only when that fails too is the model called again (up to ``max_retries``
+attempts, skipping the LLM response cache). Repairs are counted per schema as
+retries avoided in the run metrics.
+"""
+
+import ast
+import json
+import re
+import typing
+from typing import Any, Iterator, Optional, Type
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from pydantic import BaseModel, ValidationError
+
+from open_deep_research.llm_cache import bypass_llm_cache
+from open_deep_research.telemetry import record_structured_output
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# Keys under which models sometimes nest the actual arguments
+_WRAPPER_KEYS = ("properties", "arguments", "parameters", "input", "data")
+
+
+def _balanced_json(text: str) -> Iterator[str]:
+    """Substrings of text that start with { or [ and end at the matching bracket."""
+    for start, char in enumerate(text):
+        if char not in "{[":
+            continue
+        depth, in_string, escaped = 0, False, False
+        for end in range(start, len(text)):
+            c = text[end]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif c == "\\":
+                    escaped = True
+                elif c == '"':
+                    in_string = False
+            elif c == '"':
+                in_string = True
+            elif c in "{[":
+                depth += 1
+            elif c in "}]":
+                depth -= 1
+                if depth == 0:
+                    yield text[start:end + 1]
+                    break
+        else:
+            # Unterminated from here on, later starts are inside this one
+            return
+
+
+def _loads(text: str) -> Any:
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            pass
+    # Single quotes and True/False/None
+    return ast.literal_eval(_TRAILING_COMMA.sub(r"\1", text))
+
+
+def extract_json(text: str) -> Any:
+    """The first JSON value in text, tolerating code fences, surrounding prose and common syntax slips.
+
+    Raises:
+        ValueError: If no JSON value could be read
+    """
+    text = text.strip()
+    fenced = _FENCE.findall(text)
+    for candidate in [*fenced, text]:
+        for snippet in _balanced_json(candidate):
+            try:
+                return _loads(snippet)
+            except (ValueError, SyntaxError):
+                continue
+    raise ValueError("No JSON object found in the response")
+
+
+def _unwrap_type(annotation: Any) -> Any:
+    # Optional[X] -> X
+    if typing.get_origin(annotation) is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+
+def _is_model(annotation: Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, BaseModel)
+
+
+def _coerce_value(value: Any, annotation: Any) -> Any:
+    annotation = _unwrap_type(annotation)
+    origin = typing.get_origin(annotation)
+
+    if isinstance(value, str) and (origin in (list, dict) or _is_model(annotation)):
+        # A list or object serialized into a string
+        try:
+            value = _loads(value)
+        except (ValueError, SyntaxError):
+            pass
+
+    if origin is list:
+        (item_type,) = typing.get_args(annotation) or (Any,)
+        if not isinstance(value, list):
+            value = [value]
+        return [_coerce_value(item, item_type) for item in value]
+
+    if origin is typing.Literal and isinstance(value, str):
+        for option in typing.get_args(annotation):
+            if isinstance(option, str) and option.lower() == value.strip().lower():
+                return option
+        return value
+
+    if _is_model(annotation):
+        if isinstance(value, str):
+            # A plain string for a model with a single string field
+            string_fields = [name for name, f in annotation.model_fields.items() if f.annotation is str]
+            if len(annotation.model_fields) == 1 and string_fields:
+                return {string_fields[0]: value}
+            return value
+        return coerce_to_schema(value, annotation)
+
+    return value
+
+
+def coerce_to_schema(data: Any, schema: Type[BaseModel]) -> Any:
+    """Fix common shape mistakes in data meant for schema; the result still needs validation."""
+    if not isinstance(data, dict):
+        if isinstance(data, list) and len(schema.model_fields) == 1:
+            # The value of the only field without the object around it
+            data = {next(iter(schema.model_fields)): data}
+        else:
+            return data
+    fields = schema.model_fields
+    # {"Queries": {...}} or {"properties": {...}} instead of the object itself
+    if len(data) == 1 and not set(data) & set(fields):
+        (key, inner), = data.items()
+        if isinstance(inner, dict) and (key.lower() == schema.__name__.lower() or key in _WRAPPER_KEYS):
+            data = inner
+    return {
+        key: _coerce_value(value, fields[key].annotation) if key in fields else value
+        for key, value in data.items()
+    }
+
+
+def _candidates(raw: AIMessage, schema: Type[BaseModel]) -> Iterator[Any]:
+    # Tool calls for the schema first, then any other tool call, then the text
+    tool_calls = sorted(raw.tool_calls or [], key=lambda call: call.get("name") != schema.__name__)
+    for call in tool_calls:
+        yield call.get("args")
+    for call in getattr(raw, "invalid_tool_calls", None) or []:
+        args = call.get("args")
+        if isinstance(args, str):
+            try:
+                yield extract_json(args)
+            except ValueError:
+                pass
+    content = raw.content
+    if isinstance(content, list):
+        content = "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+    if isinstance(content, str) and content.strip():
+        try:
+            yield extract_json(content)
+        except ValueError:
+            pass
+
+
+def repair_structured_output(raw: Optional[AIMessage], schema: Type[BaseModel]) -> Optional[BaseModel]:
+    """Validate a response that failed to parse after repairing it locally.
+
+    Returns:
+        Optional[BaseModel]: The repaired object, or None if the response cannot be repaired
+    """
+    if raw is None:
+        return None
+    for candidate in _candidates(raw, schema):
+        try:
+            return schema.model_validate(coerce_to_schema(candidate, schema))
+        except (ValidationError, TypeError, ValueError):
+            continue
+    return None
+
+
+def repairing_structured_output(model: BaseChatModel, schema: Type[BaseModel], max_retries: int = 3,
+                                **kwargs: Any) -> Runnable:
+    """Like ``model.with_structured_output(schema)``, with local repair before retrying.
+
+    Args:
+        model: Chat model
+        schema: Pydantic model of the output
+        max_retries: Total LLM calls before giving up
+        **kwargs: Further arguments of with_structured_output
+
+    Returns:
+        Runnable: Runnable returning an instance of schema
+
+    Raises:
+        OutputParserException: (from the runnable) if no attempt produced a valid object
+    """
+    structured = model.with_structured_output(schema, include_raw=True, **kwargs)
+    name = schema.__name__
+
+    async def invoke(messages: Any, config: Optional[RunnableConfig] = None) -> BaseModel:
+        error: Any = None
+        attempts = max(1, int(max_retries))
+        for attempt in range(attempts):
+            if attempt:
+                # The cached response is the one that failed
+                with bypass_llm_cache():
+                    result = await structured.ainvoke(messages, config)
+            else:
+                result = await structured.ainvoke(messages, config)
+            record_structured_output(name, calls=1)
+            if result.get("parsed") is not None and result.get("parsing_error") is None:
+                return result["parsed"]
+            repaired = repair_structured_output(result.get("raw"), schema)
+            if repaired is not None:
+                record_structured_output(name, repaired=1)
+                return repaired
+            error = result.get("parsing_error") or "no structured output in the response"
+            if attempt + 1 < attempts:
+                record_structured_output(name, retries=1)
+        record_structured_output(name, failures=1)
+        raise OutputParserException(f"Failed to parse {name} after {attempts} attempts: {error}")
+
+    return RunnableLambda(invoke, name=f"{name}StructuredOutput")
@@ -0,0 +1,370 @@
+"""Structured metrics for the search layer and the research graph nodes.
+
+Counters are kept per search backend (calls, failed queries, HTTP requests,
+retries, 429 responses, bytes downloaded, results, tokens after formatting and
+a latency histogram), per graph node (calls and a latency histogram), per
+structured output schema (calls, local repairs, retries and failures) and for
+source deduplication (sources and tokens removed by each step).
+
+Everything is recorded into the process-wide ``metrics`` and, inside a
+``run_metrics()`` block, into that run's metrics as well, so a server can
+export totals while each research run writes its own summary.
+"""
+
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Dict, List, Optional, Sequence
+
+from open_deep_research.cache import all_caches
+from open_deep_research.extraction import extraction_metrics
+
+# Upper bounds in seconds of the latency buckets; slower observations go to a final +Inf bucket
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative (Prometheus-style) bucket counts."""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the maximum for the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "max": round(self.max, 6),
+            "buckets": buckets,
+        }
+
+
+@dataclass
+class SearchBackendMetrics:
+    """Counters of one search backend."""
+    calls: int = 0
+    queries: int = 0
+    failed_queries: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    http_requests: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    bytes_downloaded: int = 0
+    results: int = 0
+    formatted_tokens: int = 0
+    coalesced_queries: int = 0
+    revisited_sources: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+
+    def snapshot(self) -> dict:
+        values = {name: value for name, value in vars(self).items() if name != "latency"}
+        return {**values, "latency_seconds": self.latency.snapshot()}
+
+
+@dataclass
+class StructuredOutputMetrics:
+    """Counters of the structured output calls of one schema."""
+    calls: int = 0
+    repaired: int = 0 # Responses repaired locally instead of calling the model again
+    retries: int = 0
+    failures: int = 0
+
+    def snapshot(self) -> dict:
+        return dict(vars(self))
+
+
+@dataclass
+class DedupMetrics:
+    """Sources and estimated tokens removed by each source deduplication step."""
+    sources_in: int = 0
+    sources_out: int = 0
+    removed_exact_url: int = 0
+    removed_canonical_url: int = 0
+    removed_near_duplicate: int = 0
+    tokens_saved_exact_url: int = 0
+    tokens_saved_canonical_url: int = 0
+    tokens_saved_near_duplicate: int = 0
+
+    def snapshot(self) -> dict:
+        return dict(vars(self))
+
+
+@dataclass
+class NodeMetrics:
+    """Counters of one graph node."""
+    calls: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+
+    def snapshot(self) -> dict:
+        return {"calls": self.calls, "latency_seconds": self.latency.snapshot()}
+
+
+class Metrics:
+    """One set of search and node metrics, e.g. for the process or for a single run."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.search: Dict[str, SearchBackendMetrics] = {}
+        self.nodes: Dict[str, NodeMetrics] = {}
+        self.structured_output: Dict[str, StructuredOutputMetrics] = {}
+        self.dedup = DedupMetrics()
+        self._lock = threading.Lock()
+        # Caches and extraction keep process-wide totals; a run reports the change since it started
+        self._cache_baseline = {name: cache.stats() for name, cache in all_caches().items()}
+        self._extraction_baseline = extraction_metrics.snapshot()
+
+    def update_search(self, backend: str, **increments) -> None:
+        with self._lock:
+            stats = self.search.setdefault(backend, SearchBackendMetrics())
+            for name, value in increments.items():
+                setattr(stats, name, getattr(stats, name) + value)
+
+    def observe_search(self, backend: str, seconds: float) -> None:
+        with self._lock:
+            self.search.setdefault(backend, SearchBackendMetrics()).latency.observe(seconds)
+
+    def update_structured_output(self, schema: str, **increments) -> None:
+        with self._lock:
+            stats = self.structured_output.setdefault(schema, StructuredOutputMetrics())
+            for name, value in increments.items():
+                setattr(stats, name, getattr(stats, name) + value)
+
+    def update_dedup(self, **increments) -> None:
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self.dedup, name, getattr(self.dedup, name) + value)
+
+    def observe_node(self, node: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.nodes.setdefault(node, NodeMetrics())
+            stats.calls += 1
+            stats.latency.observe(seconds)
+
+    def _cache_stats(self) -> dict:
+        caches = {}
+        for name, cache in all_caches().items():
+            current = cache.stats()
+            baseline = self._cache_baseline.get(name, {})
+            hits = current["hits"] - baseline.get("hits", 0)
+            misses = current["misses"] - baseline.get("misses", 0)
+            caches[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+                "bytes": current["bytes"],
+            }
+        return caches
+
+    def snapshot(self) -> dict:
+        """JSON-serializable view of all metrics."""
+        extraction = {
+            name: value - self._extraction_baseline.get(name, 0)
+            for name, value in extraction_metrics.snapshot().items()
+        }
+        with self._lock:
+            return {
+                "started": self.started,
+                "elapsed_seconds": round(time.time() - self.started, 3),
+                "search": {backend: stats.snapshot() for backend, stats in self.search.items()},
+                "nodes": {node: stats.snapshot() for node, stats in self.nodes.items()},
+                "structured_output": {schema: stats.snapshot() for schema, stats in self.structured_output.items()},
+                "dedup": self.dedup.snapshot(),
+                "extraction": extraction,
+                "caches": self._cache_stats(),
+            }
+
+
+# Process-wide totals, exported by the servers
+metrics = Metrics()
+
+_run_metrics: contextvars.ContextVar[Optional[Metrics]] = contextvars.ContextVar("run_metrics", default=None)
+_current_backend: contextvars.ContextVar[str] = contextvars.ContextVar("search_backend", default="other")
+
+
+def _targets() -> List[Metrics]:
+    run = _run_metrics.get()
+    return [metrics] if run is None else [metrics, run]
+
+
+@contextlib.contextmanager
+def run_metrics():
+    """Collect the metrics of everything awaited inside the block into a new Metrics.
+
+    Cache and extraction figures are process-wide deltas, so they also include
+    work of other runs executing at the same time.
+    """
+    run = Metrics()
+    token = _run_metrics.set(run)
+    try:
+        yield run
+    finally:
+        _run_metrics.reset(token)
+
+
+def record_search(backend: Optional[str] = None, **increments) -> None:
+    """Add to counters of a search backend (by default the one currently executing)."""
+    backend = backend or _current_backend.get()
+    for target in _targets():
+        target.update_search(backend, **increments)
+
+
+def record_structured_output(schema: str, **increments) -> None:
+    """Add to counters of the structured output calls of a schema."""
+    for target in _targets():
+        target.update_structured_output(schema, **increments)
+
+
+def record_dedup(**increments) -> None:
+    """Add to the source deduplication counters."""
+    for target in _targets():
+        target.update_dedup(**increments)
+
+
+def record_http_response(response) -> None:
+    """Count a fully read httpx response of the current backend, including 429s."""
+    record_search(
+        http_requests=1,
+        rate_limited=int(response.status_code == 429),
+        bytes_downloaded=len(response.content),
+    )
+
+
+def record_retry(rate_limited: bool = False) -> None:
+    """Count a retried request of the current backend."""
+    record_search(retries=1, rate_limited=int(rate_limited))
+
+
+async def track_search(backend: str, search: Awaitable, queries: int):
+    """Await a backend search, recording its latency, results and failures.
+
+    HTTP requests made while it runs are attributed to ``backend``.
+    """
+    token = _current_backend.set(backend)
+    start = time.perf_counter()
+    outcome = {}
+    try:
+        responses = await search
+        # Search tools return formatted text; only raw responses can be inspected
+        if isinstance(responses, list):
+            outcome["results"] = sum(len(response.get("results", [])) for response in responses)
+            outcome["failed_queries"] = sum(1 for response in responses if response.get("error"))
+        return responses
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        outcome["timeouts"] = 1
+        raise
+    except Exception:
+        outcome["errors"] = 1
+        raise
+    finally:
+        _current_backend.reset(token)
+        seconds = time.perf_counter() - start
+        for target in _targets():
+            target.update_search(backend, calls=1, queries=queries, **outcome)
+            target.observe_search(backend, seconds)
+
+
+def timed_node(func):
+    """Decorator recording the latency of a graph node, sync or async."""
+    name = func.__name__
+
+    def observe(start: float) -> None:
+        seconds = time.perf_counter() - start
+        for target in _targets():
+            target.observe_node(name, seconds)
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                observe(start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            observe(start)
+    return wrapper
+
+
+def write_metrics(snapshot: dict, path: str) -> None:
+    """Write a metrics snapshot as JSON."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2)
+
+
+def format_metrics_summary(snapshot: dict) -> str:
+    """One line per search backend and node, for logs."""
+    lines = []
+    for backend, stats in snapshot["search"].items():
+        latency = stats["latency_seconds"]
+        lines.append(
+            f"search {backend}: {stats['calls']} calls, {stats['queries']} queries "
+            f"({stats['failed_queries']} failed, {stats['timeouts']} timeouts), "
+            f"p50 {latency['p50']:.2f}s p95 {latency['p95']:.2f}s, {stats['retries']} retries, "
+            f"{stats['rate_limited']} rate limited, {stats['bytes_downloaded']} bytes, "
+            f"{stats['formatted_tokens']} tokens, {stats['coalesced_queries']} coalesced, "
+            f"{stats['revisited_sources']} revisited"
+        )
+    for node, stats in snapshot["nodes"].items():
+        latency = stats["latency_seconds"]
+        lines.append(f"node {node}: {stats['calls']} calls, mean {latency['mean']:.2f}s, max {latency['max']:.2f}s")
+    for schema, stats in snapshot.get("structured_output", {}).items():
+        lines.append(
+            f"structured output {schema}: {stats['calls']} calls, {stats['repaired']} repaired "
+            f"(retries avoided), {stats['retries']} retries, {stats['failures']} failed"
+        )
+    dedup = snapshot.get("dedup")
+    if dedup and dedup["sources_in"]:
+        saved = sum(value for name, value in dedup.items() if name.startswith("tokens_saved_"))
+        lines.append(
+            f"dedup: {dedup['sources_in']} -> {dedup['sources_out']} sources, "
+            f"{dedup['removed_exact_url']} exact URL, {dedup['removed_canonical_url']} canonical URL, "
+            f"{dedup['removed_near_duplicate']} near-duplicate, {saved} tokens saved"
+        )
+    for name, stats in snapshot["caches"].items():
+        lines.append(f"cache {name}: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_ratio']:.0%})")
+    return "\n".join(lines)
@@ -1,10 +1,10 @@
 import os
 import asyncio
+import contextvars
 import json
 import datetime
-import requests
 import random 
-import concurrent
+import re
 import hashlib
 import aiohttp
 import httpx
@@ -12,9 +12,9 @@ import time
 from typing import List, Optional, Dict, Any, Union, Literal, Annotated, cast
 from urllib.parse import unquote
 from collections import defaultdict
+from xml.etree import ElementTree
 import itertools
 
-from exa_py import Exa
 try:
     from linkup import LinkupClient
 except ImportError:
@@ -27,26 +27,58 @@ from azure.core.credentials import AzureKeyCredential
 from azure.search.documents.aio import SearchClient as AsyncAzureAISearchClient
 from duckduckgo_search import DDGS 
 from bs4 import BeautifulSoup
-from markdownify import markdownify
 from pydantic import BaseModel
-from langchain.chat_models import init_chat_model
-from langchain.embeddings import init_embeddings
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_anthropic import ChatAnthropic
 from langchain_core.language_models import BaseChatModel
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import InjectedToolArg
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_community.retrievers import ArxivRetriever
-from langchain_community.utilities.pubmed import PubMedAPIWrapper
 from langchain_core.tools import tool
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langsmith import traceable
 
 from open_deep_research.configuration import Configuration
 from open_deep_research.state import Section
-from open_deep_research.prompts import SUMMARIZATION_PROMPT
+from open_deep_research.prompts import SUMMARIZATION_PROMPT, BATCH_SUMMARIZATION_PROMPT
+from open_deep_research.extraction import (
+    DEFAULT_MAX_HTML_BYTES,
+    DEFAULT_MAX_PDF_CHARS,
+    DEFAULT_MAX_PDF_PAGES,
+    extract_main_content_async,
+    read_capped,
+)
+from open_deep_research.budget import (
+    TokenCounter,
+    allocate_token_budget,
+    get_token_counter,
+    source_weights,
+)
+from open_deep_research.cache import content_hash, get_cache
+from open_deep_research.content_store import content_store
+from open_deep_research.embeddings import get_embeddings, normalize_rows, top_k_similar
+from open_deep_research.index import HybridIndex, get_run_index
+from open_deep_research.fusion import (
+    DEFAULT_FUSION_BACKENDS,
+    DEFAULT_SEARCH_DEADLINE_SECONDS,
+    fan_out_search,
+    fuse_search_responses,
+)
+from open_deep_research.local_search import local_search_async
+from open_deep_research.models import get_chat_model
+from open_deep_research.telemetry import record_dedup, record_http_response, record_retry, record_search, track_search
+from open_deep_research.singleflight import query_coalescer, search_scope
+from open_deep_research.structured import repairing_structured_output
+from open_deep_research.dedup import DedupStats, NearDuplicateIndex, canonicalize_url, simhash
+from open_deep_research.pdf import (
+    DEFAULT_MAX_PDF_BYTES,
+    DEFAULT_PDF_DEADLINE_SECONDS,
+    fetch_pdf_texts,
+    pdf_bytes_to_text,
+)
+
+# Canonical URLs whose full content the current search need not download again
+_skip_fetch_urls: contextvars.ContextVar[frozenset] = contextvars.ContextVar("skip_fetch_urls", default=frozenset())
 
 
 def get_config_value(value):
@@ -60,6 +92,27 @@ def get_config_value(value):
     else:
         return value.value
 
+def get_search_token_counter(configurable) -> TokenCounter:
+    """Token counter for the writer model, which reads the formatted search results."""
+    return get_token_counter(get_config_value(configurable.writer_model), configurable.tokenizer)
+
+def get_coalescing_options(configurable) -> Dict[str, Any]:
+    """Options that also merge near-duplicate in-flight queries, if search_coalesce_similarity is set."""
+    if configurable.search_coalesce_similarity is None:
+        return {}
+    return {
+        "similarity_threshold": configurable.search_coalesce_similarity,
+        "embeddings": get_embeddings(configurable.embedding_model),
+    }
+
+def get_configured_run_index(configurable, config: RunnableConfig, run_key: Optional[str] = None) -> HybridIndex:
+    """Index of the current research run, with vector search if run_index_embeddings is set.
+
+    ``run_key`` from the graph state identifies runs without a thread_id.
+    """
+    embeddings = get_embeddings(configurable.embedding_model) if configurable.run_index_embeddings else None
+    return get_run_index(config, embeddings, run_key)
+
 def get_search_params(search_api: str, search_api_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Filters the search_api_config dictionary to include only parameters accepted by the specified search API.
@@ -76,10 +129,12 @@ def get_search_params(search_api: str, search_api_config: Optional[Dict[str, Any
         "exa": ["max_characters", "num_results", "include_domains", "exclude_domains", "subpages"],
         "tavily": ["max_results", "topic"],
         "perplexity": [],  # Perplexity accepts no additional parameters
-        "arxiv": ["load_max_docs", "get_full_documents", "load_all_available_meta"],
+        "arxiv": ["load_max_docs", "get_full_documents", "load_all_available_meta", "max_pdf_pages", "max_pdf_chars", "pdf_deadline"],
         "pubmed": ["top_k_results", "email", "api_key", "doc_content_chars_max"],
         "linkup": ["depth"],
         "googlesearch": ["max_results"],
+        "fusion": ["backends", "backend_params", "deadline", "hedge_after"],
+        "local": ["corpus_dir", "max_results"],
     }
 
     # Get the list of accepted parameters for the given search API
@@ -96,11 +151,19 @@ def deduplicate_and_format_sources(
     search_response,
     max_tokens_per_source=5000,
     include_raw_content=True,
-    deduplication_strategy: Literal["keep_first", "keep_last"] = "keep_first"
+    deduplication_strategy: Literal["keep_first", "keep_last"] = "keep_first",
+    detect_near_duplicates: bool = True,
+    total_token_budget: Optional[int] = None,
+    token_counter: Optional[TokenCounter] = None,
 ):
     """
     Takes a list of search responses and formats them into a readable string.
-    Limits the raw_content to approximately max_tokens_per_source tokens.
+    Limits the raw_content to max_tokens_per_source tokens and, if a total
+    budget is given, shares that budget across sources by score or rank.
+
+    Sources are deduplicated in three steps: identical URLs, URLs that are equal
+    after canonicalization (tracking parameters, mirror hosts, arXiv abs/pdf
+    variants) and, optionally, near-duplicate content detected with SimHash.
  
     Args:
         search_responses: List of search response dicts, each containing:
@@ -114,47 +177,91 @@ def deduplicate_and_format_sources(
         max_tokens_per_source: int
         include_raw_content: bool
         deduplication_strategy: Whether to keep the first or last search result for each unique URL
+        detect_near_duplicates: Whether to drop sources whose content nearly matches an earlier source
+        total_token_budget: Total tokens for all formatted sources; summaries are always kept and
+            the remainder is split across the full contents. None applies only the per-source limit.
+        token_counter: Tokenizer of the model that will read the sources
     Returns:
         str: Formatted string with deduplicated sources
     """
-     # Collect all results
+    if deduplication_strategy not in ("keep_first", "keep_last"):
+        raise ValueError(f"Invalid deduplication strategy: {deduplication_strategy}")
+
+    counter = token_counter or get_token_counter()
+
+    def estimated_tokens(source) -> int:
+        raw_content = (source.get('raw_content') or '') if include_raw_content else ''
+        return counter.count(source.get('content')) + min(counter.count(raw_content), max_tokens_per_source)
+
+    # Collect all results
     sources_list = []
     for response in search_response:
         sources_list.extend(response['results'])
-
-    # Deduplicate by URL
-    if deduplication_strategy == "keep_first":
-        unique_sources = {}
-        for source in sources_list:
-            if source['url'] not in unique_sources:
-                unique_sources[source['url']] = source
-    elif deduplication_strategy == "keep_last":
-        unique_sources = {source['url']: source for source in sources_list}
-    else:
-        raise ValueError(f"Invalid deduplication strategy: {deduplication_strategy}")
-
-    # Format output
-    formatted_text = "Content from sources:\n"
-    for i, source in enumerate(unique_sources.values(), 1):
-        formatted_text += f"{'='*80}\n"  # Clear section separator
-        formatted_text += f"Source: {source['title']}\n"
-        formatted_text += f"{'-'*80}\n"  # Subsection separator
-        formatted_text += f"URL: {source['url']}\n===\n"
-        formatted_text += f"Most relevant content from source: {source['content']}\n===\n"
-        if include_raw_content:
-            # Using rough estimate of 4 characters per token
-            char_limit = max_tokens_per_source * 4
+    stats = DedupStats(sources_in=len(sources_list))
+
+    # Deduplicate by exact URL, then by canonical URL
+    unique_sources = {}
+    seen_urls = set()
+    for source in sources_list:
+        key = canonicalize_url(source['url'])
+        if key in unique_sources:
+            step = "exact_url" if source['url'] in seen_urls else "canonical_url"
+            if deduplication_strategy == "keep_first":
+                stats.add(step, estimated_tokens(source))
+                continue
+            stats.add(step, estimated_tokens(unique_sources[key]))
+        unique_sources[key] = source
+        seen_urls.add(source['url'])
+
+    # Drop mirrors and syndicated copies whose text is nearly identical to an earlier source
+    if detect_near_duplicates:
+        near_duplicates = NearDuplicateIndex()
+        kept_sources = {}
+        for key, source in unique_sources.items():
+            fingerprint = simhash(source.get('raw_content') or source.get('content') or '')
+            if fingerprint is not None:
+                if near_duplicates.find(fingerprint) is not None:
+                    stats.add("near_duplicate", estimated_tokens(source))
+                    continue
+                near_duplicates.add(fingerprint)
+            kept_sources[key] = source
+        unique_sources = kept_sources
+    stats.sources_out = len(unique_sources)
+    record_dedup(**stats.counters())
+    if stats.sources_out < stats.sources_in:
+        print(stats.summary())
+
+    sources = list(unique_sources.values())
+    raw_contents = []
+    if include_raw_content:
+        for source in sources:
             # Handle None raw_content
             raw_content = source.get('raw_content', '')
             if raw_content is None:
                 raw_content = ''
                 print(f"Warning: No raw_content found for source {source['url']}")
-            if len(raw_content) > char_limit:
-                raw_content = raw_content[:char_limit] + "... [truncated]"
-            formatted_text += f"Full source content limited to {max_tokens_per_source} tokens: {raw_content}\n\n"
-        formatted_text += f"{'='*80}\n\n" # End section separator
+            raw_contents.append(raw_content)
+
+        # Tokens each full content may use: the per-source limit, shrunk to fit the total budget
+        limits = [min(counter.count(raw_content), max_tokens_per_source) for raw_content in raw_contents]
+        if total_token_budget is not None:
+            fixed_tokens = sum(counter.count(source['title']) + counter.count(source['content']) + 60 for source in sources)
+            limits = allocate_token_budget(limits, max(total_token_budget - fixed_tokens, 0), source_weights(sources))
+        raw_contents = [counter.truncate(raw_content, limit) for raw_content, limit in zip(raw_contents, limits)]
+
+    # Format output
+    parts = ["Content from sources:\n"]
+    for i, source in enumerate(sources):
+        parts.append(f"{'='*80}\n")  # Clear section separator
+        parts.append(f"Source: {source['title']}\n")
+        parts.append(f"{'-'*80}\n")  # Subsection separator
+        parts.append(f"URL: {source['url']}\n===\n")
+        parts.append(f"Most relevant content from source: {source['content']}\n===\n")
+        if include_raw_content:
+            parts.append(f"Full source content limited to {max_tokens_per_source} tokens: {raw_contents[i]}\n\n")
+        parts.append(f"{'='*80}\n\n") # End section separator
                 
-    return formatted_text.strip()
+    return "".join(parts).strip()
 
 def format_sections(sections: list[Section]) -> str:
     """ Format a list of sections into a string """
@@ -281,8 +388,37 @@ async def azureaisearch_search_async(search_queries: list[str], max_results: int
         return await asyncio.gather(*tasks)
 
 
+class AsyncRateLimiter:
+    """Spaces out requests so that at most ``rate`` of them start per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _empty_search_response(query: str, error: Optional[str] = None) -> dict:
+    response = {
+        "query": query,
+        "follow_up_questions": None,
+        "answer": None,
+        "images": [],
+        "results": []
+    }
+    if error is not None:
+        response["error"] = error
+    return response
+
 @traceable
-def perplexity_search(search_queries):
+async def perplexity_search(search_queries):
     """Search the web using the Perplexity API.
     
     Args:
@@ -314,9 +450,7 @@ def perplexity_search(search_queries):
         "Authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY')}"
     }
     
-    search_docs = []
-    for query in search_queries:
-
+    async def process_query(client: httpx.AsyncClient, query: str):
         payload = {
             "model": "sonar-pro",
             "messages": [
@@ -331,12 +465,17 @@ def perplexity_search(search_queries):
             ]
         }
         
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()  # Raise exception for bad status codes
+        try:
+            response = await client.post(
+                "https://api.perplexity.ai/chat/completions",
+                headers=headers,
+                json=payload
+            )
+            record_http_response(response)
+            response.raise_for_status()  # Raise exception for bad status codes
+        except httpx.HTTPError as e:
+            print(f"Error processing Perplexity query '{query}': {str(e)}")
+            return _empty_search_response(query, error=str(e))
         
         # Parse the response
         data = response.json()
@@ -366,15 +505,70 @@ def perplexity_search(search_queries):
             })
         
         # Format response to match Tavily structure
-        search_docs.append({
+        return {
             "query": query,
             "follow_up_questions": None,
             "answer": None,
             "images": [],
             "results": results
-        })
+        }
     
-    return search_docs
+    # Answers take several seconds each, so all queries run at once
+    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0)) as client:
+        return list(await asyncio.gather(*(process_query(client, query) for query in search_queries)))
+
+EXA_SEARCH_URL = "https://api.exa.ai/search"
+
+def _format_exa_response(query: str, response: dict, subpages: Optional[int]) -> dict:
+    """Convert an Exa /search response to the common search response format."""
+    formatted_results = []
+    seen_urls = set()  # Track URLs to avoid duplicates
+
+    def combined_content(item):
+        # Combine summary and text for content if both are available
+        text_content = item.get('text') or ''
+        summary_content = item.get('summary') or ''
+        if summary_content:
+            return f"{summary_content}\n\n{text_content}" if text_content else summary_content
+        return text_content
+
+    results_list = response.get('results', [])
+
+    # First process all main results, then subpages if they were requested
+    items = list(results_list)
+    if subpages is not None:
+        items.extend(subpage for result in results_list for subpage in result.get('subpages') or [])
+
+    for item in items:
+        url = item.get('url', '')
+        # Skip if we've seen this URL before (removes duplicate entries)
+        if url in seen_urls:
+            continue
+        seen_urls.add(url)
+
+        formatted_results.append({
+            "title": item.get('title') or '',
+            "url": url,
+            "content": combined_content(item),
+            # Get the score with a default of 0.0 if it's None or not present
+            "score": item.get('score') or 0.0,
+            "raw_content": item.get('text') or ''
+        })
+
+    # Collect images if available (only from main results to avoid duplication)
+    images = []
+    for result in results_list:
+        image = result.get('image')
+        if image and image not in images:
+            images.append(image)
+
+    return {
+        "query": query,
+        "follow_up_questions": None,
+        "answer": None,
+        "images": images,
+        "results": formatted_results
+    }
 
 @traceable
 async def exa_search(search_queries, max_characters: Optional[int] = None, num_results=5, 
@@ -382,6 +576,9 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
                      exclude_domains: Optional[List[str]] = None,
                      subpages: Optional[int] = None):
     """Search the web using the Exa API.
+
+    Queries run concurrently through the REST API, spaced out to stay under
+    Exa's rate limit.
     
     Args:
         search_queries (List[SearchQuery]): List of search queries to process
@@ -417,178 +614,110 @@ async def exa_search(search_queries, max_characters: Optional[int] = None, num_r
     if include_domains and exclude_domains:
         raise ValueError("Cannot specify both include_domains and exclude_domains")
     
-    # Initialize Exa client (API key should be configured in your .env file)
-    exa = Exa(api_key = f"{os.getenv('EXA_API_KEY')}")
-    
-    # Define the function to process a single query
-    async def process_query(query):
-        # Use run_in_executor to make the synchronous exa call in a non-blocking way
-        loop = asyncio.get_event_loop()
-        
-        # Define the function for the executor with all parameters
-        def exa_search_fn():
-            # Build parameters dictionary
-            kwargs = {
-                # Set text to True if max_characters is None, otherwise use an object with max_characters
-                "text": True if max_characters is None else {"max_characters": max_characters},
-                "summary": True,  # This is an amazing feature by EXA. It provides an AI generated summary of the content based on the query
-                "num_results": num_results
-            }
-            
-            # Add optional parameters only if they are provided
-            if subpages is not None:
-                kwargs["subpages"] = subpages
-                
-            if include_domains:
-                kwargs["include_domains"] = include_domains
-            elif exclude_domains:
-                kwargs["exclude_domains"] = exclude_domains
-                
-            return exa.search_and_contents(query, **kwargs)
-        
-        response = await loop.run_in_executor(None, exa_search_fn)
-        
-        # Format the response to match the expected output structure
-        formatted_results = []
-        seen_urls = set()  # Track URLs to avoid duplicates
-        
-        # Helper function to safely get value regardless of if item is dict or object
-        def get_value(item, key, default=None):
-            if isinstance(item, dict):
-                return item.get(key, default)
-            else:
-                return getattr(item, key, default) if hasattr(item, key) else default
-        
-        # Access the results from the SearchResponse object
-        results_list = get_value(response, 'results', [])
-        
-        # First process all main results
-        for result in results_list:
-            # Get the score with a default of 0.0 if it's None or not present
-            score = get_value(result, 'score', 0.0)
-            
-            # Combine summary and text for content if both are available
-            text_content = get_value(result, 'text', '')
-            summary_content = get_value(result, 'summary', '')
-            
-            content = text_content
-            if summary_content:
-                if content:
-                    content = f"{summary_content}\n\n{content}"
-                else:
-                    content = summary_content
-            
-            title = get_value(result, 'title', '')
-            url = get_value(result, 'url', '')
-            
-            # Skip if we've seen this URL before (removes duplicate entries)
-            if url in seen_urls:
-                continue
-                
-            seen_urls.add(url)
-            
-            # Main result entry
-            result_entry = {
-                "title": title,
-                "url": url,
-                "content": content,
-                "score": score,
-                "raw_content": text_content
-            }
-            
-            # Add the main result to the formatted results
-            formatted_results.append(result_entry)
-        
-        # Now process subpages only if the subpages parameter was provided
-        if subpages is not None:
-            for result in results_list:
-                subpages_list = get_value(result, 'subpages', [])
-                for subpage in subpages_list:
-                    # Get subpage score
-                    subpage_score = get_value(subpage, 'score', 0.0)
-                    
-                    # Combine summary and text for subpage content
-                    subpage_text = get_value(subpage, 'text', '')
-                    subpage_summary = get_value(subpage, 'summary', '')
-                    
-                    subpage_content = subpage_text
-                    if subpage_summary:
-                        if subpage_content:
-                            subpage_content = f"{subpage_summary}\n\n{subpage_content}"
-                        else:
-                            subpage_content = subpage_summary
-                    
-                    subpage_url = get_value(subpage, 'url', '')
-                    
-                    # Skip if we've seen this URL before
-                    if subpage_url in seen_urls:
-                        continue
-                        
-                    seen_urls.add(subpage_url)
-                    
-                    formatted_results.append({
-                        "title": get_value(subpage, 'title', ''),
-                        "url": subpage_url,
-                        "content": subpage_content,
-                        "score": subpage_score,
-                        "raw_content": subpage_text
-                    })
-        
-        # Collect images if available (only from main results to avoid duplication)
-        images = []
-        for result in results_list:
-            image = get_value(result, 'image')
-            if image and image not in images:  # Avoid duplicate images
-                images.append(image)
-                
-        return {
-            "query": query,
-            "follow_up_questions": None,
-            "answer": None,
-            "images": images,
-            "results": formatted_results
-        }
-    
-    # Process all queries sequentially with delay to respect rate limit
-    search_docs = []
-    for i, query in enumerate(search_queries):
+    # API key should be configured in your .env file
+    headers = {"x-api-key": os.getenv("EXA_API_KEY", ""), "content-type": "application/json"}
+
+    contents = {
+        # Set text to True if max_characters is None, otherwise use an object with max_characters
+        "text": True if max_characters is None else {"maxCharacters": max_characters},
+        "summary": True,  # This is an amazing feature by EXA. It provides an AI generated summary of the content based on the query
+    }
+    if subpages is not None:
+        contents["subpages"] = subpages
+    base_payload = {"numResults": num_results, "contents": contents}
+    if include_domains:
+        base_payload["includeDomains"] = include_domains
+    elif exclude_domains:
+        base_payload["excludeDomains"] = exclude_domains
+
+    # 4 requests per second, well within the 5/s limit
+    limiter = AsyncRateLimiter(4.0)
+
+    async def process_query(client: httpx.AsyncClient, query: str):
         try:
-            # Add delay between requests (0.25s = 4 requests per second, well within the 5/s limit)
-            if i > 0:  # Don't delay the first request
-                await asyncio.sleep(0.25)
-            
-            result = await process_query(query)
-            search_docs.append(result)
-        except Exception as e:
-            # Handle exceptions gracefully
+            for attempt in range(3):
+                await limiter.wait()
+                response = await client.post(EXA_SEARCH_URL, headers=headers, json={"query": query, **base_payload})
+                record_http_response(response)
+                if response.status_code == 429 and attempt < 2:
+                    print("Rate limit exceeded. Adding additional delay...")
+                    record_retry()
+                    await asyncio.sleep(1.0 * (attempt + 1))
+                    continue
+                response.raise_for_status()
+                break
+            return _format_exa_response(query, response.json(), subpages)
+        except httpx.HTTPError as e:
+            # Handle exceptions gracefully, keeping a placeholder result to maintain index alignment
             print(f"Error processing query '{query}': {str(e)}")
-            # Add a placeholder result for failed queries to maintain index alignment
-            search_docs.append({
-                "query": query,
-                "follow_up_questions": None,
-                "answer": None,
-                "images": [],
-                "results": [],
-                "error": str(e)
-            })
-            
-            # Add additional delay if we hit a rate limit error
-            if "429" in str(e):
-                print("Rate limit exceeded. Adding additional delay...")
-                await asyncio.sleep(1.0)  # Add a longer delay if we hit a rate limit
-    
-    return search_docs
+            return _empty_search_response(query, error=str(e))
+
+    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0)) as client:
+        return list(await asyncio.gather(*(process_query(client, query) for query in search_queries)))
+
+def _arxiv_pdf_url(metadata: dict) -> str:
+    """PDF link for an arXiv result, derived from the entry id when no link is listed."""
+    for link in metadata.get('links') or []:
+        if '/pdf/' in link:
+            return link
+    entry_id = metadata.get('entry_id') or metadata.get('Entry ID', '')
+    return entry_id.replace('/abs/', '/pdf/')
+
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+_ATOM_NS = {"atom": "http://www.w3.org/2005/Atom", "arxiv": "http://arxiv.org/schemas/atom"}
+_ARXIV_ID_QUERY_RE = re.compile(r"^(\d{4}\.\d{4,5}|[a-z\-]+(\.[a-z]{2})?/\d{7})(v\d+)?$", re.IGNORECASE)
+
+def _parse_arxiv_feed(feed: str) -> list[dict]:
+    """Metadata of every paper in an arXiv API Atom feed."""
+    root = ElementTree.fromstring(feed)
+    papers = []
+    for entry in root.findall("atom:entry", _ATOM_NS):
+        def text(path: str) -> str:
+            element = entry.find(path, _ATOM_NS)
+            return " ".join(element.text.split()) if element is not None and element.text else ""
+
+        entry_id = text("atom:id")
+        # Invalid queries come back as a single entry describing the error
+        if not entry_id or "/api/errors" in entry_id:
+            continue
+        primary_category = entry.find("arxiv:primary_category", _ATOM_NS)
+        papers.append({
+            "entry_id": entry_id,
+            "Title": text("atom:title"),
+            "Summary": text("atom:summary"),
+            "Authors": ", ".join(
+                " ".join(name.text.split()) for name in entry.findall("atom:author/atom:name", _ATOM_NS) if name.text
+            ),
+            "Published": text("atom:published")[:10],
+            "primary_category": primary_category.get("term") if primary_category is not None else "",
+            "categories": [category.get("term") for category in entry.findall("atom:category", _ATOM_NS)],
+            "comment": text("arxiv:comment"),
+            "journal_ref": text("arxiv:journal_ref"),
+            "doi": text("arxiv:doi"),
+            "links": [link.get("href") for link in entry.findall("atom:link", _ATOM_NS) if link.get("href")],
+        })
+    return papers
 
 @traceable
-async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents=True, load_all_available_meta=True):
+async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents=True, load_all_available_meta=True,
+                             max_pdf_pages=DEFAULT_MAX_PDF_PAGES, max_pdf_chars=DEFAULT_MAX_PDF_CHARS,
+                             pdf_deadline=DEFAULT_PDF_DEADLINE_SECONDS):
     """
-    Performs concurrent searches on arXiv using the ArxivRetriever.
+    Performs concurrent searches on arXiv through its Atom API.
+
+    API requests are spaced 3 seconds apart, as arXiv asks, but queries do not
+    wait for each other's PDF downloads. When full documents are requested,
+    the PDFs are streamed and parsed separately with page and character caps,
+    within pdf_deadline seconds per query.
 
     Args:
         search_queries (List[str]): List of search queries or article IDs
         load_max_docs (int, optional): Maximum number of documents to return per query. Default is 5.
         get_full_documents (bool, optional): Whether to fetch full text of documents. Default is True.
-        load_all_available_meta (bool, optional): Whether to load all available metadata. Default is True.
+        load_all_available_meta (bool, optional): Kept for compatibility; the API always returns all metadata.
+        max_pdf_pages (int, optional): Maximum number of PDF pages to read per paper.
+        max_pdf_chars (int, optional): Maximum number of characters to keep per paper.
+        pdf_deadline (float, optional): Seconds allowed for all PDF downloads of one query.
 
     Returns:
         List[dict]: List of search responses from arXiv, one per query. Each response has format:
@@ -609,82 +738,90 @@ async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents
                 ]
             }
     """
-    
-    async def process_single_query(query):
+    # arXiv rate limit: 1 request per 3 seconds
+    limiter = AsyncRateLimiter(1 / 3.0)
+
+    async def process_single_query(client: httpx.AsyncClient, query):
         try:
-            # Create retriever for each query
-            retriever = ArxivRetriever(
-                load_max_docs=load_max_docs,
-                get_full_documents=get_full_documents,
-                load_all_available_meta=load_all_available_meta
-            )
-            
-            # Run the synchronous retriever in a thread pool
-            loop = asyncio.get_event_loop()
-            docs = await loop.run_in_executor(None, lambda: retriever.invoke(query))
+            query = query.strip()
+            if _ARXIV_ID_QUERY_RE.match(query):
+                params = {"id_list": query, "max_results": load_max_docs}
+            else:
+                params = {"search_query": query, "max_results": load_max_docs}
+
+            for attempt in range(3):
+                await limiter.wait()
+                response = await client.get(ARXIV_API_URL, params=params)
+                record_http_response(response)
+                if response.status_code in (429, 503) and attempt < 2:
+                    print("ArXiv rate limit exceeded. Adding additional delay...")
+                    record_retry()
+                    await asyncio.sleep(5.0)  # Add a longer delay if we hit a rate limit
+                    continue
+                response.raise_for_status()
+                break
+            papers = _parse_arxiv_feed(response.text)
+
+            pdf_texts = {}
+            if get_full_documents:
+                pdf_texts = await fetch_pdf_texts(
+                    [_arxiv_pdf_url(metadata) for metadata in papers],
+                    deadline=pdf_deadline,
+                    max_pages=max_pdf_pages,
+                    max_chars=max_pdf_chars,
+                )
             
             results = []
             # Assign decreasing scores based on the order
             base_score = 1.0
-            score_decrement = 1.0 / (len(docs) + 1) if docs else 0
+            score_decrement = 1.0 / (len(papers) + 1) if papers else 0
             
-            for i, doc in enumerate(docs):
-                # Extract metadata
-                metadata = doc.metadata
-                
-                # Use entry_id as the URL (this is the actual arxiv link)
-                url = metadata.get('entry_id', '')
-                
+            for i, metadata in enumerate(papers):
                 # Format content with all useful metadata
                 content_parts = []
 
                 # Primary information
-                if 'Summary' in metadata:
+                if metadata['Summary']:
                     content_parts.append(f"Summary: {metadata['Summary']}")
 
-                if 'Authors' in metadata:
+                if metadata['Authors']:
                     content_parts.append(f"Authors: {metadata['Authors']}")
 
                 # Add publication information
-                published = metadata.get('Published')
-                published_str = published.isoformat() if hasattr(published, 'isoformat') else str(published) if published else ''
-                if published_str:
-                    content_parts.append(f"Published: {published_str}")
+                if metadata['Published']:
+                    content_parts.append(f"Published: {metadata['Published']}")
 
                 # Add additional metadata if available
-                if 'primary_category' in metadata:
+                if metadata['primary_category']:
                     content_parts.append(f"Primary Category: {metadata['primary_category']}")
 
-                if 'categories' in metadata and metadata['categories']:
+                if metadata['categories']:
                     content_parts.append(f"Categories: {', '.join(metadata['categories'])}")
 
-                if 'comment' in metadata and metadata['comment']:
+                if metadata['comment']:
                     content_parts.append(f"Comment: {metadata['comment']}")
 
-                if 'journal_ref' in metadata and metadata['journal_ref']:
+                if metadata['journal_ref']:
                     content_parts.append(f"Journal Reference: {metadata['journal_ref']}")
 
-                if 'doi' in metadata and metadata['doi']:
+                if metadata['doi']:
                     content_parts.append(f"DOI: {metadata['doi']}")
 
                 # Get PDF link if available in the links
-                pdf_link = ""
-                if 'links' in metadata and metadata['links']:
-                    for link in metadata['links']:
-                        if 'pdf' in link:
-                            pdf_link = link
-                            content_parts.append(f"PDF: {pdf_link}")
-                            break
+                for link in metadata['links']:
+                    if '/pdf/' in link:
+                        content_parts.append(f"PDF: {link}")
+                        break
 
                 # Join all content parts with newlines 
                 content = "\n".join(content_parts)
                 
                 result = {
-                    'title': metadata.get('Title', ''),
-                    'url': url,  # Using entry_id as the URL
+                    'title': metadata['Title'],
+                    'url': metadata['entry_id'],  # Using entry_id as the URL
                     'content': content,
                     'score': base_score - (i * score_decrement),
-                    'raw_content': doc.page_content if get_full_documents else None
+                    'raw_content': pdf_texts.get(_arxiv_pdf_url(metadata)) if get_full_documents else None
                 }
                 results.append(result)
                 
@@ -695,51 +832,51 @@ async def arxiv_search_async(search_queries, load_max_docs=5, get_full_documents
                 'images': [],
                 'results': results
             }
-        except Exception as e:
-            # Handle exceptions gracefully
-            print(f"Error processing arXiv query '{query}': {str(e)}")
-            return {
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(e)
-            }
-    
-    # Process queries sequentially with delay to respect arXiv rate limit (1 request per 3 seconds)
-    search_docs = []
-    for i, query in enumerate(search_queries):
-        try:
-            # Add delay between requests (3 seconds per ArXiv's rate limit)
-            if i > 0:  # Don't delay the first request
-                await asyncio.sleep(3.0)
-            
-            result = await process_single_query(query)
-            search_docs.append(result)
-        except Exception as e:
+        except (httpx.HTTPError, ElementTree.ParseError) as e:
             # Handle exceptions gracefully
             print(f"Error processing arXiv query '{query}': {str(e)}")
-            search_docs.append({
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(e)
-            })
-            
-            # Add additional delay if we hit a rate limit error
-            if "429" in str(e) or "Too Many Requests" in str(e):
-                print("ArXiv rate limit exceeded. Adding additional delay...")
-                await asyncio.sleep(5.0)  # Add a longer delay if we hit a rate limit
+            return _empty_search_response(query, error=str(e))
     
-    return search_docs
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0), follow_redirects=True) as client:
+        return list(await asyncio.gather(*(process_single_query(client, query) for query in search_queries)))
+
+PUBMED_ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+PUBMED_EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+
+def _parse_pubmed_articles(xml_text: str, doc_content_chars_max: int) -> list[dict]:
+    """Title, date, copyright and abstract of every article in an efetch XML response."""
+    root = ElementTree.fromstring(xml_text)
+    docs = []
+    for article in root.iter("PubmedArticle"):
+        title = article.find(".//ArticleTitle")
+        abstract_parts = []
+        for abstract_text in article.findall(".//Abstract/AbstractText"):
+            text = "".join(abstract_text.itertext()).strip()
+            label = abstract_text.get("Label")
+            if text:
+                abstract_parts.append(f"{label}: {text}" if label else text)
+        pub_date = article.find(".//PubDate")
+        published = ""
+        if pub_date is not None:
+            published = pub_date.findtext("MedlineDate") or "-".join(
+                part for part in (pub_date.findtext("Year"), pub_date.findtext("Month"), pub_date.findtext("Day")) if part
+            )
+        docs.append({
+            "uid": article.findtext(".//PMID", ""),
+            "Title": "".join(title.itertext()).strip() if title is not None else "",
+            "Published": published,
+            "Copyright Information": article.findtext(".//Abstract/CopyrightInformation", ""),
+            "Summary": "\n".join(abstract_parts)[:doc_content_chars_max],
+        })
+    return docs
 
 @traceable
 async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_key=None, doc_content_chars_max=4000):
     """
-    Performs concurrent searches on PubMed using the PubMedAPIWrapper.
+    Performs concurrent searches on PubMed through the NCBI E-utilities.
+
+    Requests are spaced to stay within the NCBI limit of 3 requests per second
+    (10 with an API key) and retried with backoff when rate limited.
 
     Args:
         search_queries (List[str]): List of search queries
@@ -767,24 +904,36 @@ async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_k
                 ]
             }
     """
-    
-    async def process_single_query(query):
+    limiter = AsyncRateLimiter(10.0 if api_key else 3.0)
+    common_params = {"db": "pubmed", "tool": "open_deep_research"}
+    if email:
+        common_params["email"] = email
+    if api_key:
+        common_params["api_key"] = api_key
+
+    async def get(client: httpx.AsyncClient, url: str, params: dict) -> httpx.Response:
+        delay = 1.0
+        for attempt in range(4):
+            await limiter.wait()
+            response = await client.get(url, params={**common_params, **params})
+            record_http_response(response)
+            if response.status_code == 429 and attempt < 3:
+                record_retry()
+                # Back off further each time we hit the rate limit
+                await asyncio.sleep(delay)
+                delay = min(5.0, delay * 1.5)
+                continue
+            response.raise_for_status()
+            return response
+
+    async def process_single_query(client: httpx.AsyncClient, query):
         try:
-            # print(f"Processing PubMed query: '{query}'")
-            
-            # Create PubMed wrapper for the query
-            wrapper = PubMedAPIWrapper(
-                top_k_results=top_k_results,
-                doc_content_chars_max=doc_content_chars_max,
-                email=email if email else "your_email@example.com",
-                api_key=api_key if api_key else ""
-            )
-            
-            # Run the synchronous wrapper in a thread pool
-            loop = asyncio.get_event_loop()
-            
-            # Use wrapper.lazy_load instead of load to get better visibility
-            docs = await loop.run_in_executor(None, lambda: list(wrapper.lazy_load(query)))
+            search = await get(client, PUBMED_ESEARCH_URL, {"term": query, "retmax": top_k_results, "retmode": "json"})
+            ids = search.json().get("esearchresult", {}).get("idlist", [])
+            docs = []
+            if ids:
+                articles = await get(client, PUBMED_EFETCH_URL, {"id": ",".join(ids), "retmode": "xml"})
+                docs = _parse_pubmed_articles(articles.text, doc_content_chars_max)
             
             print(f"Query '{query}' returned {len(docs)} results")
             
@@ -829,60 +978,12 @@ async def pubmed_search_async(search_queries, top_k_results=5, email=None, api_k
                 'images': [],
                 'results': results
             }
-        except Exception as e:
-            # Handle exceptions with more detailed information
-            error_msg = f"Error processing PubMed query '{query}': {str(e)}"
-            print(error_msg)
-            import traceback
-            print(traceback.format_exc())  # Print full traceback for debugging
-            
-            return {
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(e)
-            }
-    
-    # Process all queries with a reasonable delay between them
-    search_docs = []
+        except (httpx.HTTPError, ValueError, ElementTree.ParseError) as e:
+            print(f"Error processing PubMed query '{query}': {str(e)}")
+            return _empty_search_response(query, error=str(e))
     
-    # Start with a small delay that increases if we encounter rate limiting
-    delay = 1.0  # Start with a more conservative delay
-    
-    for i, query in enumerate(search_queries):
-        try:
-            # Add delay between requests
-            if i > 0:  # Don't delay the first request
-                # print(f"Waiting {delay} seconds before next query...")
-                await asyncio.sleep(delay)
-            
-            result = await process_single_query(query)
-            search_docs.append(result)
-            
-            # If query was successful with results, we can slightly reduce delay (but not below minimum)
-            if result.get('results') and len(result['results']) > 0:
-                delay = max(0.5, delay * 0.9)  # Don't go below 0.5 seconds
-            
-        except Exception as e:
-            # Handle exceptions gracefully
-            error_msg = f"Error in main loop processing PubMed query '{query}': {str(e)}"
-            print(error_msg)
-            
-            search_docs.append({
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(e)
-            })
-            
-            # If we hit an exception, increase delay for next query
-            delay = min(5.0, delay * 1.5)  # Don't exceed 5 seconds
-    
-    return search_docs
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0)) as client:
+        return list(await asyncio.gather(*(process_single_query(client, query) for query in search_queries)))
 
 @traceable
 async def linkup_search(search_queries, depth: Optional[str] = "standard"):
@@ -964,9 +1065,6 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
         openssl_version = f"OpenSSL/{random.randint(1, 3)}.{random.randint(0, 4)}.{random.randint(0, 9)}"
         return f"{lynx_version} {libwww_version} {ssl_mm_version} {openssl_version}"
     
-    # Create executor for running synchronous operations
-    executor = None if use_api else concurrent.futures.ThreadPoolExecutor(max_workers=5)
-    
     # Use a semaphore to limit concurrent requests
     semaphore = asyncio.Semaphore(5 if use_api else 2)
     
@@ -994,6 +1092,7 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
 
                         async with aiohttp.ClientSession() as session:
                             async with session.get('https://www.googleapis.com/customsearch/v1', params=params) as response:
+                                record_search(http_requests=1, rate_limited=int(response.status == 429))
                                 if response.status != 200:
                                     error_text = await response.text()
                                     print(f"API error: {response.status}, {error_text}")
@@ -1025,20 +1124,23 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                     await asyncio.sleep(0.5 + random.random() * 1.5)
                     print(f"Scraping Google for '{query}'...")
 
-                    # Define scraping function
-                    def google_search(query, max_results):
-                        try:
-                            lang = "en"
-                            safe = "active"
-                            start = 0
-                            fetched_results = 0
-                            fetched_links = set()
-                            search_results = []
-                            
-                            while fetched_results < max_results:
+                    lang = "en"
+                    safe = "active"
+                    start = 0
+                    fetched_links = set()
+
+                    try:
+                        async with httpx.AsyncClient(
+                            timeout=httpx.Timeout(15.0, connect=10.0),
+                            cookies={
+                                'CONSENT': 'PENDING+987',  # Bypasses the consent page
+                                'SOCS': 'CAESHAgBEhIaAB',
+                            },
+                        ) as client:
+                            while len(results) < max_results:
                                 # Send request to Google
-                                resp = requests.get(
-                                    url="https://www.google.com/search",
+                                resp = await client.get(
+                                    "https://www.google.com/search",
                                     headers={
                                         "User-Agent": get_useragent(),
                                         "Accept": "*/*"
@@ -1050,10 +1152,6 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                                         "start": start,
                                         "safe": safe,
                                     },
-                                    cookies = {
-                                        'CONSENT': 'PENDING+987',  # Bypasses the consent page
-                                        'SOCS': 'CAESHAgBEhIaAB',
-                                    }
                                 )
                                 resp.raise_for_status()
                                 
@@ -1074,45 +1172,27 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                                             continue
                                         
                                         fetched_links.add(link)
-                                        title = title_tag.text
-                                        description = description_tag.text
                                         
                                         # Store result in the same format as the API results
-                                        search_results.append({
-                                            "title": title,
+                                        results.append({
+                                            "title": title_tag.text,
                                             "url": link,
-                                            "content": description,
+                                            "content": description_tag.text,
                                             "score": None,
-                                            "raw_content": description
+                                            "raw_content": description_tag.text
                                         })
-                                        
-                                        fetched_results += 1
                                         new_results += 1
                                         
-                                        if fetched_results >= max_results:
+                                        if len(results) >= max_results:
                                             break
                                 
                                 if new_results == 0:
                                     break
                                     
                                 start += 10
-                                time.sleep(1)  # Delay between pages
-                            
-                            return search_results
-                                
-                        except Exception as e:
-                            print(f"Error in Google search for '{query}': {str(e)}")
-                            return []
-                    
-                    # Execute search in thread pool
-                    loop = asyncio.get_running_loop()
-                    search_results = await loop.run_in_executor(
-                        executor, 
-                        lambda: google_search(query, max_results)
-                    )
-                    
-                    # Process the results
-                    results = search_results
+                                await asyncio.sleep(1)  # Delay between pages
+                    except httpx.HTTPError as e:
+                        print(f"Error in Google search for '{query}': {str(e)}")
                 
                 # If requested, fetch full page content asynchronously (for both API and web scraping)
                 if include_raw_content and results:
@@ -1122,6 +1202,9 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                         fetch_tasks = []
                         
                         async def fetch_full_content(result):
+                            # Pages the caller already holds are not downloaded again
+                            if canonicalize_url(result['url']) in _skip_fetch_urls.get():
+                                return result
                             async with content_semaphore:
                                 url = result['url']
                                 headers = {
@@ -1136,19 +1219,20 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                                             # Check content type to handle binary files
                                             content_type = response.headers.get('Content-Type', '').lower()
                                             
-                                            # Handle PDFs and other binary files
-                                            if 'application/pdf' in content_type or 'application/octet-stream' in content_type:
-                                                # For PDFs, indicate that content is binary and not parsed
+                                            # Stream PDFs to the page-by-page extractor
+                                            if 'application/pdf' in content_type or ('application/octet-stream' in content_type and url.lower().endswith('.pdf')):
+                                                body = await read_capped(response.content.iter_chunked(65536), DEFAULT_MAX_PDF_BYTES)
+                                                record_search(http_requests=1, bytes_downloaded=len(body))
+                                                result['raw_content'] = await pdf_bytes_to_text(body)
+                                            elif 'application/octet-stream' in content_type:
+                                                # Other binary files are not parsed
                                                 result['raw_content'] = f"[Binary content: {content_type}. Content extraction not supported for this file type.]"
                                             else:
-                                                try:
-                                                    # Try to decode as UTF-8 with replacements for non-UTF8 characters
-                                                    html = await response.text(errors='replace')
-                                                    soup = BeautifulSoup(html, 'html.parser')
-                                                    result['raw_content'] = soup.get_text()
-                                                except UnicodeDecodeError as ude:
-                                                    # Fallback if we still have decoding issues
-                                                    result['raw_content'] = f"[Could not decode content: {str(ude)}]"
+                                                # Read at most DEFAULT_MAX_HTML_BYTES and parse off the event loop
+                                                body = await read_capped(response.content.iter_chunked(65536), DEFAULT_MAX_HTML_BYTES)
+                                                record_search(http_requests=1, bytes_downloaded=len(body))
+                                                extracted = await extract_main_content_async(body, encoding=response.charset)
+                                                result['raw_content'] = extracted.text
                                 except Exception as e:
                                     print(f"Warning: Failed to fetch content for {url}: {str(e)}")
                                     result['raw_content'] = f"[Error fetching content: {str(e)}]"
@@ -1178,18 +1262,9 @@ async def google_search_async(search_queries: Union[str, List[str]], max_results
                     "results": []
                 }
     
-    try:
-        # Create tasks for all search queries
-        search_tasks = [search_single_query(query) for query in search_queries]
-        
-        # Execute all searches concurrently
-        search_results = await asyncio.gather(*search_tasks)
-        
-        return search_results
-    finally:
-        # Only shut down executor if it was created
-        if executor:
-            executor.shutdown(wait=False)
+    # Execute all searches concurrently
+    search_tasks = [search_single_query(query) for query in search_queries]
+    return list(await asyncio.gather(*search_tasks))
 
 async def scrape_pages(titles: List[str], urls: List[str]) -> str:
     """
@@ -1217,23 +1292,21 @@ async def scrape_pages(titles: List[str], urls: List[str]) -> str:
         # Fetch each URL and convert to markdown
         for url in urls:
             try:
-                # Fetch the content
-                response = await client.get(url)
-                response.raise_for_status()
-                
-                # Convert HTML to markdown if successful
-                if response.status_code == 200:
+                # Stream the content so oversized pages are cut at the byte limit
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    
                     # Handle different content types
                     content_type = response.headers.get('Content-Type', '')
                     if 'text/html' in content_type:
-                        # Convert HTML to markdown
-                        markdown_content = markdownify(response.text)
-                        pages.append(markdown_content)
+                        # Strip boilerplate and convert the main content to markdown in the process pool
+                        body = await read_capped(response.aiter_bytes(), DEFAULT_MAX_HTML_BYTES)
+                        record_search(http_requests=1, bytes_downloaded=len(body))
+                        extracted = await extract_main_content_async(body, output_format="markdown", encoding=response.charset_encoding)
+                        pages.append(extracted.text)
                     else:
                         # For non-HTML content, just mention the content type
                         pages.append(f"Content type: {content_type} (not converted to markdown)")
-                else:
-                    pages.append(f"Error: Received status code {response.status_code}")
         
             except Exception as e:
                 # Handle any exceptions during fetch
@@ -1250,94 +1323,85 @@ async def scrape_pages(titles: List[str], urls: List[str]) -> str:
         
     return formatted_output
 
-@tool
-async def duckduckgo_search(search_queries: List[str]):
+async def duckduckgo_search_async(search_queries: List[str]):
     """Perform searches using DuckDuckGo with retry logic to handle rate limits
     
     Args:
         search_queries (List[str]): List of search queries to process
         
     Returns:
-        str: A formatted string of search results
+        List[dict]: List of search responses from DuckDuckGo, one per query
     """
     
+    # Bounds each blocking request, so a cancelled search never leaves a thread hanging for long
+    request_timeout = 10
+
+    def perform_search(query):
+        with DDGS(timeout=request_timeout) as ddgs:
+            return list(ddgs.text(query, max_results=5))
+
     async def process_single_query(query):
-        # Execute synchronous search in the event loop's thread pool
-        loop = asyncio.get_event_loop()
+        max_retries = 3
+        retry_count = 0
+        backoff_factor = 2.0
+        last_exception = None
         
-        def perform_search():
-            max_retries = 3
-            retry_count = 0
-            backoff_factor = 2.0
-            last_exception = None
-            
-            while retry_count <= max_retries:
-                try:
-                    results = []
-                    with DDGS() as ddgs:
-                        # Change query slightly and add delay between retries
-                        if retry_count > 0:
-                            # Random delay with exponential backoff
-                            delay = backoff_factor ** retry_count + random.random()
-                            print(f"Retry {retry_count}/{max_retries} for query '{query}' after {delay:.2f}s delay")
-                            time.sleep(delay)
-                            
-                            # Add a random element to the query to bypass caching/rate limits
-                            modifiers = ['about', 'info', 'guide', 'overview', 'details', 'explained']
-                            modified_query = f"{query} {random.choice(modifiers)}"
-                        else:
-                            modified_query = query
-                        
-                        # Execute search
-                        ddg_results = list(ddgs.text(modified_query, max_results=5))
-                        
-                        # Format results
-                        for i, result in enumerate(ddg_results):
-                            results.append({
-                                'title': result.get('title', ''),
-                                'url': result.get('href', ''),
-                                'content': result.get('body', ''),
-                                'score': 1.0 - (i * 0.1),  # Simple scoring mechanism
-                                'raw_content': result.get('body', '')
-                            })
-                        
-                        # Return successful results
-                        return {
-                            'query': query,
-                            'follow_up_questions': None,
-                            'answer': None,
-                            'images': [],
-                            'results': results
-                        }
-                except Exception as e:
-                    # Store the exception and retry
-                    last_exception = e
-                    retry_count += 1
-                    print(f"DuckDuckGo search error: {str(e)}. Retrying {retry_count}/{max_retries}")
+        while retry_count <= max_retries:
+            try:
+                # Change query slightly and add delay between retries
+                if retry_count > 0:
+                    # Random delay with exponential backoff
+                    delay = backoff_factor ** retry_count + random.random()
+                    print(f"Retry {retry_count}/{max_retries} for query '{query}' after {delay:.2f}s delay")
+                    record_retry(rate_limited="Ratelimit" in str(last_exception))
+                    await asyncio.sleep(delay)
                     
-                    # If not a rate limit error, don't retry
-                    if "Ratelimit" not in str(e) and retry_count >= 1:
-                        print(f"Non-rate limit error, stopping retries: {str(e)}")
-                        break
-            
-            # If we reach here, all retries failed
-            print(f"All retries failed for query '{query}': {str(last_exception)}")
-            # Return empty results but with query info preserved
-            return {
-                'query': query,
-                'follow_up_questions': None,
-                'answer': None,
-                'images': [],
-                'results': [],
-                'error': str(last_exception)
-            }
-            
-        return await loop.run_in_executor(None, perform_search)
+                    # Add a random element to the query to bypass caching/rate limits
+                    modifiers = ['about', 'info', 'guide', 'overview', 'details', 'explained']
+                    modified_query = f"{query} {random.choice(modifiers)}"
+                else:
+                    modified_query = query
+                
+                # DDGS is synchronous, so only the request itself runs in a thread
+                ddg_results = await asyncio.to_thread(perform_search, modified_query)
+                
+                # Format results
+                results = []
+                for i, result in enumerate(ddg_results):
+                    results.append({
+                        'title': result.get('title', ''),
+                        'url': result.get('href', ''),
+                        'content': result.get('body', ''),
+                        'score': 1.0 - (i * 0.1),  # Simple scoring mechanism
+                        'raw_content': result.get('body', '')
+                    })
+                
+                # Return successful results
+                return {
+                    'query': query,
+                    'follow_up_questions': None,
+                    'answer': None,
+                    'images': [],
+                    'results': results
+                }
+            except Exception as e:
+                # Store the exception and retry
+                last_exception = e
+                retry_count += 1
+                print(f"DuckDuckGo search error: {str(e)}. Retrying {retry_count}/{max_retries}")
+                
+                # If not a rate limit error, don't retry
+                if "Ratelimit" not in str(e) and retry_count >= 1:
+                    print(f"Non-rate limit error, stopping retries: {str(e)}")
+                    break
+        
+        # If we reach here, all retries failed
+        print(f"All retries failed for query '{query}': {str(last_exception)}")
+        # Return empty results but with query info preserved
+        return _empty_search_response(query, error=str(last_exception))
 
     # Process queries with delay between them to reduce rate limiting
     search_docs = []
-    urls = []
-    titles = []
     for i, query in enumerate(search_queries):
         # Add delay between queries (except first one)
         if i > 0:
@@ -1345,10 +1409,26 @@ async def duckduckgo_search(search_queries: List[str]):
             await asyncio.sleep(delay)
         
         # Process the query
-        result = await process_single_query(query)
-        search_docs.append(result)
+        search_docs.append(await process_single_query(query))
+    
+    return search_docs
+
+@tool
+async def duckduckgo_search(search_queries: List[str]):
+    """Perform searches using DuckDuckGo with retry logic to handle rate limits
+    
+    Args:
+        search_queries (List[str]): List of search queries to process
         
-        # Safely extract URLs and titles from results, handling empty result cases
+    Returns:
+        str: A formatted string of search results
+    """
+    search_docs = await query_coalescer.search(search_scope("duckduckgo"), search_queries, duckduckgo_search_async)
+
+    # Safely extract URLs and titles from results, handling empty result cases
+    urls = []
+    titles = []
+    for result in search_docs:
         if result['results'] and len(result['results']) > 0:
             for res in result['results']:
                 if 'url' in res and 'title' in res:
@@ -1361,6 +1441,37 @@ async def duckduckgo_search(search_queries: List[str]):
     else:
         return "No valid search results found. Please try different search queries or use a different search API."
 
+# Per-source cap on full content returned by the search tools (about 30k characters)
+MAX_TOKENS_PER_TOOL_SOURCE = 7_500
+
+def format_tool_sources(unique_results: dict, counter: TokenCounter, total_token_budget: Optional[int] = None) -> str:
+    """Format deduplicated tool results, fitting full contents into the token budget.
+
+    Args:
+        unique_results: Results keyed by URL, each with title, content and optional raw_content
+        counter: Tokenizer of the model that will read the results
+        total_token_budget: Total tokens for all full contents; None applies only the per-source cap
+
+    Returns:
+        str: Formatted sources
+    """
+    results = list(unique_results.values())
+    raw_contents = [result.get('raw_content') or '' for result in results]
+    limits = [min(counter.count(raw_content), MAX_TOKENS_PER_TOOL_SOURCE) for raw_content in raw_contents]
+    if total_token_budget is not None:
+        fixed_tokens = sum(counter.count(result['title']) + counter.count(result['content']) + 30 for result in results)
+        limits = allocate_token_budget(limits, max(total_token_budget - fixed_tokens, 0), source_weights(results))
+
+    parts = []
+    for i, (url, result, raw_content, limit) in enumerate(zip(unique_results.keys(), results, raw_contents, limits)):
+        parts.append(f"\n\n--- SOURCE {i+1}: {result['title']} ---\n")
+        parts.append(f"URL: {url}\n\n")
+        parts.append(f"SUMMARY:\n{result['content']}\n\n")
+        if raw_content and limit > 0:
+            parts.append(f"FULL CONTENT:\n{counter.truncate(raw_content, limit)}")
+        parts.append("\n\n" + "-" * 80 + "\n")
+    return "".join(parts)
+
 TAVILY_SEARCH_DESCRIPTION = (
     "A search engine optimized for comprehensive, accurate, and trusted results. "
     "Useful for when you need to answer questions about current events."
@@ -1385,11 +1496,10 @@ async def tavily_search(
         str: A formatted string of search results
     """
     # Use tavily_search_async with include_raw_content=True to get content directly
-    search_results = await tavily_search_async(
+    search_results = await query_coalescer.search(
+        search_scope("tavily", {"max_results": max_results, "topic": topic}),
         queries,
-        max_results=max_results,
-        topic=topic,
-        include_raw_content=True
+        lambda batch: tavily_search_async(batch, max_results=max_results, topic=topic, include_raw_content=True),
     )
 
     # Format the search results directly using the raw_content already provided
@@ -1403,11 +1513,8 @@ async def tavily_search(
             if url not in unique_results:
                 unique_results[url] = {**result, "query": response['query']}
 
-    async def noop():
-        return None
-
     configurable = Configuration.from_runnable_config(config)
-    max_char_to_include = 30_000
+    counter = get_search_token_counter(configurable)
     # TODO: share this behavior across all search implementations / tools
     if configurable.process_search_results == "summarize":
         if configurable.summarization_model_provider == "anthropic":
@@ -1415,27 +1522,35 @@ async def tavily_search(
         else:
             extra_kwargs = {}
 
-        summarization_model = init_chat_model(
+        summarization_model = get_chat_model(
             model=configurable.summarization_model,
             model_provider=configurable.summarization_model_provider,
             max_retries=configurable.max_structured_output_retries,
+            max_concurrency=configurable.model_max_concurrency,
             **extra_kwargs
         )
-        summarization_tasks = [
-            noop() if not result.get("raw_content") else summarize_webpage(summarization_model, result['raw_content'][:max_char_to_include])
-            for result in unique_results.values()
-        ]
-        summaries = await asyncio.gather(*summarization_tasks)
+        # Only pages with full content are summarized; the others keep their search snippet
+        urls_to_summarize = [url for url, result in unique_results.items() if result.get("raw_content")]
+        page_summaries = await summarize_webpages(
+            summarization_model,
+            f"{configurable.summarization_model_provider}:{configurable.summarization_model}",
+            [counter.truncate(unique_results[url]['raw_content'], MAX_TOKENS_PER_TOOL_SOURCE, marker="") for url in urls_to_summarize],
+            max_concurrency=configurable.summarization_max_concurrency,
+            min_chars=configurable.summarization_min_chars,
+            batch_size=configurable.summarization_batch_size,
+        )
+        summaries_by_url = dict(zip(urls_to_summarize, page_summaries))
+        summaries = [summaries_by_url.get(url) for url in unique_results]
         unique_results = {
             url: {'title': result['title'], 'content': result['content'] if summary is None else summary}
             for url, result, summary in zip(unique_results.keys(), unique_results.values(), summaries)
         }
     elif configurable.process_search_results == "split_and_rerank":
-        embeddings = init_embeddings("openai:text-embedding-3-small")
+        embeddings = get_embeddings(configurable.embedding_model)
         results_by_query = itertools.groupby(unique_results.values(), key=lambda x: x['query'])
         all_retrieved_docs = []
         for query, query_results in results_by_query:
-            retrieved_docs = split_and_rerank_search_results(embeddings, query, query_results)
+            retrieved_docs = await asplit_and_rerank_search_results(embeddings, query, list(query_results))
             all_retrieved_docs.extend(retrieved_docs)
 
         stitched_docs = stitch_documents_by_url(all_retrieved_docs)
@@ -1445,13 +1560,7 @@ async def tavily_search(
         }
 
     # Format the unique results
-    for i, (url, result) in enumerate(unique_results.items()):
-        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
-        if result.get('raw_content'):
-            formatted_output += f"FULL CONTENT:\n{result['raw_content'][:max_char_to_include]}"  # Limit content size
-        formatted_output += "\n\n" + "-" * 80 + "\n"
+    formatted_output += format_tool_sources(unique_results, counter, configurable.search_token_budget)
     
     if unique_results:
         return formatted_output
@@ -1460,7 +1569,7 @@ async def tavily_search(
 
 
 @tool
-async def azureaisearch_search(queries: List[str], max_results: int = 5, topic: str = "general") -> str:
+async def azureaisearch_search(queries: List[str], max_results: int = 5, topic: str = "general", config: RunnableConfig = None) -> str:
     """
     Fetches results from Azure AI Search API.
     
@@ -1490,13 +1599,9 @@ async def azureaisearch_search(queries: List[str], max_results: int = 5, topic:
                 unique_results[url] = result
     
     # Format the unique results
-    for i, (url, result) in enumerate(unique_results.items()):
-        formatted_output += f"\n\n--- SOURCE {i+1}: {result['title']} ---\n"
-        formatted_output += f"URL: {url}\n\n"
-        formatted_output += f"SUMMARY:\n{result['content']}\n\n"
-        if result.get('raw_content'):
-            formatted_output += f"FULL CONTENT:\n{result['raw_content'][:30000]}"  # Limit content size
-        formatted_output += "\n\n" + "-" * 80 + "\n"
+    configurable = Configuration.from_runnable_config(config)
+    counter = get_search_token_counter(configurable)
+    formatted_output += format_tool_sources(unique_results, counter, configurable.search_token_budget)
     
     if unique_results:
         return formatted_output
@@ -1504,13 +1609,23 @@ async def azureaisearch_search(queries: List[str], max_results: int = 5, topic:
         return "No valid search results found. Please try different search queries or use a different search API."
 
 
-async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict) -> str:
+async def select_and_execute_search(search_api: str, query_list: list[str], params_to_pass: dict,
+                                    token_budget: Optional[int] = None,
+                                    token_counter: Optional[TokenCounter] = None,
+                                    deadline: Optional[float] = None,
+                                    similarity_threshold: Optional[float] = None,
+                                    embeddings: Optional[Embeddings] = None) -> str:
     """Select and execute the appropriate search API.
     
     Args:
         search_api: Name of the search API to use
         query_list: List of search queries to execute
         params_to_pass: Parameters to pass to the search API
+        token_budget: Total tokens the formatted results may use (None: per-source limit only)
+        token_counter: Tokenizer of the model that will read the results
+        deadline: Seconds the search may take before it is cancelled (None: no limit)
+        similarity_threshold: Merge queries this similar to an in-flight query into it (not for tavily/duckduckgo)
+        embeddings: Embedding model for similarity_threshold
         
     Returns:
         Formatted string containing search results
@@ -1518,31 +1633,237 @@ async def select_and_execute_search(search_api: str, query_list: list[str], para
     Raises:
         ValueError: If an unsupported search API is specified
     """
+    if search_api in ("tavily", "duckduckgo"):
+        if search_api == "tavily":
+            # Tavily search tool used with both workflow and agent 
+            # and returns a formatted source string
+            search = tavily_search.ainvoke({'queries': query_list, **params_to_pass})
+        else:
+            # DuckDuckGo search tool used with both workflow and agent 
+            search = duckduckgo_search.ainvoke({'search_queries': query_list})
+        try:
+            formatted = await asyncio.wait_for(track_search(search_api, search, len(query_list)), deadline)
+        except asyncio.TimeoutError:
+            print(f"{search_api} search exceeded its deadline of {deadline}s")
+            return "No valid search results found. Please try different search queries or use a different search API."
+    else:
+        search_results = await execute_search(search_api, query_list, params_to_pass, deadline=deadline,
+                                              similarity_threshold=similarity_threshold, embeddings=embeddings)
+        formatted = deduplicate_and_format_sources(search_results, max_tokens_per_source=4000, deduplication_strategy="keep_first",
+                                                   total_token_budget=token_budget, token_counter=token_counter)
+    record_search(search_api, formatted_tokens=(token_counter or get_token_counter()).count(formatted))
+    return formatted
+
+
+# Fields of a search result kept in a section's source memory
+_SOURCE_FIELDS = ("title", "url", "content", "score", "raw_content")
+
+
+async def search_new_sources(search_api: str, query_list: list[str], params_to_pass: dict,
+                             visited_sources: Optional[Dict[str, str]] = None,
+                             token_budget: Optional[int] = None,
+                             token_counter: Optional[TokenCounter] = None,
+                             deadline: Optional[float] = None,
+                             similarity_threshold: Optional[float] = None,
+                             embeddings: Optional[Embeddings] = None) -> tuple[str, Dict[str, str]]:
+    """Search for a section again, keeping the sources of its earlier iterations.
+
+    Results whose canonical URL was found by an earlier iteration are dropped
+    (and their pages are not downloaded again where the backend fetches them
+    itself); the new sources are merged with the earlier ones and the writer
+    gets one deduplicated context of all of them. Sources are kept in the
+    content store; the source memory only holds their references.
+
+    The tavily and duckduckgo tools return formatted text, so their results
+    cannot be tracked and each iteration gets only its own results.
+
+    Args:
+        search_api: Name of the search API to use
+        query_list: List of search queries to execute
+        params_to_pass: Parameters to pass to the search API
+        visited_sources: Content store references of the sources of earlier iterations, keyed by canonical URL
+        token_budget: Total tokens the formatted sources may use (None: per-source limit only)
+        token_counter: Tokenizer of the model that will read the sources
+        deadline: Seconds the search may take before it is cancelled (None: no limit)
+        similarity_threshold: Merge queries this similar to an in-flight query into it
+        embeddings: Embedding model for similarity_threshold
+
+    Returns:
+        tuple[str, Dict[str, str]]: Formatted sources of all iterations and the updated source memory
+    """
+    visited_sources = visited_sources or {}
+    if search_api in ("tavily", "duckduckgo"):
+        formatted = await select_and_execute_search(search_api, query_list, params_to_pass, token_budget=token_budget,
+                                                    token_counter=token_counter, deadline=deadline,
+                                                    similarity_threshold=similarity_threshold, embeddings=embeddings)
+        return formatted, visited_sources
+
+    search_results = await execute_search(search_api, query_list, params_to_pass, deadline=deadline,
+                                          similarity_threshold=similarity_threshold, embeddings=embeddings,
+                                          skip_urls=frozenset(visited_sources))
+    merged = dict(visited_sources)
+    revisited = 0
+    for response in search_results:
+        for result in response['results']:
+            key = canonicalize_url(result['url'])
+            if key in visited_sources:
+                revisited += 1
+            elif key not in merged:
+                merged[key] = content_store.put_json({field: result.get(field) for field in _SOURCE_FIELDS})
+    if revisited:
+        print(f"Reusing {revisited} sources already fetched for this section")
+
+    sources = [content_store.get_json(ref) for ref in merged.values()]
+    if not sources:
+        formatted = "No valid search results found. Please try different search queries or use a different search API."
+    else:
+        formatted = deduplicate_and_format_sources([{"query": "", "results": sources}],
+                                                   max_tokens_per_source=4000, deduplication_strategy="keep_first",
+                                                   total_token_budget=token_budget, token_counter=token_counter)
+    record_search(search_api, revisited_sources=revisited,
+                  formatted_tokens=(token_counter or get_token_counter()).count(formatted))
+    return formatted, merged
+
+
+async def execute_search(search_api: str, query_list: list[str], params_to_pass: dict,
+                         deadline: Optional[float] = None,
+                         similarity_threshold: Optional[float] = None,
+                         embeddings: Optional[Embeddings] = None,
+                         skip_urls: Optional[frozenset] = None,
+                         coalesce: bool = True) -> list[dict]:
+    """Run queries against a search API and return the raw search responses.
+
+    Every backend is asynchronous, so a search that runs past its deadline is
+    cancelled together with its open connections. Queries already in flight in
+    another branch of the graph are not sent again but share that response.
+
+    Args:
+        search_api: Name of the search API to use
+        query_list: List of search queries to execute
+        params_to_pass: Parameters to pass to the search API
+        deadline: Seconds the search may take; on expiry every query gets an empty
+            response with an 'error' (None: no limit)
+        similarity_threshold: Cosine similarity above which a query is merged into an
+            in-flight one (None: identical normalized queries only)
+        embeddings: Embedding model for similarity_threshold
+        skip_urls: Canonical URLs whose full content is not downloaded again; their
+            results keep only the search snippet (None: those of an enclosing search)
+        coalesce: Whether to share in-flight queries; hedged attempts must reach the
+            backend instead of waiting for the attempt they back up
+
+    Returns:
+        List of search response dicts with 'query' and 'results' keys
+
+    Raises:
+        ValueError: If an unsupported search API is specified
+    """
+    if search_api == "fusion" and deadline is not None:
+        # Fusion search keeps the backends that answered in time instead of returning nothing
+        params_to_pass = {**params_to_pass, "deadline": min(params_to_pass.get("deadline", deadline), deadline)}
+        deadline = None
+    skip_urls = _skip_fetch_urls.get() if skip_urls is None else skip_urls
+    scope = search_scope(search_api, params_to_pass)
+    if skip_urls:
+        # Responses missing some page contents are only shared with searches skipping the same pages
+        scope += ":" + content_hash(*sorted(skip_urls))
+
+    def run_batch(queries: list[str]):
+        return track_search(search_api, _dispatch_search(search_api, queries, params_to_pass), len(queries))
+
+    token = _skip_fetch_urls.set(skip_urls)
+    try:
+        if coalesce:
+            search = query_coalescer.search(scope, query_list, run_batch, similarity_threshold, embeddings)
+        else:
+            search = run_batch(list(query_list))
+        return await asyncio.wait_for(search, deadline)
+    except asyncio.TimeoutError:
+        print(f"{search_api} search exceeded its deadline of {deadline}s")
+        return [_empty_search_response(query, error=f"Deadline of {deadline}s exceeded") for query in query_list]
+    finally:
+        _skip_fetch_urls.reset(token)
+
+
+async def _dispatch_search(search_api: str, query_list: list[str], params_to_pass: dict) -> list[dict]:
     if search_api == "tavily":
-        # Tavily search tool used with both workflow and agent 
-        # and returns a formatted source string
-        return await tavily_search.ainvoke({'queries': query_list, **params_to_pass})
+        return await tavily_search_async(query_list, **params_to_pass)
     elif search_api == "duckduckgo":
-        # DuckDuckGo search tool used with both workflow and agent 
-        return await duckduckgo_search.ainvoke({'search_queries': query_list})
+        return await duckduckgo_search_async(query_list)
     elif search_api == "perplexity":
-        search_results = perplexity_search(query_list, **params_to_pass)
+        return await perplexity_search(query_list, **params_to_pass)
     elif search_api == "exa":
-        search_results = await exa_search(query_list, **params_to_pass)
+        return await exa_search(query_list, **params_to_pass)
     elif search_api == "arxiv":
-        search_results = await arxiv_search_async(query_list, **params_to_pass)
+        return await arxiv_search_async(query_list, **params_to_pass)
     elif search_api == "pubmed":
-        search_results = await pubmed_search_async(query_list, **params_to_pass)
+        return await pubmed_search_async(query_list, **params_to_pass)
     elif search_api == "linkup":
-        search_results = await linkup_search(query_list, **params_to_pass)
+        return await linkup_search(query_list, **params_to_pass)
     elif search_api == "googlesearch":
-        search_results = await google_search_async(query_list, **params_to_pass)
+        return await google_search_async(query_list, **params_to_pass)
     elif search_api == "azureaisearch":
-        search_results = await azureaisearch_search_async(query_list, **params_to_pass)
+        return await azureaisearch_search_async(query_list, **params_to_pass)
+    elif search_api == "fusion":
+        return await fusion_search_async(query_list, **params_to_pass)
+    elif search_api == "local":
+        return await local_search_async(query_list, **params_to_pass)
     else:
         raise ValueError(f"Unsupported search API: {search_api}")
 
-    return deduplicate_and_format_sources(search_results, max_tokens_per_source=4000, deduplication_strategy="keep_first")
+
+async def fusion_search_async(
+    search_queries: list[str],
+    backends: Optional[list[str]] = None,
+    backend_params: Optional[Dict[str, Dict[str, Any]]] = None,
+    deadline: float = DEFAULT_SEARCH_DEADLINE_SECONDS,
+    hedge_after: Optional[float] = None,
+) -> list[dict]:
+    """Search several backends concurrently and merge their results with reciprocal rank fusion.
+
+    Args:
+        search_queries: List of search queries
+        backends: Search APIs to query (default: DEFAULT_FUSION_BACKENDS)
+        backend_params: Search API config of each backend, keyed by backend name
+        deadline: Seconds after which backends that have not answered are cancelled and skipped
+        hedge_after: Seconds after which a slow backend gets a duplicate request; None disables hedging
+
+    Returns:
+        List[dict]: One fused search response per query
+    """
+    backend_params = backend_params or {}
+
+    async def search(backend: str, coalesce: bool = True):
+        return await execute_search(backend, search_queries, get_search_params(backend, backend_params.get(backend)),
+                                    coalesce=coalesce)
+
+    async def hedge(backend: str):
+        # Coalescing would make the hedge wait for the very request it is meant to back up
+        return await search(backend, coalesce=False)
+
+    responses_by_backend = await fan_out_search(search, backends or DEFAULT_FUSION_BACKENDS, deadline, hedge_after, hedge)
+    return fuse_search_responses(responses_by_backend)
+
+
+async def search_into_index(search_api: str, query_list: list[str], params_to_pass: dict, run_index: HybridIndex,
+                            deadline: Optional[float] = None,
+                            similarity_threshold: Optional[float] = None,
+                            embeddings: Optional[Embeddings] = None) -> int:
+    """Execute the queries not yet run in this research run and add their results to the run index.
+
+    Returns:
+        int: Number of chunks added to the index
+    """
+    new_queries = run_index.new_queries(query_list)
+    if len(new_queries) < len(query_list):
+        print(f"Skipping {len(query_list) - len(new_queries)} queries already executed in this run")
+    if not new_queries:
+        return 0
+    search_results = await execute_search(search_api, new_queries, params_to_pass, deadline=deadline,
+                                          similarity_threshold=similarity_threshold, embeddings=embeddings)
+    # Queries that failed or timed out may be retried later in the run
+    failed = {response.get('query') for response in search_results if 'error' in response}
+    run_index.mark_executed([query for query in new_queries if query not in failed])
+    return await run_index.add_search_results(search_results)
 
 
 class Summary(BaseModel):
@@ -1550,33 +1871,162 @@ class Summary(BaseModel):
     key_excerpts: list[str]
 
 
-async def summarize_webpage(model: BaseChatModel, webpage_content: str) -> str:
-    """Summarize webpage content."""
+class PageSummary(Summary):
+    id: int
+
+
+class BatchSummary(BaseModel):
+    summaries: list[PageSummary]
+
+
+# Pages up to this many characters can be summarized together in one call
+MAX_BATCHED_PAGE_CHARS = 6_000
+
+
+def format_summary(summary: Summary) -> str:
+    excerpts_str = "\n".join(f'- {e}' for e in summary.key_excerpts)
+    return f"""<summary>\n{summary.summary}\n</summary>\n\n<key_excerpts>\n{excerpts_str}\n</key_excerpts>"""
+
+
+def _summary_user_input(model: BaseChatModel, text: str):
+    if isinstance(model, ChatAnthropic):
+        return [{
+            "type": "text",
+            "text": text,
+            "cache_control": {"type": "ephemeral", "ttl": "1h"}
+        }]
+    return text
+
+
+async def summarize_webpage(model: BaseChatModel, webpage_content: str) -> tuple[str, bool]:
+    """Summarize webpage content.
+
+    Returns:
+        tuple[str, bool]: The formatted summary and True, or the page itself and False
+            if summarization failed
+    """
     try:
-        user_input_content = "Please summarize the article"
-        if isinstance(model, ChatAnthropic):
-            user_input_content = [{
-                "type": "text",
-                "text": user_input_content,
-                "cache_control": {"type": "ephemeral", "ttl": "1h"}
-            }]
-
-        summary = await model.with_structured_output(Summary).with_retry(stop_after_attempt=2).ainvoke([
+        summary = await repairing_structured_output(model, Summary, max_retries=2).ainvoke([
             {"role": "system", "content": SUMMARIZATION_PROMPT.format(webpage_content=webpage_content)},
-            {"role": "user", "content": user_input_content},
+            {"role": "user", "content": _summary_user_input(model, "Please summarize the article")},
         ])
-    except:
+    except Exception:
         # fall back on the raw content
-        return webpage_content
+        return webpage_content, False
 
-    def format_summary(summary: Summary):
-        excerpts_str = "\n".join(f'- {e}' for e in summary.key_excerpts)
-        return f"""<summary>\n{summary.summary}\n</summary>\n\n<key_excerpts>\n{excerpts_str}\n</key_excerpts>"""
+    return format_summary(summary), True
 
-    return format_summary(summary)
 
+async def summarize_webpage_batch(model: BaseChatModel, webpage_contents: list[str]) -> list[Optional[str]]:
+    """Summarize several short webpages in a single call.
 
-def split_and_rerank_search_results(embeddings: Embeddings, query: str, search_results: list[dict], max_chunks: int = 5):
+    Returns:
+        One formatted summary per page, None for pages missing from the response
+    """
+    webpages = "\n\n".join(
+        f'<webpage id="{i}">\n{content}\n</webpage>' for i, content in enumerate(webpage_contents)
+    )
+    try:
+        batch = await repairing_structured_output(model, BatchSummary, max_retries=2).ainvoke([
+            {"role": "system", "content": BATCH_SUMMARIZATION_PROMPT.format(webpages=webpages)},
+            {"role": "user", "content": _summary_user_input(model, "Please summarize each webpage")},
+        ])
+    except Exception:
+        return [None] * len(webpage_contents)
+
+    summaries: list[Optional[str]] = [None] * len(webpage_contents)
+    for page_summary in batch.summaries:
+        if 0 <= page_summary.id < len(summaries):
+            summaries[page_summary.id] = format_summary(page_summary)
+    return summaries
+
+
+async def summarize_webpages(
+    model: BaseChatModel,
+    model_name: str,
+    webpage_contents: list[str],
+    max_concurrency: int = 8,
+    min_chars: int = 1_000,
+    batch_size: int = 1,
+) -> list[str]:
+    """Summarize webpages with a content-hash cache, a concurrency cap and optional batching.
+
+    Args:
+        model: Summarization model
+        model_name: Name of the model, part of the cache key
+        webpage_contents: Page texts to summarize
+        max_concurrency: Maximum number of summarization calls in flight
+        min_chars: Pages shorter than this are returned as they are
+        batch_size: Number of short pages (up to MAX_BATCHED_PAGE_CHARS) summarized per call; 1 disables batching
+
+    Returns:
+        List[str]: One summary per page, or the page itself if it was skipped or summarization failed
+    """
+    cache = get_cache("summaries")
+    results: list[Optional[str]] = [None] * len(webpage_contents)
+    pending: dict[str, list[int]] = {}
+    to_look_up = [i for i, content in enumerate(webpage_contents) if len(content) >= min_chars]
+    cached = await cache.aget_many(content_hash(model_name, webpage_contents[i]) for i in to_look_up)
+    for i, content in enumerate(webpage_contents):
+        if len(content) < min_chars:
+            results[i] = content
+    for i, value in zip(to_look_up, cached):
+        if value is not None:
+            results[i] = value.decode("utf-8")
+        else:
+            pending.setdefault(webpage_contents[i], []).append(i)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # Written to the cache in one go once every page is summarized
+    fresh: dict[str, bytes] = {}
+
+    def store(content: str, summary: str) -> None:
+        fresh[content_hash(model_name, content)] = summary.encode("utf-8")
+        for i in pending[content]:
+            results[i] = summary
+
+    async def summarize_one(content: str):
+        async with semaphore:
+            summary, summarized = await summarize_webpage(model, content)
+        # The page itself is returned on failure, which is not worth caching
+        if not summarized:
+            for i in pending[content]:
+                results[i] = content
+        else:
+            store(content, summary)
+
+    async def summarize_batch(contents: list[str]):
+        async with semaphore:
+            summaries = await summarize_webpage_batch(model, contents)
+        missing = []
+        for content, summary in zip(contents, summaries):
+            if summary is None:
+                missing.append(content)
+            else:
+                store(content, summary)
+        # Pages the batch call dropped are summarized on their own
+        await asyncio.gather(*(summarize_one(content) for content in missing))
+
+    contents = list(pending)
+    tasks = []
+    if batch_size > 1:
+        short = [content for content in contents if len(content) <= MAX_BATCHED_PAGE_CHARS]
+        contents = [content for content in contents if len(content) > MAX_BATCHED_PAGE_CHARS]
+        for start in range(0, len(short), batch_size):
+            batch = short[start:start + batch_size]
+            tasks.append(summarize_batch(batch) if len(batch) > 1 else summarize_one(batch[0]))
+    tasks.extend(summarize_one(content) for content in contents)
+    await asyncio.gather(*tasks)
+    if fresh:
+        await cache.aset_many(fresh)
+    if pending:
+        stats = cache.stats()
+        print(f"Summarized {len(pending)} pages ({len(webpage_contents) - len(pending)} cached or skipped, "
+              f"summary cache hit ratio {stats['hit_ratio']:.0%})")
+    return results
+
+
+def _split_search_results(search_results: list[dict]) -> list[Document]:
     # split webpage content into chunks
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=1500, chunk_overlap=200, add_start_index=True
@@ -1588,15 +2038,29 @@ def split_and_rerank_search_results(embeddings: Embeddings, query: str, search_r
         )
         for result in search_results
     ]
-    all_splits = text_splitter.split_documents(documents)
+    return text_splitter.split_documents(documents)
+
+
+def split_and_rerank_search_results(embeddings: Embeddings, query: str, search_results: list[dict], max_chunks: int = 5):
+    all_splits = _split_search_results(search_results)
+    if not all_splits:
+        return []
+
+    # rank chunks by cosine similarity to the query
+    matrix = normalize_rows(embeddings.embed_documents([doc.page_content for doc in all_splits]))
+    top = top_k_similar(matrix, embeddings.embed_query(query), max_chunks)
+    return [all_splits[i] for i in top]
+
 
-    # index chunks
-    vector_store = InMemoryVectorStore(embeddings)
-    vector_store.add_documents(documents=all_splits)
+async def asplit_and_rerank_search_results(embeddings: Embeddings, query: str, search_results: list[dict], max_chunks: int = 5):
+    """Async version of ``split_and_rerank_search_results``."""
+    all_splits = _split_search_results(search_results)
+    if not all_splits:
+        return []
 
-    # retrieve relevant chunks
-    retrieved_docs = vector_store.similarity_search(query, k=max_chunks)
-    return retrieved_docs
+    matrix = normalize_rows(await embeddings.aembed_documents([doc.page_content for doc in all_splits]))
+    top = top_k_similar(matrix, await embeddings.aembed_query(query), max_chunks)
+    return [all_splits[i] for i in top]
 
 
 def stitch_documents_by_url(documents: list[Document]) -> list[Document]:
@@ -1,5 +1,5 @@
-from typing import Literal
-from langchain.chat_models import init_chat_model
+import functools
+from typing import Literal, Optional
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, get_buffer_string
 from langchain_core.runnables import RunnableConfig
 from langgraph.constants import Send
@@ -7,6 +7,14 @@ from langgraph.graph import START, END, StateGraph
 from langgraph.types import interrupt, Command
 
 from open_deep_research.workflow.configuration import WorkflowConfiguration
+from open_deep_research.content_store import load_content, store_content
+from open_deep_research.index import drop_run_index, new_run_key
+from open_deep_research.llm_cache import deterministic_model_args
+from open_deep_research.models import get_chat_model
+from open_deep_research.scheduler import scheduled_section
+from open_deep_research.speculation import speculative_research
+from open_deep_research.structured import repairing_structured_output
+from open_deep_research.telemetry import timed_node
 from open_deep_research.workflow.state import (
     ReportStateInput,
     ReportStateOutput,
@@ -17,6 +25,7 @@ from open_deep_research.workflow.state import (
     SectionOutput
 )
 from open_deep_research.state import (
+    Section,
     Sections,
     Queries,
     Feedback,
@@ -35,6 +44,11 @@ from open_deep_research.utils import (
     format_sections, 
     get_config_value, 
     get_search_params, 
+    get_search_token_counter,
+    get_coalescing_options,
+    get_configured_run_index,
+    search_into_index,
+    search_new_sources,
     select_and_execute_search,
     get_today_str
 )
@@ -48,26 +62,29 @@ def initial_router(state: ReportState, config: RunnableConfig):
         return "generate_report_plan"
 
 
+@timed_node
 async def clarify_with_user(state: ReportState, config: RunnableConfig):
     messages = state["messages"]
     configurable = WorkflowConfiguration.from_runnable_config(config)
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
-    structured_llm = writer_model.with_structured_output(ClarifyWithUser)
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs, max_concurrency=configurable.model_max_concurrency, **deterministic_model_args(configurable, writer_model_kwargs)) 
+    structured_llm = repairing_structured_output(writer_model, ClarifyWithUser, configurable.max_structured_output_retries)
     system_instructions = clarify_with_user_instructions.format(messages=get_buffer_string(messages))
     results = await structured_llm.ainvoke([SystemMessage(content=system_instructions),
                                      HumanMessage(content="Generate search queries that will help with planning the sections of the report.")])
     return {"messages": [AIMessage(content=results.question)], "already_clarified_topic": True}
 
 
+@timed_node
 async def generate_report_plan(state: ReportState, config: RunnableConfig) -> Command[Literal["human_feedback","build_section_with_web_research"]]:
     messages = state["messages"]
     feedback_list = state.get("feedback_on_report_plan", [])
     feedback = " /// ".join(feedback_list) if feedback_list else ""
 
     configurable = WorkflowConfiguration.from_runnable_config(config)
+    run_key = state.get("run_key") or new_run_key()
     report_structure = configurable.report_structure
     number_of_queries = configurable.number_of_queries
     search_api = get_config_value(configurable.search_api)
@@ -81,8 +98,8 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig) -> Co
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
-    structured_llm = writer_model.with_structured_output(Queries)
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs, max_concurrency=configurable.model_max_concurrency, **deterministic_model_args(configurable, writer_model_kwargs)) 
+    structured_llm = repairing_structured_output(writer_model, Queries, configurable.max_structured_output_retries)
 
     system_instructions_query = report_planner_query_writer_instructions.format(
         messages=get_buffer_string(messages),
@@ -94,7 +111,20 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig) -> Co
                                      HumanMessage(content="Generate search queries that will help with planning the sections of the report.")])
     
     query_list = [query.search_query for query in results.queries]
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
+    if configurable.use_run_index:
+        run_index = get_configured_run_index(configurable, config, run_key)
+        await search_into_index(search_api, query_list, params_to_pass, run_index,
+                                deadline=configurable.search_deadline_seconds,
+                                **get_coalescing_options(configurable))
+        source_str = await run_index.format_context(" ".join(query_list), configurable.run_index_top_k,
+                                                    token_budget=configurable.search_token_budget,
+                                                    token_counter=get_search_token_counter(configurable))
+    else:
+        source_str = await select_and_execute_search(search_api, query_list, params_to_pass,
+                                                     token_budget=configurable.search_token_budget,
+                                                     token_counter=get_search_token_counter(configurable),
+                                                     deadline=configurable.search_deadline_seconds,
+                                                     **get_coalescing_options(configurable))
     system_instructions_sections = report_planner_instructions.format(messages=get_buffer_string(messages), report_organization=report_structure, context=source_str, feedback=feedback)
 
     planner_provider = get_config_value(configurable.planner_provider)
@@ -106,31 +136,38 @@ async def generate_report_plan(state: ReportState, config: RunnableConfig) -> Co
     
     if planner_model == "claude-3-7-sonnet-latest":
         # Allocate a thinking budget for claude-3-7-sonnet-latest as the planner model
-        planner_llm = init_chat_model(model=planner_model, 
+        planner_llm = get_chat_model(model=planner_model, 
                                       model_provider=planner_provider, 
                                       max_tokens=20_000, 
-                                      thinking={"type": "enabled", "budget_tokens": 16_000})
+                                      thinking={"type": "enabled", "budget_tokens": 16_000},
+                                      max_concurrency=configurable.model_max_concurrency)
     else:
         # With other models, thinking tokens are not specifically allocated
-        planner_llm = init_chat_model(model=planner_model, 
+        planner_llm = get_chat_model(model=planner_model, 
                                       model_provider=planner_provider,
-                                      model_kwargs=planner_model_kwargs)
+                                      model_kwargs=planner_model_kwargs,
+                                      max_concurrency=configurable.model_max_concurrency, **deterministic_model_args(configurable, planner_model_kwargs))
     
-    structured_llm = planner_llm.with_structured_output(Sections)
+    structured_llm = repairing_structured_output(planner_llm, Sections, configurable.max_structured_output_retries)
     report_sections = await structured_llm.ainvoke([SystemMessage(content=system_instructions_sections),
                                              HumanMessage(content=planner_message)])
     sections = report_sections.sections
 
     if sections_user_approval:
-        return Command(goto="human_feedback", update={"sections": sections})
+        # Start researching the sections while the plan waits for approval
+        thread_id = config.get("configurable", {}).get("thread_id")
+        if configurable.speculative_section_research and thread_id:
+            speculative_research.start(thread_id, sections, functools.partial(research_section_ahead, messages, config=config, run_key=run_key))
+        return Command(goto="human_feedback", update={"sections": sections, "run_key": run_key})
     else:
         return Command(goto=[
-            Send("build_section_with_web_research", {"messages": messages, "section": s, "search_iterations": 0}) 
-            for s in sections 
+            Send("build_section_with_web_research", {"messages": messages, "section": s, "section_index": i, "search_iterations": 0, "run_key": run_key}) 
+            for i, s in enumerate(sections) 
             if s.research
-        ], update={"sections": sections})
+        ], update={"sections": sections, "run_key": run_key})
 
 
+@timed_node
 async def human_feedback(state: ReportState, config: RunnableConfig) -> Command[Literal["generate_report_plan","build_section_with_web_research"]]:
     messages = state["messages"]
     sections = state['sections']
@@ -146,8 +183,8 @@ async def human_feedback(state: ReportState, config: RunnableConfig) -> Command[
     feedback = interrupt(interrupt_message)
     if (isinstance(feedback, bool) and feedback is True) or (isinstance(feedback, str) and feedback.lower() == "true"):
         return Command(goto=[
-            Send("build_section_with_web_research", {"messages": messages, "section": s, "search_iterations": 0}) 
-            for s in sections 
+            Send("build_section_with_web_research", {"messages": messages, "section": s, "section_index": i, "search_iterations": 0, "run_key": state.get("run_key")}) 
+            for i, s in enumerate(sections) 
             if s.research
         ])
     elif isinstance(feedback, str):
@@ -157,7 +194,21 @@ async def human_feedback(state: ReportState, config: RunnableConfig) -> Command[
         raise TypeError(f"Interrupt value of type {type(feedback)} is not supported.")
 
 
-async def generate_queries(state: SectionState, config: RunnableConfig):
+@timed_node
+async def take_speculative_research(state: SectionState, config: RunnableConfig) -> Command[Literal["generate_queries", "write_section"]]:
+    # Not admitted by the section scheduler, so waiting for the speculative research never holds a slot it needs
+    configurable = WorkflowConfiguration.from_runnable_config(config)
+    if configurable.speculative_section_research:
+        # The first search of this section may already have run during human_feedback
+        researched = await speculative_research.take(config.get("configurable", {}).get("thread_id"), state["section"].name)
+        if researched is not None:
+            return Command(update=researched, goto="write_section")
+    return Command(goto="generate_queries")
+
+
+@scheduled_section(WorkflowConfiguration)
+@timed_node
+async def generate_queries(state: SectionState, config: RunnableConfig) -> Command[Literal["search_web"]]:
     messages = state["messages"]
     section = state["section"]
     configurable = WorkflowConfiguration.from_runnable_config(config)
@@ -165,8 +216,8 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
-    structured_llm = writer_model.with_structured_output(Queries)
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs, max_concurrency=configurable.model_max_concurrency, **deterministic_model_args(configurable, writer_model_kwargs)) 
+    structured_llm = repairing_structured_output(writer_model, Queries, configurable.max_structured_output_retries)
     system_instructions = query_writer_instructions.format(messages=get_buffer_string(messages), 
                                                            section_topic=section.description, 
                                                            number_of_queries=number_of_queries,
@@ -174,9 +225,11 @@ async def generate_queries(state: SectionState, config: RunnableConfig):
 
     queries = await structured_llm.ainvoke([SystemMessage(content=system_instructions),
                                      HumanMessage(content="Generate search queries on the provided topic.")])
-    return {"search_queries": queries.queries}
+    return Command(update={"search_queries": queries.queries}, goto="search_web")
 
 
+@scheduled_section(WorkflowConfiguration, charge_tokens=False)
+@timed_node
 async def search_web(state: SectionState, config: RunnableConfig):
     search_queries = state["search_queries"]
     configurable = WorkflowConfiguration.from_runnable_config(config)
@@ -185,16 +238,39 @@ async def search_web(state: SectionState, config: RunnableConfig):
     params_to_pass = get_search_params(search_api, search_api_config)
 
     query_list = [query.search_query for query in search_queries]
-    source_str = await select_and_execute_search(search_api, query_list, params_to_pass)
-
-    return {"source_str": source_str, "search_iterations": state["search_iterations"] + 1}
-
-
+    if configurable.use_run_index:
+        # write_section retrieves its context from the run index
+        await search_into_index(search_api, query_list, params_to_pass, get_configured_run_index(configurable, config, state.get("run_key")),
+                                deadline=configurable.search_deadline_seconds,
+                                **get_coalescing_options(configurable))
+        return {"search_iterations": state["search_iterations"] + 1}
+
+    source_str, visited_sources = await search_new_sources(search_api, query_list, params_to_pass,
+                                                           state.get("visited_sources"),
+                                                           token_budget=configurable.search_token_budget,
+                                                           token_counter=get_search_token_counter(configurable),
+                                                           deadline=configurable.search_deadline_seconds,
+                                                           **get_coalescing_options(configurable))
+
+    # Only a reference travels through the state; write_section loads the text
+    return {"source_ref": store_content(source_str), "visited_sources": visited_sources,
+            "search_iterations": state["search_iterations"] + 1}
+
+
+@scheduled_section(WorkflowConfiguration, charge_tokens=False)
+@timed_node
 async def write_section(state: SectionState, config: RunnableConfig):
     messages = state["messages"]
     section = state["section"]
-    source_str = state["source_str"]
     configurable = WorkflowConfiguration.from_runnable_config(config)
+    if configurable.use_run_index:
+        query_list = [query.search_query for query in state["search_queries"]]
+        source_str = await get_configured_run_index(configurable, config, state.get("run_key")).format_context(
+            " ".join([section.name, section.description, *query_list]), configurable.run_index_top_k,
+            token_budget=configurable.search_token_budget,
+            token_counter=get_search_token_counter(configurable))
+    else:
+        source_str = load_content(state["source_ref"])
     section_writer_inputs_formatted = section_writer_inputs.format(messages=get_buffer_string(messages), 
                                                              section_name=section.name, 
                                                              section_topic=section.description, 
@@ -203,12 +279,14 @@ async def write_section(state: SectionState, config: RunnableConfig):
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(
+    writer_model = get_chat_model(
         model=writer_model_name,
         model_provider=writer_provider,
         model_kwargs=writer_model_kwargs,
-        max_retries=configurable.max_structured_output_retries
-    ).with_structured_output(SectionOutput)
+        max_retries=configurable.max_structured_output_retries,
+        max_concurrency=configurable.model_max_concurrency
+    )
+    writer_model = repairing_structured_output(writer_model, SectionOutput, configurable.max_structured_output_retries)
 
     section_content = await writer_model.ainvoke([SystemMessage(content=section_writer_instructions),
                                            HumanMessage(content=section_writer_inputs_formatted)])
@@ -230,15 +308,18 @@ async def write_section(state: SectionState, config: RunnableConfig):
 
     if planner_model == "claude-3-7-sonnet-latest":
         # Allocate a thinking budget for claude-3-7-sonnet-latest as the planner model
-        reflection_model = init_chat_model(model=planner_model, 
-                                           model_provider=planner_provider, 
-                                           max_tokens=20_000, 
-                                           thinking={"type": "enabled", "budget_tokens": 16_000}).with_structured_output(Feedback)
+        reflection_llm = get_chat_model(model=planner_model, 
+                                         model_provider=planner_provider, 
+                                         max_tokens=20_000, 
+                                         thinking={"type": "enabled", "budget_tokens": 16_000},
+                                         max_concurrency=configurable.model_max_concurrency)
     else:
-        reflection_model = init_chat_model(model=planner_model, 
-                                           model_provider=planner_provider,
-                                           max_retries=configurable.max_structured_output_retries,
-                                           model_kwargs=planner_model_kwargs).with_structured_output(Feedback)
+        reflection_llm = get_chat_model(model=planner_model, 
+                                         model_provider=planner_provider,
+                                         max_retries=configurable.max_structured_output_retries,
+                                         model_kwargs=planner_model_kwargs,
+                                         max_concurrency=configurable.model_max_concurrency, **deterministic_model_args(configurable, planner_model_kwargs))
+    reflection_model = repairing_structured_output(reflection_llm, Feedback, configurable.max_structured_output_retries)
 
     feedback = await reflection_model.ainvoke([SystemMessage(content=section_grader_instructions_formatted),
                                         HumanMessage(content=section_grader_message)])
@@ -246,7 +327,7 @@ async def write_section(state: SectionState, config: RunnableConfig):
     if feedback.grade == "pass" or state["search_iterations"] >= configurable.max_search_depth:
         update = {"completed_sections": [section]}
         if configurable.include_source_str:
-            update["source_str"] = source_str
+            update["source_refs"] = [store_content(source_str)]
         return Command(update=update, goto=END)
     else:
         return Command(
@@ -255,12 +336,14 @@ async def write_section(state: SectionState, config: RunnableConfig):
         )
 
 
+@scheduled_section(WorkflowConfiguration)
+@timed_node
 async def write_final_sections(state: SectionState, config: RunnableConfig):
     configurable = WorkflowConfiguration.from_runnable_config(config)
     writer_provider = get_config_value(configurable.writer_provider)
     writer_model_name = get_config_value(configurable.writer_model)
     writer_model_kwargs = get_config_value(configurable.writer_model_kwargs or {})
-    writer_model = init_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs) 
+    writer_model = get_chat_model(model=writer_model_name, model_provider=writer_provider, model_kwargs=writer_model_kwargs, max_concurrency=configurable.model_max_concurrency) 
 
     messages = state["messages"]
     section = state["section"]
@@ -275,6 +358,7 @@ async def write_final_sections(state: SectionState, config: RunnableConfig):
     return {"completed_sections": [section]}
 
 
+@timed_node
 async def gather_completed_sections(state: ReportState):
     completed_sections = state["completed_sections"]
     completed_report_sections = format_sections(completed_sections)
@@ -282,6 +366,7 @@ async def gather_completed_sections(state: ReportState):
     return {"report_sections_from_research": completed_report_sections}
 
 
+@timed_node
 async def compile_final_report(state: ReportState, config: RunnableConfig):
     configurable = WorkflowConfiguration.from_runnable_config(config)
     sections = state["sections"]
@@ -289,35 +374,50 @@ async def compile_final_report(state: ReportState, config: RunnableConfig):
     for section in sections:
         section.content = completed_sections[section.name]
     all_sections = "\n\n".join([s.content for s in sections])
+    drop_run_index(config, state.get("run_key"))
 
     if configurable.include_source_str:
-        return {"final_report": all_sections, "source_str": state["source_str"], "messages": [AIMessage(content=all_sections)]}
+        return {"final_report": all_sections, "source_str": "".join(load_content(ref) for ref in state.get("source_refs") or []), "messages": [AIMessage(content=all_sections)]}
     else:
         return {"final_report": all_sections, "messages": [AIMessage(content=all_sections)]}
 
 
 async def initiate_final_section_writing(state: ReportState):
     return [
-        Send("write_final_sections", {"messages": state["messages"], "section": s, "report_sections_from_research": state["report_sections_from_research"]}) 
-        for s in state["sections"] 
+        Send("write_final_sections", {"messages": state["messages"], "section": s, "section_index": i, "report_sections_from_research": state["report_sections_from_research"]}) 
+        for i, s in enumerate(state["sections"]) 
         if not s.research
     ]
 
 
 ## Graph
 section_builder = StateGraph(SectionState, output=SectionOutputState)
+section_builder.add_node("take_speculative_research", take_speculative_research)
 section_builder.add_node("generate_queries", generate_queries)
 section_builder.add_node("search_web", search_web)
 section_builder.add_node("write_section", write_section)
-section_builder.add_edge(START, "generate_queries")
-section_builder.add_edge("generate_queries", "search_web")
+section_builder.add_edge(START, "take_speculative_research")
 section_builder.add_edge("search_web", "write_section")
 
+section_graph = section_builder.compile()
+
+async def _research_section(state: SectionState, config: RunnableConfig):
+    update = (await generate_queries(state, config)).update
+    update.update(await search_web({**state, **update}, config))
+    return update
+
+async def research_section_ahead(messages: list, section: Section, section_index: int, config: RunnableConfig,
+                                run_key: Optional[str] = None) -> dict:
+    """First query generation and search of a section, run before the plan is approved."""
+    # Only the options are needed; the graph internals of the planning step are not
+    config = {"configurable": {key: value for key, value in config.get("configurable", {}).items() if not key.startswith("__")}}
+    return await _research_section({"messages": messages, "section": section, "section_index": section_index, "search_iterations": 0, "run_key": run_key}, config)
+
 builder = StateGraph(ReportState, input=ReportStateInput, output=ReportStateOutput, config_schema=WorkflowConfiguration)
 builder.add_node("clarify_with_user", clarify_with_user)
 builder.add_node("generate_report_plan", generate_report_plan)
 builder.add_node("human_feedback", human_feedback)
-builder.add_node("build_section_with_web_research", section_builder.compile())
+builder.add_node("build_section_with_web_research", section_graph)
 builder.add_node("gather_completed_sections", gather_completed_sections)
 builder.add_node("write_final_sections", write_final_sections)
 builder.add_node("compile_final_report", compile_final_report)
@@ -0,0 +1,25 @@
+from open_deep_research.budget import allocate_token_budget
+
+
+def test_everything_fits():
+    assert allocate_token_budget([10, 20, 30], 100) == [10, 20, 30]
+
+
+def test_unused_share_of_short_sources_is_redistributed():
+    assert allocate_token_budget([10, 100, 100], 150) == [10, 70, 70]
+
+
+def test_weights_split_the_budget_proportionally():
+    assert allocate_token_budget([100, 100], 90, weights=[2, 1]) == [60, 30]
+
+
+def test_allocation_never_exceeds_lengths_or_budget():
+    lengths = [5, 500, 40, 1200, 80]
+    allocation = allocate_token_budget(lengths, 600, weights=[0.9, 0.1, 0.5, 0.7, 0.0])
+    assert all(0 <= tokens <= length for tokens, length in zip(allocation, lengths))
+    assert sum(allocation) <= 600
+
+
+def test_empty_input_or_no_budget():
+    assert allocate_token_budget([], 100) == []
+    assert allocate_token_budget([10, 20], 0) == [0, 0]
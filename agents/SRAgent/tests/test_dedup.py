@@ -0,0 +1,52 @@
+from open_deep_research.dedup import NearDuplicateIndex, canonicalize_url, simhash
+
+
+def test_canonicalize_url_drops_tracking_ports_and_fragments():
+    url = "HTTPS://Example.COM:443/Path?utm_source=x&b=2&fbclid=y&a=1#section"
+    assert canonicalize_url(url, aggressive=False) == "https://example.com/Path?b=2&a=1"
+
+
+def test_canonicalize_url_is_conservative_by_default(monkeypatch):
+    monkeypatch.delenv("AGGRESSIVE_URL_CANONICALIZATION", raising=False)
+    url = "http://m.example.com/a//b/?z=1&y=2"
+    assert canonicalize_url(url) == url
+    assert canonicalize_url("http://example.com:8080/a") == "http://example.com:8080/a"
+
+
+def test_canonicalize_url_aggressive(monkeypatch):
+    expected = "https://example.com/a/b?y=2&z=1"
+    url = "http://www.example.com/a//b/?z=1&y=2"
+    assert canonicalize_url(url, aggressive=True) == expected
+    monkeypatch.setenv("AGGRESSIVE_URL_CANONICALIZATION", "true")
+    assert canonicalize_url(url) == expected
+
+
+def test_canonicalize_url_maps_arxiv_variants_to_abs_page():
+    for url in (
+        "https://arxiv.org/abs/2101.00001",
+        "http://www.arxiv.org/pdf/2101.00001v2.pdf",
+        "https://export.arxiv.org/html/2101.00001v1/",
+    ):
+        assert canonicalize_url(url, aggressive=False) == "https://arxiv.org/abs/2101.00001"
+
+
+def test_canonicalize_url_leaves_invalid_urls_alone():
+    assert canonicalize_url("") == ""
+    assert canonicalize_url("not a url") == "not a url"
+
+
+def _text(seed: int, words: int = 300) -> str:
+    return " ".join(f"w{(i * seed * 7919 + seed) % 1009}" for i in range(words))
+
+
+def test_simhash_of_short_text_is_none():
+    assert simhash("too short to fingerprint") is None
+
+
+def test_near_duplicate_index_finds_small_edits_only():
+    original = _text(3)
+    edited = "changed " + original.split(" ", 1)[1] + " with an extra closing remark"
+    index = NearDuplicateIndex()
+    index.add(simhash(original))
+    assert index.find(simhash(edited)) == simhash(original)
+    assert index.find(simhash(_text(5))) is None
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from open_deep_research.scheduler import SectionScheduler
+
+
+async def _hold(scheduler, priority, order, release=None):
+    async with scheduler.admit(priority):
+        order.append(priority)
+        if release is not None:
+            await release.wait()
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_waiting_sections_are_admitted_in_priority_order():
+    async def main():
+        scheduler = SectionScheduler(max_concurrent=1)
+        order, release = [], asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, 0, order, release))
+        await _settle()
+        waiters = [asyncio.create_task(_hold(scheduler, priority, order)) for priority in (3, 1, 2)]
+        await _settle()
+        assert scheduler.running == 1 and scheduler.waiting == 3
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        assert order == [0, 1, 2, 3]
+        assert scheduler.running == 0
+
+    asyncio.run(main())
+
+
+def test_equal_priorities_are_admitted_in_arrival_order():
+    async def main():
+        scheduler = SectionScheduler(max_concurrent=1)
+        order, release = [], asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, 0, order, release))
+        await _settle()
+        admitted = []
+
+        async def section(name):
+            async with scheduler.admit(1):
+                admitted.append(name)
+
+        waiters = []
+        for name in "abc":
+            waiters.append(asyncio.create_task(section(name)))
+            await _settle()
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        assert admitted == ["a", "b", "c"]
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_take_a_slot():
+    async def main():
+        scheduler = SectionScheduler(max_concurrent=1)
+        order, release = [], asyncio.Event()
+        holder = asyncio.create_task(_hold(scheduler, 0, order, release))
+        await _settle()
+        cancelled = asyncio.create_task(_hold(scheduler, 1, order))
+        waiter = asyncio.create_task(_hold(scheduler, 2, order))
+        await _settle()
+        cancelled.cancel()
+        release.set()
+        await asyncio.gather(holder, waiter)
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert order == [0, 2]
+        assert scheduler.running == 0 and scheduler.waiting == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_section_releases_its_slot():
+    async def main():
+        scheduler = SectionScheduler(max_concurrent=1)
+        order, never = [], asyncio.Event()
+        running = asyncio.create_task(_hold(scheduler, 0, order, never))
+        waiter = asyncio.create_task(_hold(scheduler, 1, order))
+        await _settle()
+        running.cancel()
+        await asyncio.wait_for(waiter, timeout=1)
+        assert order == [0, 1]
+        assert scheduler.running == 0
+
+    asyncio.run(main())
+
+
+def test_unlimited_scheduler_admits_at_once():
+    async def main():
+        scheduler = SectionScheduler()
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, priority, order, release)) for priority in range(5)]
+        await _settle()
+        assert scheduler.running == 5
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
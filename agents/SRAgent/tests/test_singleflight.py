@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from open_deep_research.singleflight import QueryCoalescer
+
+
+def _response(query):
+    return {"query": query, "results": [{"url": f"https://example.com/{query}"}]}
+
+
+def test_concurrent_identical_queries_share_one_call():
+    async def main():
+        coalescer = QueryCoalescer()
+        calls, release = [], asyncio.Event()
+
+        async def run_batch(queries):
+            calls.append(list(queries))
+            await release.wait()
+            return [_response(query) for query in queries]
+
+        first = asyncio.create_task(coalescer.search("api", ["a", "b"], run_batch))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(coalescer.search("api", ["B", "c"], run_batch))
+        await asyncio.sleep(0)
+        release.set()
+        first, second = await asyncio.gather(first, second)
+        assert calls == [["a", "b"], ["c"]]
+        assert [response["query"] for response in second] == ["B", "c"]
+        assert coalescer.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_waiters_retry_when_the_leader_fails():
+    async def main():
+        coalescer = QueryCoalescer()
+        release = asyncio.Event()
+
+        async def failing_batch(queries):
+            await release.wait()
+            raise RuntimeError("backend down")
+
+        async def run_batch(queries):
+            return [_response(query) for query in queries]
+
+        leader = asyncio.create_task(coalescer.search("api", ["a"], failing_batch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(coalescer.search("api", ["a"], run_batch))
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(RuntimeError):
+            await leader
+        assert await waiter == [_response("a")]
+        assert coalescer.in_flight() == 0
+
+    asyncio.run(main())
+
+
+def test_waiters_retry_when_the_leader_is_cancelled():
+    async def main():
+        coalescer = QueryCoalescer()
+
+        async def hanging_batch(queries):
+            await asyncio.Event().wait()
+
+        async def run_batch(queries):
+            return [_response(query) for query in queries]
+
+        leader = asyncio.create_task(coalescer.search("api", ["a"], hanging_batch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(coalescer.search("api", ["a"], run_batch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await asyncio.wait_for(waiter, timeout=1) == [_response("a")]
+
+    asyncio.run(main())
+
+
+def test_missing_and_reordered_responses_stay_aligned():
+    async def main():
+        coalescer = QueryCoalescer()
+
+        async def run_batch(queries):
+            # Drops "b" and returns the rest in reverse order
+            return [_response(query) for query in reversed(queries) if query != "b"]
+
+        responses = await coalescer.search("api", ["a", "b", "c"], run_batch)
+        assert [response["query"] for response in responses] == ["a", "b", "c"]
+        assert responses[0] == _response("a") and responses[2] == _response("c")
+        assert responses[1]["results"] == [] and responses[1]["error"]
+
+    asyncio.run(main())
+
+
+def test_different_scopes_are_not_merged():
+    async def main():
+        coalescer = QueryCoalescer()
+        calls, release = [], asyncio.Event()
+
+        async def run_batch(queries):
+            calls.append(list(queries))
+            await release.wait()
+            return [_response(query) for query in queries]
+
+        tasks = [asyncio.create_task(coalescer.search(scope, ["a"], run_batch)) for scope in ("tavily", "exa")]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+        assert calls == [["a"], ["a"]]
+
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+import pytest
+
+from open_deep_research.state import Feedback, Queries
+from open_deep_research.structured import coerce_to_schema, extract_json
+
+
+def test_extract_json_from_fenced_block_with_prose():
+    text = 'Here are the queries:\n```json\n{"queries": [{"search_query": "a"}]}\n```\nHope this helps.'
+    assert extract_json(text) == {"queries": [{"search_query": "a"}]}
+
+
+def test_extract_json_skips_braces_in_prose():
+    assert extract_json('Use {curly} braces: {"grade": "pass"}') == {"grade": "pass"}
+
+
+def test_extract_json_repairs_trailing_commas_and_python_literals():
+    assert extract_json('{"a": [1, 2,], "b": 3,}') == {"a": [1, 2], "b": 3}
+    assert extract_json("{'done': True, 'note': None}") == {"done": True, "note": None}
+
+
+def test_extract_json_keeps_brackets_inside_strings():
+    assert extract_json('{"q": "what is [x] }"}') == {"q": "what is [x] }"}
+
+
+def test_extract_json_without_json_raises():
+    with pytest.raises(ValueError):
+        extract_json("no structured content here")
+
+
+def test_coerce_unwraps_schema_name_and_wrapper_keys():
+    data = {"Queries": {"queries": [{"search_query": "a"}]}}
+    assert Queries.model_validate(coerce_to_schema(data, Queries)).queries[0].search_query == "a"
+    data = {"properties": {"queries": [{"search_query": "b"}]}}
+    assert Queries.model_validate(coerce_to_schema(data, Queries)).queries[0].search_query == "b"
+
+
+def test_coerce_parses_serialized_lists_and_wraps_plain_strings():
+    data = {"queries": '["first", "second"]'}
+    queries = Queries.model_validate(coerce_to_schema(data, Queries)).queries
+    assert [query.search_query for query in queries] == ["first", "second"]
+
+
+def test_coerce_wraps_single_value_into_list():
+    data = {"queries": {"search_query": "only"}}
+    assert len(Queries.model_validate(coerce_to_schema(data, Queries)).queries) == 1
+
+
+def test_coerce_bare_list_for_single_field_schema():
+    data = [{"search_query": "a"}, {"search_query": "b"}]
+    assert len(Queries.model_validate(coerce_to_schema(data, Queries)).queries) == 2
+
+
+def test_coerce_matches_literals_case_insensitively():
+    data = {"grade": " PASS ", "follow_up_queries": []}
+    assert Feedback.model_validate(coerce_to_schema(data, Feedback)).grade == "pass"